@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Throughput of the blocking and the async dispatcher under a mixed workload
+
+Half of the requests go to an I/O bound handler (50ms of waiting) and the other
+half to a short CPU bound one. The blocking dispatcher runs on a thread pool of
+the size given to the worker, like PYTHON_THREADPOOL_THREAD_COUNT does.
+
+usage:
+    python benchmarks/bench_async.py [--requests 200] [--threads 1]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functionapprest import create_functionapp_handler, Request, FunctionsContext  # noqa: E402
+
+IO_SECONDS = 0.05
+
+
+def get_context() -> FunctionsContext:
+    return FunctionsContext(
+        function_directory=os.path.dirname(os.path.abspath(__file__)),
+        function_name='benchmark',
+        invocation_id='00000000-0000-0000-0000-000000000000',
+        bindings={}
+    )
+
+
+def get_requests(count: int) -> list:
+    paths = ['/io/', '/cpu/']
+    return [Request('GET', f"http://localhost:7071/api{paths[index % 2]}")
+            for index in range(count)]
+
+
+def cpu_handler(req):
+    return {'total': sum(range(1000))}
+
+
+def run_blocking(count: int, threads: int) -> float:
+    functionapp_handler = create_functionapp_handler()
+
+    @functionapp_handler.handle('get', path='/io/')
+    def io_handler(req):
+        time.sleep(IO_SECONDS)
+        return {'waited': IO_SECONDS}
+
+    functionapp_handler.handle('get', path='/cpu/')(cpu_handler)
+    context = get_context()
+    requests = get_requests(count)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda req: functionapp_handler(req, context), requests))
+    return time.perf_counter() - start
+
+
+def run_async(count: int, threads: int) -> float:
+    functionapp_handler = create_functionapp_handler(async_mode=True, max_workers=threads)
+
+    @functionapp_handler.handle('get', path='/io/')
+    async def io_handler(req):
+        await asyncio.sleep(IO_SECONDS)
+        return {'waited': IO_SECONDS}
+
+    functionapp_handler.handle('get', path='/cpu/')(cpu_handler)
+    context = get_context()
+    requests = get_requests(count)
+
+    async def gather():
+        return await asyncio.gather(*[functionapp_handler(req, context) for req in requests])
+
+    loop = asyncio.new_event_loop()
+    try:
+        start = time.perf_counter()
+        loop.run_until_complete(gather())
+        return time.perf_counter() - start
+    finally:
+        loop.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=1)
+    args = parser.parse_args()
+
+    for name, func in (('blocking', run_blocking), ('async', run_async)):
+        elapsed = func(args.requests, args.threads)
+        print(f"{name:<10}{elapsed:>10.3f} s{args.requests / elapsed:>12.1f} requests/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Serialization and parsing cost of each installed JSON codec
+
+usage:
+    python benchmarks/bench_codec.py [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functionapprest.codec import available_codecs, get_json_codec  # noqa: E402
+
+SIZES = (1024, 100 * 1024, 1024 * 1024, 5 * 1024 * 1024)
+
+
+def get_record(index: int) -> dict:
+    return {
+        'id': index,
+        'name': f"product {index}",
+        'price': index * 1.25,
+        'available': index % 2 == 0,
+        'tags': ['azure', 'functions', 'json'],
+        'created': datetime(2019, 2, 21, 10, 30, index % 60),
+    }
+
+
+def get_payload(size: int) -> list:
+    """List of records whose encoding is about the given size in bytes."""
+    codec = get_json_codec('json')
+    record_size = len(codec.dumps_bytes(get_record(0))) + 2
+    return [get_record(index) for index in range(max(1, size // record_size))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    codecs = [get_json_codec(name) for name in available_codecs()]
+    print(f"{'payload':>10}{'codec':>10}{'dumps ms':>12}{'loads ms':>12}")
+    for size in SIZES:
+        payload = get_payload(size)
+        number = max(1, (1024 * 1024) // size)
+        for codec in codecs:
+            encoded = codec.dumps_bytes(payload)
+            dumps = min(timeit.repeat(lambda: codec.dumps_bytes(payload),
+                                      number=number, repeat=args.repeat))
+            loads = min(timeit.repeat(lambda: codec.loads(encoded),
+                                      number=number, repeat=args.repeat))
+            print(f"{size // 1024:>8}KB{codec.name:>10}"
+                  f"{dumps / number * 1e3:>12.3f}{loads / number * 1e3:>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
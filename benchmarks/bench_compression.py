@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Compressed size and CPU time of a JSON list response per coding and level
+
+usage:
+    python benchmarks/bench_compression.py [--records 10000] [--levels 1 6 9]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functionapprest import Compression  # noqa: E402
+from functionapprest.codec import get_json_codec  # noqa: E402
+from functionapprest.compression import available_codings  # noqa: E402
+
+
+def get_payload(records: int) -> list:
+    return [{'id': index, 'name': f"product {index}", 'price': index * 1.25,
+             'available': index % 2 == 0, 'tags': ['azure', 'functions']}
+            for index in range(records)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=10000)
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 3, 6, 9])
+    parser.add_argument('--number', type=int, default=10)
+    args = parser.parse_args()
+
+    body = get_json_codec('json').dumps_bytes(get_payload(args.records))
+    print(f"identity body: {len(body) / 1024:.1f}KB")
+    print(f"{'coding':>8}{'level':>7}{'KB':>10}{'ratio':>8}{'ms':>10}{'MB/s':>9}")
+    for name in available_codings():
+        for level in args.levels:
+            compression = Compression(level=level, encodings=(name,))
+            coding = compression.negotiate(name)
+            compressed = compression.compress(coding, body)
+            elapsed = min(timeit.repeat(lambda: compression.compress(coding, body),
+                                        number=args.number, repeat=3)) / args.number
+            print(f"{name:>8}{level:>7}{len(compressed) / 1024:>10.1f}"
+                  f"{len(body) / len(compressed):>8.1f}"
+                  f"{elapsed * 1e3:>10.2f}{len(body) / elapsed / 2 ** 20:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Import time of functionapprest, measured with python -X importtime
+
+Every run imports the package in a fresh interpreter, with the pyc files cached
+in a temporary directory, and the best of the runs is kept. The script exits
+with status 1 when a module meant to be imported lazily is imported with the
+package, or when the import is slower than --max-ms.
+
+usage:
+    python benchmarks/bench_import.py [--runs 10] [--max-ms 100] [--top 10]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# only imported on first use: with the first schema, route match or profile
+LAZY_MODULES = ('jsonschema', 'werkzeug', 'cProfile', 'pstats')
+
+
+def import_times(statement: str, env: dict) -> dict:
+    """Self and cumulative import time of each module, in microseconds."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            env=env, cwd=ROOT, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                            universal_newlines=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def best_times(statement: str, env: dict, runs: int) -> dict:
+    best = {}
+    for _ in range(runs):
+        for name, value in import_times(statement, env).items():
+            if name not in best or value[1] < best[name][1]:
+                best[name] = value
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--max-ms', type=float, help='fail when importing the package takes longer')
+    parser.add_argument('--top', type=int, default=10, help='number of slowest modules to print')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pycache:
+        env = dict(os.environ, PYTHONPYCACHEPREFIX=pycache)
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+        # the first imports write the pyc files of the package and its dependencies
+        import_times('import functionapprest, jsonschema, werkzeug.routing', env)
+        times = best_times('import functionapprest', env, args.runs)
+        # imported after the package, only what the package did not import already counts
+        lazy_times = best_times('import functionapprest, jsonschema, werkzeug.routing',
+                                env, args.runs)
+
+    total_ms = times['functionapprest'][1] / 1e3
+    print(f"import functionapprest: {total_ms:.1f} ms")
+    dependency_ms = times.get('azure.functions', (0, 0))[1] / 1e3
+    print(f"  of which azure.functions: {dependency_ms:.1f} ms")
+    lazy_ms = (lazy_times['jsonschema'][1] + lazy_times['werkzeug.routing'][1]) / 1e3
+    print(f"deferred until first use (jsonschema, werkzeug.routing): {lazy_ms:.1f} ms")
+
+    print(f"\n{'module':<56}{'self ms':>9}{'total ms':>10}")
+    slowest = sorted(times.items(), key=lambda item: item[1][1], reverse=True)[1:args.top + 1]
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"{name:<56}{self_us / 1e3:>9.1f}{cumulative_us / 1e3:>10.1f}")
+
+    failures = []
+    imported = sorted(name for name in times if name.split('.')[0] in LAZY_MODULES)
+    if imported:
+        failures.append(f"lazily imported modules are imported with the package: "
+                        f"{', '.join(imported)}")
+    if args.max_ms is not None and total_ms > args.max_ms:
+        failures.append(f"import took {total_ms:.1f} ms, more than {args.max_ms:.1f} ms")
+    for failure in failures:
+        print(failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Latency of a route ignoring or reading a large JSON body
+
+The request JSON is parsed on first access, so a handler which never reads
+`req.json` does not pay for it, while reading any part of it parses the whole
+body. A route with `load_json=False` is the reference without any parsing.
+
+usage:
+    python benchmarks/bench_lazy_json.py [--size 1024] [--number 200]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functionapprest import create_functionapp_handler, Request, FunctionsContext  # noqa: E402
+
+
+def get_context() -> FunctionsContext:
+    return FunctionsContext(
+        function_directory=os.path.dirname(os.path.abspath(__file__)),
+        function_name='benchmark',
+        invocation_id='00000000-0000-0000-0000-000000000000',
+        bindings={}
+    )
+
+
+def get_request(path: str, size: int) -> Request:
+    records = [{'id': index, 'name': f"product {index}", 'tags': ['a', 'b']}
+               for index in range(size * 1024 // 48)]
+    req = Request('POST', f"http://localhost:7071/api{path}", params={'page': '1'})
+    req.set_body(json.dumps(records))
+    return req
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=1024, help='body size in KB')
+    parser.add_argument('--number', type=int, default=200)
+    args = parser.parse_args()
+
+    functionapp_handler = create_functionapp_handler()
+    functionapp_handler.handle('post', path='/raw/', load_json=False)(lambda req: 'ok')
+    functionapp_handler.handle('post', path='/ignore/')(lambda req: req.params)
+    functionapp_handler.handle('post', path='/query/')(lambda req: req.json['query'])
+    functionapp_handler.handle('post', path='/read/')(lambda req: {'count': len(req.json['body'])})
+    context = get_context()
+
+    print(f"{'route':>10}{'ms/request':>14}")
+    for path in ('/raw/', '/ignore/', '/query/', '/read/'):
+        req = get_request(path, args.size)
+        elapsed = min(timeit.repeat(lambda: functionapp_handler(req, context),
+                                    number=args.number, repeat=3))
+        print(f"{path:>10}{elapsed / args.number * 1e3:>14.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Time to dispatch a batch of trigger messages one by one or with dispatch_messages
+
+The loop case wraps every message in a `Request` and calls the dispatcher, like
+functions with many cardinality triggers had to do.
+
+usage:
+    python benchmarks/bench_messages.py [--messages 500] [--routes 50]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functionapprest import create_functionapp_handler, Request, FunctionsContext  # noqa: E402
+
+SCHEMA = {
+    '$schema': 'http://json-schema.org/draft-04/schema#',
+    'type': 'object',
+    'properties': {'body': {'type': 'object', 'required': ['name']}}
+}
+
+
+def get_context() -> FunctionsContext:
+    return FunctionsContext(
+        function_directory=os.path.dirname(os.path.abspath(__file__)),
+        function_name='benchmark',
+        invocation_id='00000000-0000-0000-0000-000000000000',
+        bindings={}
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--routes', type=int, default=50)
+    parser.add_argument('--number', type=int, default=5)
+    args = parser.parse_args()
+
+    functionapp_handler = create_functionapp_handler()
+    for index in range(args.routes):
+        functionapp_handler.handle('post', path=f"/events{index}/<int:id>", schema=SCHEMA)(
+            lambda req, id: {'id': id, 'name': req.json['body']['name']})
+    context = get_context()
+    messages = [json.dumps({'path': f"/events{index % args.routes}/{index % 5}",
+                            'body': {'name': f"event {index}"}}).encode('utf-8')
+                for index in range(args.messages)]
+
+    def loop():
+        for message in messages:
+            entry = json.loads(message)
+            req = Request('POST', f"http://localhost:7071/api{entry['path']}")
+            req.set_body(json.dumps(entry['body']))
+            functionapp_handler(req, context)
+
+    def batch():
+        functionapp_handler.dispatch_messages(messages, context)
+
+    print(f"{'case':>10}{'ms/batch':>12}{'us/message':>12}")
+    for name, func in (('loop', loop), ('batch', batch)):
+        elapsed = min(timeit.repeat(func, number=args.number, repeat=3)) / args.number
+        print(f"{name:>10}{elapsed * 1e3:>12.2f}{elapsed / args.messages * 1e6:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Cost of casting an azure.functions.HttpRequest into Request and CompactRequest
+
+For each body size, the construction is timed and its memory allocations are
+measured with tracemalloc, along with the time to read the attributes a
+dispatch reads. CompactRequest keeps a bytes body without copying it, so its
+allocations do not grow with the body.
+
+usage:
+    python benchmarks/bench_request.py [--sizes 0 1024 1048576] [--number 20000]
+"""
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from azure.functions import HttpRequest  # noqa: E402
+
+from functionapprest import Request, CompactRequest  # noqa: E402
+
+
+def get_http_request(size: int) -> HttpRequest:
+    return HttpRequest('post', 'http://localhost:7071/api/v1/products/12/',
+                       headers={'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'},
+                       params={'page': '2', 'ids': '1,2,3'}, route_params={}, body=b'x' * size)
+
+
+def allocated_bytes(request_class, http_request: HttpRequest, count: int = 100) -> float:
+    """Bytes allocated per request, the requests being kept alive."""
+    requests = []
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(count):
+        requests.append(request_class(http_request.method, http_request.url, request=http_request))
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / count
+
+
+def read_attributes(req) -> None:
+    req.method, req.url, req.headers, req.params, req.route_params, req.json, req.timer
+    req.get_body()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[0, 1024, 1024 * 1024],
+                        help='body sizes in bytes')
+    parser.add_argument('--number', type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'class':<16}{'body':>10}{'cast us':>10}{'read us':>10}{'bytes/req':>12}")
+    for size in args.sizes:
+        http_request = get_http_request(size)
+        number = args.number if size < 1024 * 1024 else max(1, args.number // 100)
+        for request_class in (Request, CompactRequest):
+            cast = min(timeit.repeat(
+                lambda: request_class(http_request.method, http_request.url, request=http_request),
+                number=number, repeat=5)) / number * 1e6
+            req = request_class(http_request.method, http_request.url, request=http_request)
+            read = min(timeit.repeat(lambda: read_attributes(req),
+                                     number=args.number, repeat=5)) / args.number * 1e6
+            allocated = allocated_bytes(request_class, http_request)
+            print(f"{request_class.__name__:<16}{size:>10}{cast:>10.2f}{read:>10.2f}"
+                  f"{allocated:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
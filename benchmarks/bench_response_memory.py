@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Peak memory and time of building a large list response and calling to_json
+
+The legacy case reproduces the previous behaviour: the list is kept by the
+response and serialized again by every to_json call.
+
+usage:
+    python benchmarks/bench_response_memory.py [--records 100000]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functionapprest import create_functionapp_handler, _json_serial  # noqa: E402
+
+
+def get_payload(records: int) -> list:
+    return [{'id': index, 'name': f"product {index}", 'price': index * 1.25, 'tags': ['a', 'b']}
+            for index in range(records)]
+
+
+def run(records: int, build_response) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = build_response(get_payload(records))
+    for _ in range(2):
+        response.to_json()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, retained, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=100000)
+    args = parser.parse_args()
+
+    Response = create_functionapp_handler().Response
+
+    class LegacyResponse(Response):
+        def __init__(self, body):
+            super(LegacyResponse, self).__init__(body)
+            self.legacy_json = body
+
+        def get_body_string(self):
+            return json.dumps(self.legacy_json, default=_json_serial)
+
+    cases = (
+        ('legacy', LegacyResponse),
+        ('keep_json', lambda body: Response(body, keep_json=True)),
+        ('encoded', Response),
+    )
+    print(f"{'case':<12}{'peak MB':>10}{'retained MB':>14}{'seconds':>10}")
+    for name, build_response in cases:
+        peak, retained, elapsed = run(args.records, build_response)
+        print(f"{name:<12}{peak / 2 ** 20:>10.1f}{retained / 2 ** 20:>14.1f}{elapsed:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Route dispatch cost as the number of registered routes grows
+
+usage:
+    python benchmarks/bench_routing.py [--number 2000]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.routing import Map, Rule  # noqa: E402
+
+from functionapprest.routing import Router  # noqa: E402
+
+
+def get_map(route_count: int) -> Map:
+    url_map = Map()
+    for index in range(route_count // 2):
+        url_map.add(Rule(f"/resource{index}/list", endpoint=index, methods=['get']))
+        url_map.add(Rule(f"/resource{index}/<int:id>/", endpoint=index, methods=['get']))
+    url_map.add(Rule('/<path:path>', endpoint='catch-all', methods=['put']))
+    return url_map
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'routes':>8}{'werkzeug':>14}{'router':>14}  (us/match)")
+    for route_count in (10, 100, 500, 1000, 2000):
+        url_map = get_map(route_count)
+        router = Router(get_map(route_count))
+        last = route_count // 2 - 1
+        paths = [f"/resource{last}/list", f"/resource{last}/1234/", '/missing/route/']
+        methods = ['get', 'get', 'put']
+
+        def werkzeug_dispatch():
+            for path, method in zip(paths, methods):
+                url_map.bind('').match(path, method=method, return_rule=True)
+
+        def router_dispatch():
+            for path, method in zip(paths, methods):
+                router.match(path, method)
+
+        results = []
+        for func in (werkzeug_dispatch, router_dispatch):
+            func()
+            best = min(timeit.repeat(func, number=args.number, repeat=3)) / args.number
+            results.append(best / len(paths) * 1e6)
+        print(f"{route_count:>8}{results[0]:>14.2f}{results[1]:>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Peak memory of exporting records as a list or as a streamed generator
+
+The list case materializes every record before encoding them. The streamed
+cases encode a generator chunk by chunk: `iter_body` is what the host reads when
+it supports streaming, and `get_body` joins the chunks for hosts which need the
+whole body.
+
+usage:
+    python benchmarks/bench_streaming.py [--records 100000 500000]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functionapprest import create_functionapp_handler  # noqa: E402
+
+
+def get_record(index: int) -> dict:
+    return {'id': index, 'name': f"product {index}", 'price': index * 1.25, 'tags': ['a', 'b']}
+
+
+def run(consume) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = consume()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, nargs='+', default=[100000, 500000])
+    args = parser.parse_args()
+
+    Response = create_functionapp_handler().Response
+
+    def cases(records: int):
+        def listed():
+            return len(Response([get_record(index) for index in range(records)]).get_body())
+
+        def streamed_chunks():
+            response = Response(get_record(index) for index in range(records))
+            return sum(len(chunk) for chunk in response.iter_body())
+
+        def streamed_joined():
+            return len(Response(get_record(index) for index in range(records)).get_body())
+
+        return (('list', listed), ('iter_body', streamed_chunks), ('get_body', streamed_joined))
+
+    print(f"{'records':>10}{'case':>12}{'body MB':>10}{'peak MB':>10}{'seconds':>10}")
+    for records in args.records:
+        for name, consume in cases(records):
+            peak, elapsed, size = run(consume)
+            print(f"{records:>10}{name:>12}{size / 2 ** 20:>10.1f}{peak / 2 ** 20:>10.1f}"
+                  f"{elapsed:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
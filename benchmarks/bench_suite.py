@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""Regression suite for each phase of the dispatch hot path
+
+Every phase is timed on its own with synthetic requests and contexts, in
+microseconds per operation. The results are compared with the baseline stored
+in benchmarks/baseline.json and the script exits with status 1 when a metric is
+slower than the baseline by more than the threshold.
+
+Timings are divided by the time of a fixed pure python workload before being
+compared, so a baseline recorded on another machine is still meaningful.
+Record a new baseline with --save after an intended change.
+
+usage:
+    python benchmarks/bench_suite.py [--threshold 0.25] [--save] [--only route_match_1000]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from azure.functions import HttpRequest  # noqa: E402
+
+from functionapprest import (create_functionapp_handler, Request, CompactRequest, FunctionsContext,  # noqa: E402
+                             _json_load_query, _marshall_query_params, _request_path)
+from functionapprest.query import compile_query_coercers  # noqa: E402
+from functionapprest.routing import Router  # noqa: E402
+from functionapprest.validation import compile_validator  # noqa: E402
+from werkzeug.routing import Map, Rule  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+SCHEMA = {
+    '$schema': 'http://json-schema.org/draft-04/schema#',
+    'type': 'object',
+    'properties': {
+        'body': {
+            'type': 'object',
+            'required': ['name', 'price'],
+            'properties': {
+                'name': {'type': 'string', 'maxLength': 100},
+                'price': {'type': 'number', 'minimum': 0},
+                'tags': {'type': 'array', 'items': {'type': 'string'}},
+            }
+        },
+        'query': {'type': 'object'}
+    }
+}
+
+
+def get_context() -> FunctionsContext:
+    return FunctionsContext(
+        function_directory=os.path.dirname(os.path.abspath(__file__)),
+        function_name='benchmark',
+        invocation_id='00000000-0000-0000-0000-000000000000',
+        bindings={}
+    )
+
+
+def get_http_request() -> HttpRequest:
+    body = json.dumps({'name': 'product', 'price': 1.25, 'tags': ['a'] * 100}).encode('utf-8')
+    return HttpRequest('POST', 'http://localhost:7071/api/v1/products/12/',
+                       headers={'Content-Type': 'application/json'},
+                       params={'page': '2', 'ids': '1,2,3'}, route_params={}, body=body)
+
+
+def get_router(route_count: int) -> Router:
+    url_map = Map()
+    for index in range(route_count // 2):
+        url_map.add(Rule(f"/resource{index}/list", endpoint=index, methods=['get']))
+        url_map.add(Rule(f"/resource{index}/<int:id>/", endpoint=index, methods=['get']))
+    return Router(url_map)
+
+
+def calibration():
+    # fixed workload mixing the operations the hot path is made of
+    values = {}
+    for index in range(200):
+        key = f"key{index % 20}"
+        values[key] = values.get(key, 0) + len(str(index).split('1'))
+    return sorted(values.items())
+
+
+def get_metrics() -> dict:
+    """Functions to time, by metric name."""
+    metrics = {'calibration': calibration}
+    http_request = get_http_request()
+    metrics['request_cast'] = lambda: Request(http_request.method, http_request.url,
+                                              request=http_request)
+    metrics['request_cast_compact'] = lambda: CompactRequest(http_request.method, http_request.url,
+                                                             request=http_request)
+    metrics['path_normalization'] = lambda: _request_path(http_request.url)
+
+    for route_count in (10, 1000):
+        router = get_router(route_count)
+        path = f"/resource{route_count // 2 - 1}/1234/"
+        router.match(path, 'get')
+        metrics[f"route_match_{route_count}"] = (
+            lambda router, path: lambda: router.match(path, 'get'))(router, path)
+
+    params = {'page': '2', 'ids': '1,2,3', 'name': 'foo', 'flag': 'true', 'limit': '100'}
+    metrics['query_marshalling'] = lambda: _json_load_query(params)
+    metrics['query_marshalling_legacy'] = lambda: {
+        key: _marshall_query_params(value) for key, value in params.items()}
+    query_schema = {'properties': {'query': {'properties': {
+        'page': {'type': 'integer'}, 'ids': {'type': 'array', 'items': {'type': 'integer'}},
+        'name': {'type': 'string'}, 'flag': {'type': 'boolean'}, 'limit': {'type': 'integer'}}}}}
+    coercers = compile_query_coercers(query_schema)
+    metrics['query_coercion'] = lambda: _json_load_query(params, coercers=coercers)
+
+    instance = {'body': {'name': 'product', 'price': 1.25, 'tags': ['a'] * 100}, 'query': {}}
+    for backend in ('jsonschema', 'codegen'):
+        validator = compile_validator(SCHEMA, backend=backend)
+        metrics[f"schema_validation_{backend}"] = (
+            lambda validator: lambda: validator.validate(instance))(validator)
+
+    functionapp_handler = create_functionapp_handler()
+    functionapp_handler.handle('post', path='/products/<int:id>/')(lambda req, id: 'ok')
+    functionapp_handler.handle('post', path='/validated/<int:id>/',
+                               schema=SCHEMA)(lambda req, id: 'ok')
+    context = get_context()
+    request = Request(http_request.method, http_request.url, request=http_request)
+    validated_request = Request('POST', 'http://localhost:7071/api/validated/12/',
+                                request=http_request)
+    metrics['handler_invocation'] = lambda: functionapp_handler(request, context)
+    metrics['handler_invocation_validated'] = lambda: functionapp_handler(validated_request,
+                                                                          context)
+    options_request = Request('OPTIONS', 'http://localhost:7071/api/products/12/',
+                              request=http_request)
+    metrics['options_preflight'] = lambda: functionapp_handler(options_request, context)
+
+    Response = functionapp_handler.Response
+    payload = [{'id': index, 'name': f"product {index}", 'price': index * 1.25}
+               for index in range(100)]
+    metrics['response_serialization'] = lambda: Response(payload).to_json()
+    # copies of the default headers, with and without headers of the handler
+    metrics['response_default_headers'] = lambda: Response('ok')
+    extra_headers = {'X-Request-Id': '1', 'Cache-Control': 'no-cache'}
+    metrics['response_extra_headers'] = lambda: Response('ok', 200, extra_headers)
+    return metrics
+
+
+def measure(func, repeat: int, min_seconds: float) -> float:
+    """Best time of the function, in microseconds."""
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_seconds:
+            break
+        number *= 2 if elapsed * 10 > min_seconds else 10
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def load_baseline(path: str):
+    if not os.path.exists(path):
+        return None
+    with open(path) as baseline_file:
+        return json.load(baseline_file)
+
+
+def compare(results: dict, baseline: dict, threshold: float, normalize: bool) -> list:
+    """Metrics slower than the baseline by more than the threshold, printed along the way."""
+    regressions = []
+    scale = results['calibration'] / baseline['metrics']['calibration'] if normalize else 1.0
+    print(f"{'metric':<32}{'us':>10}{'baseline':>10}{'change':>9}")
+    for name, value in results.items():
+        if name == 'calibration' or name not in baseline['metrics']:
+            print(f"{name:<32}{value:>10.2f}")
+            continue
+        expected = baseline['metrics'][name] * scale
+        change = value / expected - 1
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<32}{value:>10.2f}{expected:>10.2f}{change:>+9.1%}"
+              f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='relative slowdown tolerated, 0.25 for 25%%')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--only', nargs='+', help='names of the metrics to run')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-seconds', type=float, default=0.05)
+    parser.add_argument('--no-normalize', action='store_true',
+                        help='compare raw timings, for baselines recorded on the same machine')
+    args = parser.parse_args()
+
+    metrics = get_metrics()
+    if args.only:
+        metrics = {name: func for name, func in metrics.items()
+                   if name in args.only or name == 'calibration'}
+    results = {name: measure(func, args.repeat, args.min_seconds) for name, func in metrics.items()}
+
+    if args.save:
+        baseline = {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'metrics': {name: round(value, 3) for name, value in results.items()},
+        }
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write('\n')
+        print(f"baseline saved to {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        for name, value in results.items():
+            print(f"{name:<32}{value:>10.2f}")
+        print(f"no baseline at {args.baseline}, run with --save to record one")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold, not args.no_normalize)
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}: "
+              f"{', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
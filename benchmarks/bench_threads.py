@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Dispatch throughput as the number of threads sharing one handler grows
+
+Every thread sends the same mix of requests (static, dynamic and OPTIONS
+routes, a POST with a body and an unmatched path) to a single handler and the
+responses are checked. With --sleep-ms the handlers wait like they would on
+I/O, releasing the GIL, and the throughput should grow with the threads; with
+CPU bound handlers it only grows on interpreters without a GIL.
+
+usage:
+    python benchmarks/bench_threads.py [--threads 1 2 4 8 16] [--requests 2000] [--sleep-ms 0]
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functionapprest import create_functionapp_handler, Request, FunctionsContext  # noqa: E402
+
+REQUESTS = [
+    ('GET', '/products/7/', None, b'{"id": 7}'),
+    ('POST', '/products/8/', b'{"a": 1}', b'{"id": 8, "body": {"a": 1}}'),
+    ('GET', '/products/', None, b'[1, 2]'),
+    ('OPTIONS', '/products/7/', None, b'{"allow": "GET,POST"}'),
+    ('GET', '/missing/', None, None),
+]
+
+
+def get_functionapp_handler(sleep: float):
+    functionapp_handler = create_functionapp_handler(headers={'X-Service': 'products'})
+
+    @functionapp_handler.handle('get', path='/products/<int:id>/')
+    def get_product(req, id):
+        if sleep:
+            time.sleep(sleep)
+        return {'id': id}
+
+    @functionapp_handler.handle('post', path='/products/<int:id>/')
+    def post_product(req, id):
+        return {'id': id, 'body': req.json['body']}
+
+    @functionapp_handler.handle('get', path='/products/')
+    def list_products(req):
+        return [1, 2]
+
+    functionapp_handler.warmup()
+    return functionapp_handler
+
+
+def send(functionapp_handler, method: str, path: str, body: bytes = None):
+    event = Request(method, f"http://localhost:7071/api{path}")
+    if body is not None:
+        event.set_body(body)
+    context = FunctionsContext(function_directory='/home/serverless/products',
+                               function_name='products',
+                               invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b', bindings={})
+    return functionapp_handler(event, context)
+
+
+def run(functionapp_handler, thread_count: int, requests: int) -> tuple:
+    """Requests per second and number of wrong responses."""
+    per_thread = max(1, requests // thread_count)
+    barrier = threading.Barrier(thread_count + 1)
+    errors = []
+
+    def dispatch():
+        barrier.wait()
+        for index in range(per_thread):
+            method, path, body, expected = REQUESTS[index % len(REQUESTS)]
+            response = send(functionapp_handler, method, path, body)
+            if expected is not None and response.get_body() != expected:
+                errors.append((method, path))
+            elif expected is None and response.status_code != 404:
+                errors.append((method, path))
+
+    threads = [threading.Thread(target=dispatch) for _ in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return per_thread * thread_count / elapsed, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--requests', type=int, default=2000, help='requests sent per thread count')
+    parser.add_argument('--sleep-ms', type=float, default=0, help='time the GET handler waits')
+    args = parser.parse_args()
+    # the unmatched path logs a warning on every request
+    logging.disable(logging.WARNING)
+
+    functionapp_handler = get_functionapp_handler(args.sleep_ms / 1e3)
+    print(f"{'threads':>8}{'req/s':>12}{'speedup':>10}{'errors':>8}")
+    single = None
+    failures = 0
+    for thread_count in args.threads:
+        throughput, errors = run(functionapp_handler, thread_count, args.requests)
+        single = single or throughput
+        failures += errors
+        print(f"{thread_count:>8}{throughput:>12.0f}{throughput / single:>10.2f}{errors:>8}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
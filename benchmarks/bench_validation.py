@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""Per-request cost of schema validation with each validator backend
+
+usage:
+    python benchmarks/bench_validation.py [--number 200]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jsonschema import validate, FormatChecker  # noqa: E402
+
+from functionapprest.validation import CompiledValidator, GeneratedValidator  # noqa: E402
+
+
+def get_schema(depth: int = 3, width: int = 8) -> dict:
+    item = {
+        'type': 'object',
+        'properties': {
+            'id': {'type': 'integer', 'minimum': 0},
+            'name': {'type': 'string', 'maxLength': 64},
+            'created': {'type': 'string', 'format': 'date-time'},
+            'tags': {'type': 'array', 'items': {'type': 'string'}},
+        },
+        'required': ['id', 'name']
+    }
+    for level in range(depth):
+        item = {
+            'type': 'object',
+            'properties': {f"field_{level}_{index}": item for index in range(width)}
+        }
+    return {
+        '$schema': 'http://json-schema.org/draft-04/schema#',
+        'type': 'object',
+        'properties': {'body': item, 'query': {'type': 'object'}}
+    }
+
+
+def get_instance(depth: int = 3, width: int = 8) -> dict:
+    item = {'id': 1, 'name': 'foo', 'created': '2019-02-21T10:00:00Z', 'tags': ['a', 'b']}
+    for level in range(depth):
+        item = {f"field_{level}_{index}": item for index in range(width)}
+    return {'body': item, 'query': {}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=200)
+    args = parser.parse_args()
+
+    schema = get_schema()
+    instance = get_instance()
+    format_checker = FormatChecker()
+    validator = CompiledValidator(schema, format_checker=format_checker)
+    generated = GeneratedValidator(schema, format_checker=format_checker)
+
+    cases = (
+        ('jsonschema.validate', lambda: validate(instance, schema, format_checker=format_checker)),
+        ('compiled validator', lambda: validator.validate(instance)),
+        ('generated validator', lambda: generated.validate(instance)),
+    )
+    for name, func in cases:
+        best = min(timeit.repeat(func, number=args.number, repeat=5)) / args.number
+        print(f"{name:<24}{best * 1e6:>12.1f} us/request")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,34 +1,44 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import json
 import os
 import logging
 import re
 import functools
+import sys
+import threading
+
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import MappingProxyType
+from urllib.parse import urlsplit, urlunsplit
 
-from datetime import datetime, date
-from jsonschema import validate, ValidationError, FormatChecker
-from werkzeug.routing import Map, Rule, NotFound
-from werkzeug.urls import url_parse
 from azure.functions import HttpRequest, HttpResponse, Context
 from azure.functions._http import HttpResponseHeaders
 
+from .cache import CachedResponse, CachePolicy, ResponseCache, get_cache_policy  # noqa: F401
+from .coalescing import AsyncSingleFlight, SingleFlight
+from .codec import JsonCodec, _json_serial, get_json_codec  # noqa: F401
+from .compression import Compression
+from .conditional import (NOT_MODIFIED_HEADERS, body_etag, coded_etag, format_etag, get_etag_mode,
+                          http_date, is_not_modified)
+from .metrics import PROMETHEUS_CONTENT_TYPE, MetricsRegistry
+from .profiling import Profiler
+from .query import (compile_query_coercers, load_query, float_cast as _float_cast,  # noqa: F401
+                    marshall_query_value as _marshall_query_params)
+from .routing import Router, allow_header
+from .streaming import DEFAULT_BUFFER_SIZE, get_stream_format, to_host_response  # noqa: F401
+from .timing import PhaseTimer, server_timing as format_server_timing
+from .validation import compile_validator, get_validator_class
+
 
-__validate_kwargs = {'format_checker': FormatChecker()}
 __required_keys = ['method', 'url']
 __default_headers = {
     'Content-Type': 'application/json'
 }
 
 
-def _json_serial(obj):
-    """JSON serializer for objects not serializable by default json code"""
-
-    if isinstance(obj, (datetime, date)):
-        return obj.isoformat()
-    # raise TypeError("Type %s not serializable" % type(obj))
-    return str(obj)
-
-
 class FunctionsContext(Context):
     """Class to extend a context with additional setters"""
 
@@ -100,8 +110,10 @@ class Request(HttpRequest):
             body = kwargs.get('body', b'')
         self.set_body(body or b'')
         self.__json = kwargs.get('json', {})
+        self.__json_loader = None
         self.__context = kwargs.get('context', {})
         self.__proxy = kwargs.get('proxy', None)
+        self.__timer = kwargs.get('timer', None)
 
         self.__charset = 'utf-8'
 
@@ -153,14 +165,24 @@ class Request(HttpRequest):
 
     @property
     def json(self) -> dict:
+        loader = self.__json_loader
+        if loader is not None:
+            # kept until it succeeds, so a failed parse raises again
+            self.__json = loader()
+            self.__json_loader = None
         return self.__json
 
     @json.setter
     def json(self, val: dict = None):
         if val is None:
             val = dict()
+        self.__json_loader = None
         self.__json = val
 
+    def set_json_loader(self, loader) -> None:
+        """Set `json` to the dict returned by `loader()`, called on first access."""
+        self.__json_loader = loader
+
     @property
     def context(self) -> object:
         return self.__context
@@ -171,6 +193,14 @@ class Request(HttpRequest):
             val = {}
         self.__context = val
 
+    @property
+    def timer(self) -> PhaseTimer:
+        return self.__timer
+
+    @timer.setter
+    def timer(self, val: PhaseTimer = None):
+        self.__timer = val
+
     @property
     def proxy(self) -> str:
         return self.__proxy
@@ -197,17 +227,145 @@ class Request(HttpRequest):
         self.__body_bytes = bytes(body)
 
 
-def _float_cast(value):
+class CompactRequest(Request):
+    """Class of the requests built by the dispatcher, a lighter `Request`
+
+    The attributes read on every request are slots instead of properties, so
+    reading them costs no python call, and the method is upper-cased once,
+    when it is set. Like with `Request`, assigning None to the headers,
+    params, route params, json or context stores an empty dict. A body given
+    as bytes is kept as is instead of being copied, other bodies, memoryview
+    included, are copied to bytes.
+    """
+
+    __slots__ = ('_method', 'url', '_headers', '_params', '_route_params', '_json',
+                 '_json_loader', '_context', 'proxy', 'timer', '_body')
+
+    def __init__(self,
+                 method: str,
+                 url: str,
+                 request: HttpRequest = None,
+                 **kwargs) -> None:
+        self._method = method if method.isupper() else method.upper()
+        self.url = url
+        if request is not None and isinstance(request, HttpRequest):
+            self.headers = request.headers
+            self.params = request.params
+            self.route_params = request.route_params
+            body = request.get_body()
+        else:
+            self.headers = kwargs.get('headers')
+            self.params = kwargs.get('params')
+            self.route_params = kwargs.get('route_params')
+            body = kwargs.get('body', b'')
+        self.set_body(body or b'')
+        self.json = kwargs.get('json')
+        self.context = kwargs.get('context')
+        self.proxy = kwargs.get('proxy', None)
+        self.timer = kwargs.get('timer', None)
+
+    @property
+    def method(self) -> str:
+        return self._method
+
+    @method.setter
+    def method(self, val: str):
+        self._method = val if val.isupper() else val.upper()
+
+    @property
+    def headers(self) -> dict:
+        return self._headers
+
+    @headers.setter
+    def headers(self, val: dict = None):
+        if val is None:
+            val = dict()
+        self._headers = val
+
+    @property
+    def params(self) -> dict:
+        return self._params
+
+    @params.setter
+    def params(self, val: dict = None):
+        if val is None:
+            val = dict()
+        self._params = val
+
+    @property
+    def route_params(self) -> dict:
+        return self._route_params
+
+    @route_params.setter
+    def route_params(self, val: dict = None):
+        if val is None:
+            val = dict()
+        self._route_params = val
+
+    @property
+    def context(self) -> object:
+        return self._context
+
+    @context.setter
+    def context(self, val: object = None):
+        if val is None:
+            val = dict()
+        self._context = val
+
+    @property
+    def json(self) -> dict:
+        loader = self._json_loader
+        if loader is not None:
+            # kept until it succeeds, so a failed parse raises again
+            self._json = loader()
+            self._json_loader = None
+        return self._json
+
+    @json.setter
+    def json(self, val: dict = None):
+        self._json_loader = None
+        if val is None:
+            val = dict()
+        self._json = val
+
+    def set_json_loader(self, loader) -> None:
+        self._json_loader = loader
+
+    def get_body(self) -> bytes:
+        return self._body
+
+    def get_json(self):
+        return json.loads(self._body.decode())
+
+    def set_body(self, body):
+        if type(body) is bytes:
+            self._body = body
+            return
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+
+        if not isinstance(body, (bytes, bytearray, memoryview)):
+            raise TypeError(
+                f"response is expected to be either of "
+                f"str, bytes, or bytearray, got {type(body).__name__}")
+
+        self._body = bytes(body)
+
+
+def _function_json_path(function_directory: str) -> str:
+    return os.path.join(function_directory, 'function.json')
+
+
+def _function_json_mtime(function_directory: str):
     try:
-        return float(value)
+        return os.stat(_function_json_path(function_directory)).st_mtime_ns
     except Exception:
-        pass
-    return value
+        return None
 
 
-def _load_function_json(context: FunctionsContext):
+def _load_function_json(function_directory: str):
     try:
-        json_path = os.path.join(context.function_directory, 'function.json')
+        json_path = _function_json_path(function_directory)
         with open(json_path, 'r') as file_fd:
             function_json = json.load(file_fd)
             for binding in function_json.get('bindings'):
@@ -219,39 +377,199 @@ def _load_function_json(context: FunctionsContext):
     return {}
 
 
-def _marshall_query_params(value):
-    try:
-        value = json.loads(value)
-    except Exception:
-        value_cand = value.split(',')
-        if len(value_cand) > 1:
-            value = list(map(_float_cast, value_cand))
+class BindingsCache(object):
+    """Class to cache the http trigger binding of each function directory
+
+    The function.json is read at most once per function directory, unless
+    `check_mtime` is enabled, in which case it is read again whenever its
+    modification time changes.
+    The cached bindings are shared between invocations, and threads, so they
+    are read-only mappings.
+    """
+
+    def __init__(self, check_mtime: bool = False) -> None:
+        self.check_mtime = check_mtime
+        self.hits = 0
+        self.misses = 0
+        self.__entries = {}
+        self.__lock = threading.Lock()
+
+    def get(self, function_directory: str) -> dict:
+        """Http trigger binding of the function directory."""
+        entry = self.__entries.get(function_directory)
+        if entry is not None:
+            mtime, bindings = entry
+            if not self.check_mtime or mtime == _function_json_mtime(function_directory):
+                self.hits += 1
+                return bindings
+        self.misses += 1
+        return self.refresh(function_directory)
+
+    def preload(self, *function_directories: str) -> None:
+        """Load the bindings of the function directories ahead of the first invocation."""
+        for function_directory in function_directories:
+            if function_directory not in self.__entries:
+                self.refresh(function_directory)
+
+    def refresh(self, function_directory: str = None) -> dict:
+        """Read the function.json again, or drop every entry if no directory is given."""
+        if function_directory is None:
+            with self.__lock:
+                self.__entries = {}
+            return MappingProxyType({})
+        mtime = _function_json_mtime(function_directory) if self.check_mtime else None
+        bindings = MappingProxyType(_load_function_json(function_directory))
+        with self.__lock:
+            self.__entries[function_directory] = (mtime, bindings)
+        return bindings
+
+
+def _json_load_query(query, loads=json.loads, coercers=None):
+    return load_query(query, loads, coercers)
+
+
+def _imported_exception(module_name: str, name: str) -> tuple:
+    """Exception class of a lazily imported module, as a tuple to catch.
+
+    The tuple is empty while the module is not imported, nothing can have
+    raised the exception yet.
+    """
+    module = sys.modules.get(module_name)
+    return (getattr(module, name),) if module is not None else ()
+
+
+@functools.lru_cache(maxsize=None)
+def _format_checker():
+    # jsonschema is only imported by the apps with schemas
+    from jsonschema import FormatChecker
+    return FormatChecker()
+
+
+def _request_path(url: str) -> str:
+    """Path of the url without the route prefix and version, like /api/v1/."""
+    if not url:
+        return '/'
+    return re.sub(r"\/api\/(v(\d+\.)?(\*|\d+)\/)?", '/', urlsplit(url).path, flags=re.IGNORECASE)
+
+
+def _has_header(headers, name: str) -> bool:
+    name = name.lower()
+    return any(key.lower() == name for key in headers or ())
+
+
+def _request_header(req: Request, name: str, default=None):
+    # headers of the host are case insensitive, plain dicts may not be
+    headers = req.headers or {}
+    value = headers.get(name)
+    if value is None:
+        name = name.lower()
+        for key, item in headers.items():
+            if key.lower() == name:
+                return item
+        return default
     return value
 
 
-def _json_load_query(query):
-    query = query or {}
+def _merge_vary(headers, name: str) -> None:
+    vary = headers.get('Vary')
+    if not vary:
+        headers['Vary'] = name
+    elif name.lower() not in (item.strip().lower() for item in vary.split(',')):
+        headers['Vary'] = f"{vary}, {name}"
+
+
+# request headers which describe the batch itself, not its entries
+_BATCH_EXCLUDED_HEADERS = frozenset(['accept-encoding', 'content-length', 'content-type',
+                                     'content-encoding', 'if-none-match', 'if-modified-since'])
+
+
+def _check_concurrency(concurrency) -> None:
+    if isinstance(concurrency, bool) or not isinstance(concurrency, int) or concurrency < 1:
+        raise ValueError(f"Invalid concurrency {concurrency!r}, expected a positive integer")
+
+
+def _batch_schema(max_requests: int) -> dict:
+    return {
+        '$schema': 'http://json-schema.org/draft-04/schema#',
+        'type': 'object',
+        'properties': {
+            'body': {
+                'type': 'array',
+                'maxItems': max_requests,
+                'items': {
+                    'type': 'object',
+                    'required': ['path'],
+                    'properties': {
+                        'method': {'type': 'string'},
+                        'path': {'type': 'string', 'pattern': '^/'},
+                        'query': {'type': 'object'},
+                        'headers': {'type': 'object'},
+                    }
+                }
+            }
+        }
+    }
+
+
+def _batch_query_value(value) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, tuple)):
+        # arrays are comma separated, like in query strings
+        return ','.join(_batch_query_value(item) for item in value)
+    return json.dumps(value)
 
-    return {key: _marshall_query_params(value)
-            for key, value in query.items()}
 
+def _batch_request(req: Request, entry: dict, dumps_bytes) -> Request:
+    """Request of a batch entry, with the headers of the batch request."""
+    parsed_url = urlsplit(req.url or 'http://localhost')
+    url = urlunsplit((parsed_url.scheme, parsed_url.netloc, '/api' + entry['path'], '', ''))
+    headers = {key: value for key, value in (req.headers or {}).items()
+               if key.lower() not in _BATCH_EXCLUDED_HEADERS}
+    headers.update(entry.get('headers') or {})
+    params = {key: _batch_query_value(value) for key, value in (entry.get('query') or {}).items()}
+    body = entry.get('body')
+    return CompactRequest(entry.get('method', 'GET'), url, headers=headers, params=params,
+                          route_params={}, body=dumps_bytes(body) if body is not None else b'')
 
-def _options_response(req: Request, methods: list):
-    if not methods:
-        methods = req.context['bindings'].get('methods', [])
-    if 'OPTIONS' in methods:
-        methods.remove('OPTIONS')
-    if 'HEAD' in methods:
-        methods.remove('HEAD')
-    allowed_methods = ','.join(sorted(methods, key=str.upper))
-    allowed_methods = allowed_methods.upper()
-    body = {
-        'allow': allowed_methods
+
+def _batch_result(response: HttpResponse) -> dict:
+    body = None
+    try:
+        body = response.json
+    except ValueError:
+        pass
+    if body is None:
+        body = response.get_body().decode(response.charset)
+    return {
+        'status_code': response.status_code or 200,
+        'headers': dict(response.headers or {}),
+        'body': body,
     }
-    headers = {
-        'Access-Control-Allow-Methods': allowed_methods
+
+
+def _message_entry(message, loads) -> dict:
+    """Request described by a trigger message: a dict, or JSON in the message body."""
+    if isinstance(message, dict):
+        entry = message
+    else:
+        body = message.get_body() if hasattr(message, 'get_body') else message
+        entry = loads(body)
+    if not isinstance(entry, dict) or not isinstance(entry.get('path'), str) \
+            or not entry['path'].startswith('/'):
+        raise ValueError('message is expected to be an object with a path starting with a slash')
+    return entry
+
+
+def _batch_error(status_code: int, message: str) -> dict:
+    return {
+        'status_code': status_code,
+        'headers': {},
+        'body': {
+            'statusCode': status_code,
+            'message': message,
+        }
     }
-    return (body, 200, headers)
 
 
 def default_error_handler(error, method: str):
@@ -266,7 +584,19 @@ def default_error_handler(error, method: str):
     }, 500)
 
 
-def create_functionapp_handler(error_handler=default_error_handler, headers=None):
+def _default_max_workers():
+    thread_count = os.environ.get('PYTHON_THREADPOOL_THREAD_COUNT', '')
+    return int(thread_count) if thread_count.isdigit() and int(thread_count) > 0 else None
+
+
+def create_functionapp_handler(error_handler=default_error_handler, headers=None,
+                               bindings_cache: BindingsCache = None, validator='jsonschema',
+                               async_mode=False, max_workers=None, json_codec='json',
+                               compression: Compression = None, etag=None,
+                               response_cache: ResponseCache = None, server_timing=False,
+                               on_request_complete=None, profiler: Profiler = None,
+                               metrics: MetricsRegistry = None, coerce_query=False,
+                               cors_max_age=None):
     """Create a functionapp handler function with `handle` decorator as attribute
 
     example:
@@ -286,8 +616,149 @@ def create_functionapp_handler(error_handler=default_error_handler, headers=None
     different http methods.
     The inner_handler is also able to validate incoming data using a specified
     JSON schema, please see http://json-schema.org for info.
+    Handlers may return iterators, generators for instance, which are encoded
+    item by item in chunks as a JSON array, or as newline delimited JSON with
+    `stream_format='ndjson'`.
+
+    bindings_cache:
+    Cache of the function.json http trigger bindings, a new one is created if
+    not given. It is exposed as `functionapp_handler.bindings_cache`, so the
+    bindings can be preloaded or refreshed explicitly.
+
+    validator:
+    Backend used to validate the JSON schemas, either `jsonschema` or `codegen`.
+    The `codegen` backend translates the supported subset of the schema keywords
+    into python functions and validates with jsonschema whatever it cannot
+    translate, raising the same errors as the default backend.
+
+    async_mode:
+    The dispatcher becomes a coroutine function, to be awaited on the event loop
+    of the functions worker. Handlers registered as `async def` are awaited and
+    the others run in a thread pool bounded by `max_workers`, which defaults to
+    the `PYTHON_THREADPOOL_THREAD_COUNT` environment variable.
+    Without async_mode, registering an `async def` handler raises TypeError.
+
+    json_codec:
+    Codec used to parse request bodies and query params and to serialize
+    responses: `json` (default), `orjson`, `ujson`, `auto` to pick the fastest
+    one installed, or a `functionapprest.codec.JsonCodec` instance.
+
+    coerce_query:
+    Convert the query params declared in the `query` properties of the route
+    schema to their declared type, instead of parsing them as JSON or comma
+    separated floats, so that `?name=123` stays a string for a string param.
+    Routes can override it with `handle(..., coerce_query=...)`. The params
+    of the routes without schema, and the undeclared ones, are parsed as
+    before, without raising exceptions for plain values.
+
+    cors_max_age:
+    Number of seconds browsers may cache the answer to a preflight request,
+    sent as the Access-Control-Max-Age header of the OPTIONS responses. The
+    OPTIONS responses list the methods of the routes matching the path, or
+    else of the function.json bindings; their Allow value is computed once
+    per route pattern and their body once per Allow value.
+
+    compression:
+    Compress the responses of the handlers with the coding negotiated from the
+    Accept-Encoding header, `True` for the defaults or a
+    `functionapprest.Compression` instance to set the minimum body size, level
+    and codings. Routes can opt out with `handle(..., compress=False)`.
+
+    etag:
+    Add an ETag computed from the encoded body to the 200 responses of GET
+    routes, `strong` (or `True`) or `weak`, and answer matching If-None-Match
+    and If-Modified-Since requests with an empty 304. Routes can override it
+    with `handle(..., etag=...)`. A route can also be given a cheap
+    `version(req, **kwargs)` hook returning a version or a datetime, which
+    becomes the ETag or the Last-Modified header, so that unchanged resources
+    are answered with 304 before the handler is called.
+
+    response_cache:
+    Cache of the encoded responses of the routes registered with
+    `handle(..., cache=ttl)` or `handle(..., cache=CachePolicy(...))`, a new one
+    is created if not given. Cached responses skip the handler, the
+    serialization and the schema validation. It is exposed as
+    `functionapp_handler.response_cache`.
+
+    Routes registered with `handle(..., coalesce=True)` run the handler once
+    for concurrent identical GET and HEAD requests (same method, path, route
+    arguments and query params), every waiting request receiving a copy of
+    the response or the raised error. Other methods are never coalesced.
+
+    handle_batch:
+    Registers an opt-in POST route, `/batch/` by default, dispatching each
+    entry of a JSON array of `{method, path, query, headers, body}` through the
+    same routes, validation and error handling, and responding with an array
+    of `{status_code, headers, body}`.
+
+    server_timing:
+    Add a Server-Timing header with the duration of each phase of the request:
+    request casting, bindings loading, routing, cache lookup, JSON parsing
+    and schema validation (for routes with a schema, the others parsing in the
+    handler), handler, serialization and response post-processing.
+
+    on_request_complete:
+    Function called as `on_request_complete(req, response, timings)` once each
+    request is complete, with the durations of the phases in seconds. More
+    callbacks can be registered with `functionapp_handler.on_request_complete`.
+    Requests are only timed if server_timing is set, callbacks are registered
+    or metrics are collected.
+
+    profiler:
+    Profile a sample of the handler calls, `True` for the defaults or a
+    `functionapprest.profiling.Profiler` instance to set the sampled fraction,
+    the latency threshold after which the next calls of a route are profiled
+    and the sampler, cProfile or a stack sampler. The profiles are aggregated
+    by route and exposed as `functionapp_handler.profiler`, `handle_profile`
+    registers an opt-in GET route dumping them.
+
+    metrics:
+    Collect the number of requests by status code and histograms of the
+    latency and of the request and response body sizes, by route and method,
+    `True` for the default buckets or a `functionapprest.metrics.MetricsRegistry`
+    instance. It is exposed as `functionapp_handler.metrics` and
+    `handle_metrics` registers an opt-in GET route exporting them in the
+    Prometheus text format.
+
+    warmup:
+    Builds the routes, runs the validators and loads the bindings and codecs
+    ahead of the first request. jsonschema and werkzeug are otherwise only
+    imported once a schema is registered and once the first request is routed.
+
+    dispatch_messages:
+    Entry point for non http triggers with many cardinality, like event hubs
+    or service bus, dispatching a list of messages through the routes with
+    the same kind of results as `handle_batch`.
     """
-    url_maps = Map()
+    # fail early for unknown backends, before any route is registered
+    get_validator_class(validator)
+    json_codec = get_json_codec(json_codec)
+    default_etag = get_etag_mode(etag)
+    default_coerce_query = coerce_query
+    if cors_max_age is not None and (isinstance(cors_max_age, bool) or
+                                     not isinstance(cors_max_age, int) or cors_max_age < 0):
+        raise ValueError(f"Invalid cors_max_age {cors_max_age!r}, expected a number of seconds")
+    if compression is True:
+        compression = Compression()
+    elif compression is False:
+        compression = None
+    if profiler is True:
+        profiler = Profiler()
+    elif profiler is False:
+        profiler = None
+    if metrics is True:
+        metrics = MetricsRegistry()
+    elif metrics is False:
+        metrics = None
+    router = Router()
+    if bindings_cache is None:
+        bindings_cache = BindingsCache()
+    if response_cache is None:
+        response_cache = ResponseCache()
+    single_flight = SingleFlight()
+    # replaced, never changed in place, so requests iterate over it without a lock
+    request_callbacks = (on_request_complete,) if on_request_complete is not None else ()
+    async_single_flight = AsyncSingleFlight()
     if headers is None:
         headers = __default_headers
     default_headers = HttpResponseHeaders(headers)
@@ -296,6 +767,9 @@ def create_functionapp_handler(error_handler=default_error_handler, headers=None
             'Access-Control-Allow-Headers': '*',
             'Access-Control-Allow-Origin': '*'
         })
+    # read-only snapshot, each response copies it into headers of its own
+    default_headers = MappingProxyType(dict(default_headers.items()))
+    default_content_type = default_headers.get('content-type')
 
     class Response(HttpResponse):
         """Class to conceptualize a response with default attributes
@@ -305,26 +779,185 @@ def create_functionapp_handler(error_handler=default_error_handler, headers=None
         """
 
         def __init__(self, body=None, status_code=None, headers=None, *,
-                    mimetype='application/json', charset='utf-8'):
-            self.json = None
+                     mimetype=None, charset='utf-8', keep_json=False, stream_format='json',
+                     buffer_size=DEFAULT_BUFFER_SIZE):
+            # the encoded body is the single source of truth, dicts and lists
+            # are only kept if asked for
+            self.__json = None
+            self.__json_encoded = False
+            self.__body_string = None
+            self.__chunks = None
+            self.__streamed_body = None
+            self.__coding = None
+            self.__identity_body = None
+            self.__compressed_body = None
+            # body encoded again when `json` is set
+            self.__json_body = None
             if isinstance(body, (dict, list)):
-                self.json = body
-                body = json.dumps(body, default=_json_serial)
-            original_headers = headers or {}
-            headers = default_headers
-            headers.update(original_headers)
-            super(Response, self).__init__(body, status_code=status_code, headers=headers, mimetype=mimetype, charset=charset)
+                if keep_json:
+                    self.__json = body
+                if not body:
+                    self.__body_string = ''
+                self.__json_encoded = True
+                if charset == 'utf-8':
+                    body = json_codec.dumps_bytes(body)
+                else:
+                    body = json_codec.dumps(body)
+            elif isinstance(body, Iterator):
+                # iterators are encoded item by item, when the body is read
+                iter_chunks, stream_mimetype = get_stream_format(stream_format)
+                if charset == 'utf-8':
+                    encode = json_codec.dumps_bytes
+                else:
+                    def encode(item):
+                        return json_codec.dumps(item).encode(charset)
+                self.__chunks = iter_chunks(body, encode, buffer_size)
+                self.__json_encoded = True
+                mimetype = mimetype or stream_mimetype
+                body = None
+            if (mimetype is not None and default_content_type and
+                    not _has_header(headers, 'Content-Type')):
+                # the host only uses the mimetype without a Content-Type header,
+                # so the default one is replaced by the mimetype
+                content_type = mimetype
+                if mimetype.startswith('text/'):
+                    content_type = f"{mimetype}; charset={charset}"
+                if content_type != default_content_type:
+                    headers = dict(headers or {}, **{'Content-Type': content_type})
+            if headers:
+                merged_headers = dict(default_headers)
+                # lowercased by the host headers, the last spelling of a name wins
+                merged_headers.update(headers)
+                headers = merged_headers
+            else:
+                headers = default_headers
+            super(Response, self).__init__(body, status_code=status_code, headers=headers,
+                                           mimetype=mimetype or 'application/json', charset=charset)
+
+        @property
+        def streamed(self) -> bool:
+            """Whether the body is encoded from an iterator."""
+            return self.__chunks is not None or self.__streamed_body is not None
+
+        def iter_body(self):
+            """Body as chunks of bytes, encoded on the fly for streamed bodies.
+
+            The chunks of a streamed body can only be iterated once, unless the
+            body was already read with `get_body`.
+            """
+            chunks = self.__chunks
+            if chunks is None:
+                yield self.get_body()
+                return
+            self.__chunks = None
+            try:
+                yield from chunks
+            except Exception:
+                # raised while the host reads the body, after the dispatcher returned
+                logging.exception('Streamed response body failed')
+                raise
+
+        def get_body(self) -> bytes:
+            """Response body as bytes, streamed bodies being joined on first call."""
+            if self.__compressed_body is not None:
+                return self.__compressed_body
+            if self.__chunks is not None:
+                body = bytearray()
+                for chunk in self.iter_body():
+                    body += chunk
+                self.__streamed_body = bytes(body)
+            if self.__streamed_body is not None:
+                return self.__streamed_body
+            if self.__json_body is not None:
+                return self.__json_body
+            return super(Response, self).get_body()
+
+        def compress(self, compression: Compression, coding, compressed: bytes = None) -> bool:
+            """Compress the body with the coding and set the Content-Encoding header.
+
+            Bodies already encoded, or smaller than the minimum size of the
+            compression, are left as they are. The compressed body can be given
+            if it is already known.
+            """
+            if self.__coding is not None or 'Content-Encoding' in self.headers:
+                return False
+            if self.__chunks is not None:
+                self.__chunks = compression.compress_chunks(coding, self.__chunks)
+            else:
+                body = self.get_body()
+                if len(body) < compression.min_size:
+                    return False
+                self.__identity_body = body
+                if compressed is None:
+                    compressed = compression.compress(coding, body)
+                self.__compressed_body = compressed
+            self.__coding = coding
+            self.headers['Content-Encoding'] = coding.name
+            return True
+
+        def to_cached(self) -> CachedResponse:
+            """Encoded parts of the response, to be restored with `from_cached`."""
+            return CachedResponse(self.get_body(), self.status_code, dict(self.headers),
+                                  self.mimetype, self.charset, self.__json_encoded,
+                                  self.__body_string == '')
+
+        @classmethod
+        def from_cached(cls, cached: CachedResponse) -> 'Response':
+            response = cls(cached.body, cached.status_code, mimetype=cached.mimetype,
+                           charset=cached.charset)
+            response.__json_encoded = cached.json_encoded
+            if cached.empty:
+                response.__body_string = ''
+            response.headers.update(cached.headers)
+            return response
+
+        @property
+        def json(self):
+            """Body given as dict or list, decoded from the body unless kept with `keep_json`."""
+            if self.__json is None and self.__json_encoded:
+                return json_codec.loads(self.get_body())
+            return self.__json
+
+        @json.setter
+        def json(self, val):
+            """Replace the body with the encoding of a dict or list."""
+            if not isinstance(val, (dict, list)):
+                raise TypeError(
+                    f"json is expected to be a dict or a list, got {type(val).__name__}")
+            if self.__coding is not None:
+                del self.headers['Content-Encoding']
+            self.__chunks = None
+            self.__streamed_body = None
+            self.__coding = None
+            self.__identity_body = None
+            self.__compressed_body = None
+            self.__json = val
+            self.__json_encoded = True
+            self.__body_string = '' if not val else None
+            if self.charset == 'utf-8':
+                self.__json_body = json_codec.dumps_bytes(val)
+            else:
+                self.__json_body = json_codec.dumps(val).encode(self.charset)
 
         def get_body_string(self) -> str:
-            """Response body as a string."""
-
-            body = self.json
-            if body is None:
-                body_bytes = self.get_body() or b''
-                body = body_bytes.decode(self.charset)
-            if body:
-                return json.dumps(body, default=_json_serial)
-            return ''
+            """Response body as a JSON string."""
+
+            body_string = self.__body_string
+            if body_string is None:
+                if self.__coding is None:
+                    body_bytes = self.get_body() or b''
+                elif self.__identity_body is not None:
+                    body_bytes = self.__identity_body
+                else:
+                    body_bytes = self.__coding.decompress(self.get_body())
+                body_string = body_bytes.decode(self.charset)
+                if self.__json_encoded:
+                    # already JSON, not cached to avoid keeping a copy of the body
+                    return body_string
+                if body_string:
+                    body_string = json_codec.dumps(body_string)
+                self.__body_string = body_string
+            return body_string
 
         def to_json(self):
             return {
@@ -333,25 +966,59 @@ def create_functionapp_handler(error_handler=default_error_handler, headers=None
                 'headers': dict(self.headers or {})
             }
 
-    def inner_functionapp_handler(req: Request, context: FunctionsContext):
+    executor_lock = threading.Lock()
+    executors = []
+    if max_workers is None:
+        max_workers = _default_max_workers()
+
+    @functools.lru_cache(maxsize=None)
+    def cached_options_response(allowed_methods: str) -> CachedResponse:
+        # encoded once per Allow value, each response is restored from it
+        headers = {'Access-Control-Allow-Methods': allowed_methods}
+        if cors_max_age is not None:
+            headers['Access-Control-Max-Age'] = str(cors_max_age)
+        return Response({'allow': allowed_methods}, 200, headers).to_cached()
+
+    def options_response(req: Request, path: str) -> Response:
+        allowed_methods, pattern = router.allow(path)
+        timer = req.timer
+        if timer is not None:
+            # preflights are counted with the route they are sent for
+            timer.route = pattern
+            timer.mark('routing')
+        if allowed_methods is None:
+            allowed_methods = allow_header(req.context.bindings.get('methods', ()))
+        return Response.from_cached(cached_options_response(allowed_methods))
+
+    def get_executor() -> ThreadPoolExecutor:
+        if not executors:
+            with executor_lock:
+                if not executors:
+                    executors.append(ThreadPoolExecutor(max_workers=max_workers))
+        return executors[0]
+
+    def prepare_dispatch(req: Request, context: FunctionsContext, timer: PhaseTimer = None):
         # check if running as Azure Functions
         if not isinstance(req, (HttpRequest, Request)):
             message = 'Bad request, maybe not using azure functions?'
             logging.error(message)
             return Response(message, 500)
 
-        # Casting from Azure HttpRequest to our Request implementation
-        if isinstance(req, HttpRequest):
-            req = Request(req.method, req.url, request=req)
+        # Casting from Azure HttpRequest to our Request implementation,
+        # requests which already are ours are used as they are
+        if not isinstance(req, Request):
+            req = CompactRequest(req.method, req.url, request=req)
+        req.timer = timer
+        if timer is not None:
+            timer.mark('request')
 
         # Save context within req for easy access
-        context.bindings = _load_function_json(context)
+        context.bindings = bindings_cache.get(context.function_directory)
         req.context = context
+        if timer is not None:
+            timer.mark('bindings')
 
-        path = '/'
-        url = req.url
-        if url:
-            path = re.sub(r"\/api\/(v(\d+\.)?(\*|\d+)\/)?", '/', url_parse(url).path, flags=re.IGNORECASE)
+        path = _request_path(req.url)
 
         route = context.bindings.get('route', path)
 
@@ -370,20 +1037,20 @@ def create_functionapp_handler(error_handler=default_error_handler, headers=None
         }, 500)
         logging_message = "[%s][{status_code}]: {message}" % method_name
         try:
-            # bind the mapping to an empty server name
-            mapping = url_maps.bind('')
             if method_name == 'options':
-                body, status_code, headers = _options_response(req, mapping.allowed_methods(path))
-                return Response(body, status_code, headers)
-            rule, kwargs = mapping.match(path, method=method_name, return_rule=True)
+                return options_response(req, path)
+            rule, kwargs = router.match(path, method_name)
             func = rule.endpoint
+            if timer is not None:
+                timer.route = rule.rule
+                timer.mark('routing')
 
             # if this is a catch-all rule, don't send any kwargs
             if rule.rule == '/<path:path>':
                 kwargs = {}
             # if req.proxy is not None:
             #     req.route_params = kwargs
-        except NotFound as e:
+        except _imported_exception('werkzeug.exceptions', 'NotFound') as e:
             logging.warning(logging_message.format(
                 status_code=404, message=str(e)))
             error_tuple = ({
@@ -391,67 +1058,372 @@ def create_functionapp_handler(error_handler=default_error_handler, headers=None
                 'message': str(e),
             }, 404)
 
+        return req, func, path, kwargs, error_tuple
+
+    def make_response(response, stream_format='json') -> Response:
+        if not isinstance(response, Response):
+            # Set defaults
+            status_code = headers = None
+
+            if isinstance(response, tuple):
+                response_len = len(response)
+                if response_len > 3:
+                    raise ValueError(
+                        'Response tuple has more than 3 items')
+
+                # Unpack the tuple, missing items will be defaulted
+                body, status_code, headers = response + (None,) * (
+                    3 - response_len)
+
+            else:  # if response is string, dict, etc.
+                body = response
+            response = Response(body, status_code, headers, stream_format=stream_format)
+        return response
+
+    def get_coding(req: Request, func):
+        if compression is None or not func.compress:
+            return None
+        return compression.negotiate(_request_header(req, 'Accept-Encoding'))
+
+    def is_conditional_match(req: Request, headers) -> bool:
+        return is_not_modified(_request_header(req, 'If-None-Match'),
+                               _request_header(req, 'If-Modified-Since'),
+                               headers.get('ETag'), headers.get('Last-Modified'))
+
+    def not_modified_response(headers) -> Response:
+        response = Response(None, 304)
+        for name in NOT_MODIFIED_HEADERS:
+            if name in headers:
+                response.headers[name] = headers[name]
+        return response
+
+    def get_version_headers(req: Request, func, kwargs: dict) -> dict:
+        """Validator headers from the version hook of the route, if any, with
+        the ETag of the identity coding."""
+        if func.version is None or req.method not in ('GET', 'HEAD'):
+            return {}
+        version = func.version(req, **kwargs)
+        if version is None:
+            return {}
+        headers = {}
+        if compression is not None and func.compress:
+            headers['Vary'] = 'Accept-Encoding'
+        if isinstance(version, datetime):
+            headers['Last-Modified'] = http_date(version)
+            return headers
+        headers['ETag'] = format_etag(version, func.etag != 'strong')
+        return headers
+
+    def coded_version_headers(req: Request, func, version_headers: dict) -> dict:
+        """Version headers with the ETag of the coding negotiated for the request."""
+        coding = get_coding(req, func) if 'ETag' in version_headers else None
+        if coding is None:
+            return version_headers
+        return dict(version_headers, ETag=coded_etag(version_headers['ETag'], coding.name))
+
+    def get_cache_key(req: Request, func, path: str, kwargs: dict):
+        policy = func.cache
+        if policy is None or req.method not in ('GET', 'HEAD'):
+            return None
+        if policy.key is not None:
+            return (func, policy.key(req, **kwargs))
+        query = tuple(sorted((req.params or {}).items()))
+        headers = tuple(_request_header(req, name) for name in policy.headers)
+        return (req.method, path, query, headers)
+
+    def before_handler(req: Request, func, path: str, kwargs: dict):
+        """Response answered without calling the handler if any, the version
+        headers and the cache key of the request."""
+        version_headers = get_version_headers(req, func, kwargs)
+        if version_headers:
+            coded_headers = coded_version_headers(req, func, version_headers)
+            if is_conditional_match(req, coded_headers):
+                return not_modified_response(coded_headers), version_headers, None
+        cache_key = get_cache_key(req, func, path, kwargs)
+        if cache_key is not None:
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                response = finish_response(req, func, Response.from_cached(cached), version_headers,
+                                           cache_key, cached)
+                return response, version_headers, cache_key
+        if req.timer is not None and (func.version is not None or cache_key is not None):
+            req.timer.mark('cache')
+        return None, version_headers, cache_key
+
+    def set_coded_etag(response: Response, coding, version_headers: dict = None) -> None:
+        # strong ETags are different for each content coding, those of the
+        # version hook as soon as a coding is negotiated, since the body is
+        # not known when they are compared, the others if the body is compressed
+        etag = response.headers.get('ETag')
+        if not etag:
+            return
+        if etag != (version_headers or {}).get('ETag'):
+            if 'Content-Encoding' in response.headers:
+                return
+            if not response.streamed and len(response.get_body()) < compression.min_size:
+                return
+        response.headers['ETag'] = coded_etag(etag, coding.name)
+
+    def finish_response(req: Request, func, response: Response, version_headers: dict = None,
+                        cache_key=None, cached: CachedResponse = None) -> Response:
+        coding = None
+        if compression is not None and func.compress and response.status_code not in (204, 304):
+            _merge_vary(response.headers, 'Accept-Encoding')
+            coding = get_coding(req, func)
+
+        if req.method in ('GET', 'HEAD') and response.status_code == 200:
+            for name, value in (version_headers or {}).items():
+                if name not in response.headers:
+                    response.headers[name] = value
+            if func.etag is not None and 'ETag' not in response.headers and not response.streamed:
+                response.headers['ETag'] = body_etag(response.get_body(), func.etag == 'weak')
+            # cached with the ETag of the identity coding, shared by every client
+            if cache_key is not None and cached is None and not response.streamed:
+                cached = response.to_cached()
+                response_cache.set(cache_key, cached, func.cache.ttl)
+            if coding is not None:
+                set_coded_etag(response, coding, version_headers)
+            if is_conditional_match(req, response.headers):
+                return not_modified_response(response.headers)
+
+        if coding is not None:
+            if cached is None:
+                response.compress(compression, coding)
+            elif coding.name in cached.compressed:
+                response.compress(compression, coding, cached.compressed[coding.name])
+            elif response.compress(compression, coding):
+                response_cache.add_compressed(cache_key, cached, coding.name, response.get_body())
+        return response
+
+    def get_error_tuple(error: Exception, method_name: str):
+        """Error body and status code, or None if the error must be raised."""
+        if isinstance(error, _imported_exception('jsonschema.exceptions', 'ValidationError')):
+            logging_message = "[%s][{status_code}]: {message}" % method_name
+            error_description = "Schema[{}] with value {}".format(
+                ']['.join(error.absolute_schema_path), error.message)
+            logging.warning(logging_message.format(
+                status_code=400, message=error_description))
+            return ({
+                'statusCode': 404,
+                'message': f"Validation Error: {error_description}",
+            }, 400)
+
+        if error_handler:
+            return error_handler(error, method_name)
+        return None
+
+    def get_coalesce_key(req: Request, func, path: str, kwargs: dict):
+        # only safe methods without a body are identical by method, path and query
+        if not func.coalesce or req.method not in ('GET', 'HEAD'):
+            return None
+        return (req.method, path, tuple(sorted(kwargs.items())),
+                tuple(sorted((req.params or {}).items())))
+
+    def share_response(response: Response):
+        # streamed bodies can only be read once, so they are not shared
+        return None if response.streamed else response.to_cached()
+
+    def call_handler(req: Request, func, kwargs: dict) -> Response:
+        if profiler is None:
+            response = func(req, **kwargs)
+        else:
+            response = profiler.profile(func.route, func, (req,), kwargs)
+        return make_timed_response(req, func, response)
+
+    def make_timed_response(req: Request, func, response) -> Response:
+        timer = req.timer
+        if timer is None:
+            return make_response(response, func.stream_format)
+        timer.mark('handler')
+        response = make_response(response, func.stream_format)
+        timer.mark('serialization')
+        return response
+
+    async def call_handler_async(req: Request, func, kwargs: dict) -> Response:
+        if asyncio.iscoroutinefunction(func):
+            if profiler is None:
+                response = await func(req, **kwargs)
+            else:
+                response = await profiler.profile_async(func.route, func, (req,), kwargs)
+        else:
+            loop = asyncio.get_event_loop()
+            if profiler is None:
+                call = functools.partial(func, req, **kwargs)
+            else:
+                # profiled on the thread running the handler
+                call = functools.partial(profiler.profile, func.route, func, (req,), kwargs)
+            response = await loop.run_in_executor(get_executor(), call)
+        return make_timed_response(req, func, response)
+
+    def dispatch_request(req: Request, context: FunctionsContext, timer: PhaseTimer = None):
+        dispatch = prepare_dispatch(req, context, timer)
+        if isinstance(dispatch, Response):
+            return dispatch
+        req, func, path, kwargs, error_tuple = dispatch
+
         if func:
             try:
-                response = func(req, **kwargs)
-                if not isinstance(response, Response):
-                    # Set defaults
-                    status_code = headers = None
-
-                    if isinstance(response, tuple):
-                        response_len = len(response)
-                        if response_len > 3:
-                            raise ValueError(
-                                'Response tuple has more than 3 items')
-
-                        # Unpack the tuple, missing items will be defaulted
-                        body, status_code, headers = response + (None,) * (
-                            3 - response_len)
-
-                    else:  # if response is string, dict, etc.
-                        body = response
-                    response = Response(body, status_code, headers)
-                return response
-
-            except ValidationError as error:
-                error_description = "Schema[{}] with value {}".format(
-                    ']['.join(error.absolute_schema_path), error.message)
-                logging.warning(logging_message.format(
-                    status_code=400, message=error_description))
-                error_tuple = ({
-                    'statusCode': 404,
-                    'message': f"Validation Error: {error_description}",
-                }, 400)
-
+                early_response, version_headers, cache_key = before_handler(req, func, path, kwargs)
+                if early_response is not None:
+                    return early_response
+                coalesce_key = get_coalesce_key(req, func, path, kwargs)
+                if coalesce_key is None:
+                    response = call_handler(req, func, kwargs)
+                else:
+                    response, leader = single_flight.do(
+                        coalesce_key, lambda: call_handler(req, func, kwargs), share_response)
+                    if not leader:
+                        # the response was cached by the request which ran the handler
+                        cache_key = None
+                        if response is None:
+                            response = call_handler(req, func, kwargs)
+                        else:
+                            response = Response.from_cached(response)
+                return finish_response(req, func, response, version_headers, cache_key)
             except Exception as error:
-                if error_handler:
-                    error_tuple = error_handler(error, method_name)
+                error_tuple = get_error_tuple(error, req.method.lower())
+                if error_tuple is None:
+                    raise
+
+        body, status_code = error_tuple
+        return Response(body, status_code)
+
+    async def dispatch_request_async(req: Request, context: FunctionsContext,
+                                     timer: PhaseTimer = None):
+        dispatch = prepare_dispatch(req, context, timer)
+        if isinstance(dispatch, Response):
+            return dispatch
+        req, func, path, kwargs, error_tuple = dispatch
+
+        if func:
+            try:
+                early_response, version_headers, cache_key = before_handler(req, func, path, kwargs)
+                if early_response is not None:
+                    return early_response
+                coalesce_key = get_coalesce_key(req, func, path, kwargs)
+                if coalesce_key is None:
+                    response = await call_handler_async(req, func, kwargs)
                 else:
+                    response, leader = await async_single_flight.do(
+                        coalesce_key, lambda: call_handler_async(req, func, kwargs), share_response)
+                    if not leader:
+                        # the response was cached by the request which ran the handler
+                        cache_key = None
+                        if response is None:
+                            response = await call_handler_async(req, func, kwargs)
+                        else:
+                            response = Response.from_cached(response)
+                return finish_response(req, func, response, version_headers, cache_key)
+            except Exception as error:
+                error_tuple = get_error_tuple(error, req.method.lower())
+                if error_tuple is None:
                     raise
 
         body, status_code = error_tuple
         return Response(body, status_code)
 
-    def inner_handler(method_name, path='/', schema=None, load_json=True):
+    def complete_request(req: Request, response: Response, timer: PhaseTimer) -> Response:
+        timer.mark('response')
+        timings = timer.stop()
+        if server_timing:
+            response.headers['Server-Timing'] = format_server_timing(timings)
+        if metrics is not None:
+            metrics.observe(timer.route, req.method, response.status_code, timings['total'],
+                            len(req.get_body() or b''),
+                            None if response.streamed else len(response.get_body()))
+        for callback in request_callbacks:
+            try:
+                callback(req, response, timings)
+            except Exception:
+                logging.exception('on_request_complete callback failed')
+        return response
+
+    def is_timed() -> bool:
+        # without timings, the request is not timed at all
+        return bool(server_timing or request_callbacks or metrics is not None)
+
+    def inner_functionapp_handler(req: Request, context: FunctionsContext):
+        if not is_timed():
+            return dispatch_request(req, context)
+        timer = PhaseTimer()
+        return complete_request(req, dispatch_request(req, context, timer), timer)
+
+    async def inner_functionapp_handler_async(req: Request, context: FunctionsContext):
+        if not is_timed():
+            return await dispatch_request_async(req, context)
+        timer = PhaseTimer()
+        return complete_request(req, await dispatch_request_async(req, context, timer), timer)
+
+    def add_request_callback(callback):
+        """Register `callback(req, response, timings)`, called once each request is complete."""
+        nonlocal request_callbacks
+        request_callbacks = request_callbacks + (callback,)
+        return callback
+
+    def inner_handler(method_name, path='/', schema=None, load_json=True, stream_format='json',
+                      compress=True, etag=None, version=None, cache=None, coalesce=False,
+                      coerce_query=None):
         if schema and not load_json:
             raise ValueError('if schema is supplied, load_json needs to be true')
-
-        def wrapper(func):
-            @functools.wraps(func)
-            def inner(req: Request, *args, **kwargs):
-                if load_json:
+        get_stream_format(stream_format)
+        etag_mode = default_etag if etag is None else get_etag_mode(etag)
+        cache_policy = get_cache_policy(cache)
+
+        # check and compile the schema once, instead of on every request
+        schema_validator = compile_validator(
+            schema, backend=validator, format_checker=_format_checker()) if schema else None
+        if coerce_query is None:
+            coerce_query = default_coerce_query
+        query_coercers = None
+        if schema and coerce_query:
+            query_coercers = compile_query_coercers(schema, json_codec.loads)
+
+        def load_json_data(req: Request):
+            if load_json:
+                body = req.get_body()
+                params = req.params
+
+                def load_body():
+                    return json_codec.loads(body) if body else {}
+
+                def load_query_params():
+                    return _json_load_query(params, json_codec.loads, query_coercers)
+
+                if schema_validator is not None:
                     json_data = {
-                        'body': req.get_json() if req.get_body() else {},
-                        'query': _json_load_query(
-                            req.params
-                        )
+                        'body': load_body(),
+                        'query': load_query_params()
                     }
                     req.json = json_data
-                    if schema:
-                        # jsonschema.validate using given schema
-                        validate(json_data, schema, **__validate_kwargs)
+                    timer = req.timer
+                    if timer is not None:
+                        timer.mark('json')
+                    schema_validator.validate(json_data)
+                    if timer is not None:
+                        timer.mark('validation')
+                else:
+                    # only parsed when the handler reads req.json
+                    req.set_json_loader(lambda: {
+                        'body': load_body(),
+                        'query': load_query_params()
+                    })
 
-                return func(req, *args, **kwargs)
+        def wrapper(func):
+            if asyncio.iscoroutinefunction(func):
+                if not async_mode:
+                    raise TypeError(
+                        f"{func.__name__} is a coroutine function, "
+                        f"please create the handler with async_mode=True")
+
+                @functools.wraps(func)
+                async def inner(req: Request, *args, **kwargs):
+                    load_json_data(req)
+                    return await func(req, *args, **kwargs)
+            else:
+                @functools.wraps(func)
+                def inner(req: Request, *args, **kwargs):
+                    load_json_data(req)
+                    return func(req, *args, **kwargs)
 
             # if this is a catch all url, make sure that it's setup correctly
             if path == '*':
@@ -467,14 +1439,291 @@ def create_functionapp_handler(error_handler=default_error_handler, headers=None
             if not target_path.startswith('/'):
                 raise ValueError('Please configure path with starting slash')
 
+            # used by dispatch_messages to call the function without the wrapper
+            inner.load_json = load_json
+            inner.schema_validator = schema_validator
+
+            # format of the iterators returned by the handler
+            inner.stream_format = stream_format
+            inner.compress = compress
+            inner.etag = etag_mode
+            inner.version = version
+            inner.cache = cache_policy
+            inner.coalesce = coalesce
+            # name of the route in the profiles
+            inner.route = f"{method_name.upper()} {target_path}"
+
             # register http handler function
-            rule = Rule(target_path, endpoint=inner, methods=[method_name.lower()])
-            url_maps.add(rule)
+            router.add(target_path, inner, [method_name.lower()])
             return inner
         return wrapper
 
-    functionapp_handler = inner_functionapp_handler
+    def batch_handler(path='/batch/', concurrency=1, max_requests=50):
+        """Register a POST route dispatching an array of sub-requests
+
+        Each entry of the body is `{method, path, query, headers, body}` and is
+        dispatched like a request of its own, with the headers of the batch
+        request. The response is an array of `{status_code, headers, body}`
+        in the order of the entries, up to `concurrency` entries being
+        dispatched at the same time.
+        """
+        _check_concurrency(concurrency)
+        batch_executors = []
+
+        def get_batch_executor() -> ThreadPoolExecutor:
+            # not the executor of the handlers, which the batch may be running on
+            if not batch_executors:
+                with executor_lock:
+                    if not batch_executors:
+                        batch_executors.append(ThreadPoolExecutor(max_workers=concurrency))
+            return batch_executors[0]
+
+        def get_entry_request(req: Request, entry: dict):
+            if entry['path'].rstrip('/') == path.rstrip('/'):
+                return None
+            return _batch_request(req, entry, json_codec.dumps_bytes)
+
+        def dispatch_entry(req: Request, entry: dict) -> dict:
+            entry_req = get_entry_request(req, entry)
+            if entry_req is None:
+                return _batch_error(400, 'Batch requests cannot be nested')
+            try:
+                return _batch_result(inner_functionapp_handler(entry_req, req.context))
+            except _imported_exception('werkzeug.exceptions', 'HTTPException') as error:
+                # like method not allowed, raised by the dispatcher
+                return _batch_error(error.code, str(error))
+            except Exception as error:
+                logging.exception('[batch][500]: %s', error)
+                return _batch_error(500, str(error))
+
+        async def dispatch_entry_async(req: Request, entry: dict,
+                                       semaphore: asyncio.Semaphore) -> dict:
+            entry_req = get_entry_request(req, entry)
+            if entry_req is None:
+                return _batch_error(400, 'Batch requests cannot be nested')
+            async with semaphore:
+                try:
+                    response = await inner_functionapp_handler_async(entry_req, req.context)
+                    return _batch_result(response)
+                except _imported_exception('werkzeug.exceptions', 'HTTPException') as error:
+                    return _batch_error(error.code, str(error))
+                except Exception as error:
+                    logging.exception('[batch][500]: %s', error)
+                    return _batch_error(500, str(error))
+
+        if async_mode:
+            async def dispatch_batch(req: Request):
+                semaphore = asyncio.Semaphore(concurrency)
+                return list(await asyncio.gather(*[
+                    dispatch_entry_async(req, entry, semaphore) for entry in req.json['body']]))
+        else:
+            def dispatch_batch(req: Request):
+                entries = req.json['body']
+                if concurrency > 1 and len(entries) > 1:
+                    return list(get_batch_executor().map(
+                        lambda entry: dispatch_entry(req, entry), entries))
+                return [dispatch_entry(req, entry) for entry in entries]
+
+        schema = _batch_schema(max_requests)
+        return inner_handler('post', path=path, schema=schema, etag=False)(dispatch_batch)
+
+    def profile_handler(path='/profile/'):
+        """Register a GET route dumping the profiles of the profiler
+
+        The `format` query param is `text` (default) for the pstats report,
+        `pstats` for the pstats file format or `collapsed` for the sampled
+        stacks, and the `route` query param restricts the dump to one route,
+        as named in `functionapp_handler.profiler.routes()`.
+        """
+        if profiler is None:
+            raise ValueError(
+                'Please create the handler with a profiler to register the profile route')
+
+        def dump_profile(req: Request):
+            query = req.json['query']
+            route = query.get('route')
+            dump_format = query.get('format', 'text')
+            if dump_format == 'text':
+                return Response(profiler.print_stats(route), 200, mimetype='text/plain')
+            if dump_format == 'collapsed':
+                return Response(profiler.collapsed(route), 200, mimetype='text/plain')
+            if dump_format == 'pstats':
+                return Response(profiler.pstats_bytes(route), 200,
+                                mimetype='application/octet-stream')
+            return Response({'error': f"Unknown profile format {dump_format}"}, 400)
+
+        return inner_handler('get', path=path, etag=False)(dump_profile)
+
+    def metrics_handler(path='/metrics/'):
+        """Register a GET route exporting the metrics in the Prometheus text format"""
+        if metrics is None:
+            raise ValueError('Please create the handler with metrics to register the metrics route')
+
+        def export_metrics(req: Request):
+            return Response(metrics.prometheus(), 200, {'Content-Type': PROMETHEUS_CONTENT_TYPE},
+                            mimetype='text/plain')
+
+        return inner_handler('get', path=path, etag=False)(export_metrics)
+
+    def warmup(function_directory: str = None) -> None:
+        """Do ahead of the first request the work it would otherwise pay for
+
+        Builds the routing map and dispatch table, importing werkzeug, runs the
+        schema validators once, loads the bindings of the function directory
+        into the bindings cache and exercises the JSON codec. It is meant to be
+        called at module load on pre-warmed instances, after the routes are
+        registered.
+        """
+        # reading the endpoints builds the routing map and dispatch table
+        for func in router.endpoints():
+            if func.schema_validator is not None:
+                func.schema_validator.best_error({'body': {}, 'query': {}})
+        if function_directory is not None:
+            bindings_cache.preload(function_directory)
+        json_codec.loads(json_codec.dumps_bytes({'warmup': [1, 1.5, 'warmup', None, True]}))
+        make_response({'warmup': True}).get_body()
+
+    message_executors = {}
+
+    def get_message_executor(concurrency: int) -> ThreadPoolExecutor:
+        # one executor per concurrency, kept across the invocations
+        executor = message_executors.get(concurrency)
+        if executor is None:
+            with executor_lock:
+                executor = message_executors.get(concurrency)
+                if executor is None:
+                    executor = message_executors[concurrency] = ThreadPoolExecutor(
+                        max_workers=concurrency)
+        return executor
+
+    def resolve_messages(messages, context: FunctionsContext):
+        """Requests of the messages, with their route resolved once per method and path."""
+        if context is not None:
+            context.bindings = bindings_cache.get(context.function_directory)
+        routes = {}
+        resolved = []
+        for message in messages:
+            try:
+                entry = _message_entry(message, json_codec.loads)
+            except ValueError as error:
+                resolved.append(_batch_error(400, str(error)))
+                continue
+            method_name = entry.get('method', 'POST').lower()
+            route_key = (method_name, entry['path'])
+            route = routes.get(route_key)
+            if route is None:
+                try:
+                    rule, kwargs = router.match(entry['path'], method_name)
+                    if rule.rule == '/<path:path>':
+                        kwargs = {}
+                    route = routes[route_key] = (rule.endpoint, kwargs)
+                except _imported_exception('werkzeug.exceptions', 'HTTPException') as error:
+                    route = routes[route_key] = error
+            if isinstance(route, _imported_exception('werkzeug.exceptions', 'HTTPException')):
+                resolved.append(_batch_error(route.code, str(route)))
+                continue
+            resolved.append((entry, method_name, route[0], route[1], context))
+        return resolved
+
+    def get_message_request(entry: dict, method_name: str, func,
+                            context: FunctionsContext) -> Request:
+        req = CompactRequest(method_name, entry['path'], headers=entry.get('headers'),
+                             params=entry.get('query'), route_params={})
+        req.context = context
+        if func.load_json:
+            # the message is already parsed, the query params are JSON values too
+            req.json = {
+                'body': entry.get('body', {}),
+                'query': entry.get('query') or {}
+            }
+            if func.schema_validator is not None:
+                func.schema_validator.validate(req.json)
+        elif entry.get('body') is not None:
+            req.set_body(json_codec.dumps_bytes(entry['body']))
+        return req
+
+    def handle_message_error(error: Exception, method_name: str) -> dict:
+        error_tuple = get_error_tuple(error, method_name)
+        if error_tuple is None:
+            logging.exception('[%s][500]: %s', method_name, error)
+            return _batch_error(500, str(error))
+        body, status_code = error_tuple
+        return _batch_result(Response(body, status_code))
+
+    def dispatch_message(resolved) -> dict:
+        if isinstance(resolved, dict):
+            return resolved
+        entry, method_name, func, kwargs, context = resolved
+        try:
+            req = get_message_request(entry, method_name, func, context)
+            return _batch_result(make_response(func.__wrapped__(req, **kwargs), func.stream_format))
+        except Exception as error:
+            return handle_message_error(error, method_name)
+
+    async def dispatch_message_async(resolved, semaphore: asyncio.Semaphore) -> dict:
+        if isinstance(resolved, dict):
+            return resolved
+        entry, method_name, func, kwargs, context = resolved
+        async with semaphore:
+            try:
+                req = get_message_request(entry, method_name, func, context)
+                handler = func.__wrapped__
+                if asyncio.iscoroutinefunction(handler):
+                    response = await handler(req, **kwargs)
+                else:
+                    loop = asyncio.get_event_loop()
+                    response = await loop.run_in_executor(
+                        get_executor(), functools.partial(handler, req, **kwargs))
+                return _batch_result(make_response(response, func.stream_format))
+            except Exception as error:
+                return handle_message_error(error, method_name)
+
+    def dispatch_messages(messages, context: FunctionsContext = None, concurrency=1) -> list:
+        """Dispatch the messages of a trigger with many cardinality
+
+        Each message is a dict, or has a JSON body, like
+        `{method, path, query, headers, body}`, the method defaulting to POST.
+        Routes are resolved once per distinct method and path and the handlers
+        are called directly with the parsed body, validated by the compiled
+        schema of the route. The result of each message is a dict of
+        `{status_code, headers, body}`, in the order of the messages, up to
+        `concurrency` handlers running at the same time.
+        With async_mode, it is a coroutine function.
+        """
+        _check_concurrency(concurrency)
+        resolved = resolve_messages(messages, context)
+        if concurrency > 1 and len(resolved) > 1:
+            return list(get_message_executor(concurrency).map(dispatch_message, resolved))
+        return [dispatch_message(item) for item in resolved]
+
+    async def dispatch_messages_async(messages, context: FunctionsContext = None,
+                                      concurrency=1) -> list:
+        _check_concurrency(concurrency)
+        resolved = resolve_messages(messages, context)
+        semaphore = asyncio.Semaphore(concurrency)
+        return list(await asyncio.gather(*[
+            dispatch_message_async(item, semaphore) for item in resolved]))
+
+    if async_mode:
+        functionapp_handler = inner_functionapp_handler_async
+    else:
+        functionapp_handler = inner_functionapp_handler
     functionapp_handler.handle = inner_handler
+    functionapp_handler.handle_batch = batch_handler
+    functionapp_handler.handle_profile = profile_handler
+    functionapp_handler.handle_metrics = metrics_handler
+    functionapp_handler.warmup = warmup
+    functionapp_handler.on_request_complete = add_request_callback
+    if async_mode:
+        functionapp_handler.dispatch_messages = dispatch_messages_async
+    else:
+        functionapp_handler.dispatch_messages = dispatch_messages
+    functionapp_handler.bindings_cache = bindings_cache
+    functionapp_handler.response_cache = response_cache
+    functionapp_handler.profiler = profiler
+    functionapp_handler.metrics = metrics
+    functionapp_handler.json_codec = json_codec
+    functionapp_handler.Response = Response
     return functionapp_handler
 
 
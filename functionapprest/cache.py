@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from collections import OrderedDict
+
+
+class CachePolicy(object):
+    """Class to configure the response cache of a route
+
+    ttl:
+    Number of seconds a response is served from the cache.
+
+    key:
+    Function called as `key(req, **kwargs)` returning the hashable key of the
+    request. By default the key is made of the method, the matched path and
+    the sorted query params, plus the values of `headers`.
+
+    headers:
+    Names of the request headers which are part of the default key.
+    """
+
+    def __init__(self, ttl: float, key=None, headers=()) -> None:
+        if ttl <= 0:
+            raise ValueError(f"ttl is expected to be a positive number of seconds, got {ttl!r}")
+        self.ttl = ttl
+        self.key = key
+        self.headers = tuple(headers)
+
+
+def get_cache_policy(cache):
+    if cache is None or cache is False or isinstance(cache, CachePolicy):
+        return cache or None
+    if isinstance(cache, (int, float)) and not isinstance(cache, bool):
+        return CachePolicy(ttl=cache)
+    raise ValueError(f"cache is expected to be a number of seconds or a CachePolicy, got {cache!r}")
+
+
+class CachedResponse(object):
+    """Encoded parts of a response, as stored in the cache"""
+
+    __slots__ = ('body', 'status_code', 'headers', 'mimetype', 'charset', 'json_encoded',
+                 'empty', 'compressed', 'size')
+
+    def __init__(self, body: bytes, status_code: int, headers: dict, mimetype: str,
+                 charset: str, json_encoded: bool, empty: bool) -> None:
+        self.body = body
+        self.status_code = status_code
+        self.headers = headers
+        self.mimetype = mimetype
+        self.charset = charset
+        self.json_encoded = json_encoded
+        self.empty = empty
+        # compressed bodies, added by coding as they are requested
+        self.compressed = {}
+        self.size = len(body) + sum(len(name) + len(value) for name, value in headers.items())
+
+    def add_compressed(self, coding: str, body: bytes) -> None:
+        self.compressed[coding] = body
+        self.size += len(body)
+
+
+class ResponseCache(object):
+    """Class to keep encoded responses for a limited time
+
+    The least recently used entries are evicted once there are more than
+    `max_entries` entries or more than `max_bytes` bytes of bodies and headers.
+    Expired entries are dropped when they are looked up or evicted.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.size = 0
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get(self, key) -> CachedResponse:
+        """Cached response of the key, None if missing or expired."""
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self.__entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self.__remove(key)
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def set(self, key, value: CachedResponse, ttl: float) -> None:
+        if value.size > self.max_bytes:
+            return
+        with self.__lock:
+            if key in self.__entries:
+                self.__remove(key)
+            self.__entries[key] = (time.monotonic() + ttl, value)
+            self.size += value.size
+            self.__evict()
+
+    def add_compressed(self, key, value: CachedResponse, coding: str, body: bytes) -> None:
+        """Keep the compressed body with the cached response, if still cached."""
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and entry[1] is value and coding not in value.compressed:
+                value.add_compressed(coding, body)
+                self.size += len(body)
+                self.__evict()
+
+    def __evict(self) -> None:
+        while len(self.__entries) > self.max_entries or self.size > self.max_bytes:
+            self.__remove(next(iter(self.__entries)))
+            self.evictions += 1
+
+    def __remove(self, key) -> None:
+        _, value = self.__entries.pop(key)
+        self.size -= value.size
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries = OrderedDict()
+            self.size = 0
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self.__entries),
+            'bytes': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+
+from concurrent.futures import Future
+
+
+def _identity(value):
+    return value
+
+
+class SingleFlight(object):
+    """Class to share one execution of a function between concurrent calls with the same key
+
+    The first caller of a key runs the function, the callers arriving while it
+    runs wait for it and receive `share(result)`, computed once by the first
+    caller. An exception raised by the function is raised to every caller.
+    """
+
+    def __init__(self) -> None:
+        self.__calls = {}
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.__calls)
+
+    def do(self, key, func, share=_identity):
+        """Result of the function and whether this caller ran it."""
+        with self.__lock:
+            future = self.__calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.__calls[key] = Future()
+        if not leader:
+            return future.result(), False
+
+        try:
+            result = func()
+            shared = share(result)
+        except BaseException as error:
+            self.__done(key)
+            future.set_exception(error)
+            raise
+        self.__done(key)
+        future.set_result(shared)
+        return result, True
+
+    def __done(self, key) -> None:
+        with self.__lock:
+            del self.__calls[key]
+
+
+class AsyncSingleFlight(object):
+    """Class to share one execution of a coroutine function between concurrent
+    calls with the same key, on the same event loop
+
+    Same as `SingleFlight`, waiters being cancelled does not cancel the
+    execution they wait for.
+    """
+
+    def __init__(self) -> None:
+        self.__calls = {}
+
+    def __len__(self) -> int:
+        return len(self.__calls)
+
+    async def do(self, key, func, share=_identity):
+        """Result of the awaited function and whether this caller ran it."""
+        loop = asyncio.get_event_loop()
+        key = (id(loop), key)
+        future = self.__calls.get(key)
+        if future is not None:
+            return await asyncio.shield(future), False
+
+        future = self.__calls[key] = loop.create_future()
+        try:
+            result = await func()
+            shared = share(result)
+        except BaseException as error:
+            del self.__calls[key]
+            future.set_exception(error)
+            # the waiters may all be gone, do not log it as never retrieved
+            future.exception()
+            raise
+        del self.__calls[key]
+        future.set_result(shared)
+        return result, True
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+import importlib
+import json
+
+from datetime import datetime, date
+
+
+def _json_serial(obj):
+    """JSON serializer for objects not serializable by default json code"""
+
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    # raise TypeError("Type %s not serializable" % type(obj))
+    return str(obj)
+
+
+def _orjson_default(obj):
+    # subclasses are passed through, so lazy dicts and int enums are encoded
+    # the way the standard library does
+    if isinstance(obj, dict):
+        return dict(obj.items())
+    if isinstance(obj, list):
+        return list(obj)
+    if isinstance(obj, int):
+        return int(obj)
+    if isinstance(obj, float):
+        return float(obj)
+    return _json_serial(obj)
+
+
+class JsonCodec(object):
+    """Class to encode and decode JSON with the standard library
+
+    Objects which are not serializable by default are encoded with
+    `_json_serial`: datetimes and dates as isoformat, anything else as `str()`.
+    """
+
+    name = 'json'
+
+    def dumps(self, obj) -> str:
+        return json.dumps(obj, default=_json_serial)
+
+    def dumps_bytes(self, obj) -> bytes:
+        return self.dumps(obj).encode('utf-8')
+
+    def loads(self, data):
+        if isinstance(data, (bytes, bytearray)):
+            data = data.decode('utf-8')
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    """Class to encode and decode JSON with orjson
+
+    Datetimes, dates and subclasses of builtin types are passed to a default
+    function, so they are encoded the same way as with the standard library.
+    The output has no whitespace between items. Objects orjson cannot encode
+    at all, like integers above 64 bits,
+    are encoded with the standard library instead.
+    """
+
+    name = 'orjson'
+
+    def __init__(self) -> None:
+        self.orjson = importlib.import_module('orjson')
+        self.option = (self.orjson.OPT_PASSTHROUGH_DATETIME |
+                       self.orjson.OPT_PASSTHROUGH_DATACLASS |
+                       self.orjson.OPT_PASSTHROUGH_SUBCLASS |
+                       self.orjson.OPT_NON_STR_KEYS)
+
+    def dumps(self, obj) -> str:
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def dumps_bytes(self, obj) -> bytes:
+        try:
+            return self.orjson.dumps(obj, default=_orjson_default, option=self.option)
+        except TypeError:
+            return json.dumps(obj, default=_json_serial).encode('utf-8')
+
+    def loads(self, data):
+        return self.orjson.loads(data)
+
+
+class UjsonCodec(JsonCodec):
+    """Class to encode and decode JSON with ujson
+
+    The output has no whitespace between items and forward slashes are not
+    escaped. Objects ujson cannot encode are encoded with the standard library.
+    """
+
+    name = 'ujson'
+
+    def __init__(self) -> None:
+        self.ujson = importlib.import_module('ujson')
+
+    def dumps(self, obj) -> str:
+        try:
+            return self.ujson.dumps(obj, default=_json_serial, escape_forward_slashes=False)
+        except (TypeError, OverflowError):
+            return json.dumps(obj, default=_json_serial)
+
+    def loads(self, data):
+        return self.ujson.loads(data)
+
+
+json_codecs = {
+    JsonCodec.name: JsonCodec,
+    OrjsonCodec.name: OrjsonCodec,
+    UjsonCodec.name: UjsonCodec,
+}
+
+
+def available_codecs() -> list:
+    """Names of the codecs whose backend can be imported, fastest first."""
+    names = []
+    for name in (OrjsonCodec.name, UjsonCodec.name):
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue
+        names.append(name)
+    names.append(JsonCodec.name)
+    return names
+
+
+def get_json_codec(json_codec='json') -> JsonCodec:
+    """Codec instance from its name, `auto` picking the fastest one installed."""
+    if isinstance(json_codec, JsonCodec):
+        return json_codec
+    if json_codec == 'auto':
+        json_codec = available_codecs()[0]
+    if json_codec not in json_codecs:
+        raise ValueError(
+            f"json_codec is expected to be auto or one of {', '.join(sorted(json_codecs))}, "
+            f"got {json_codec!r}")
+    return json_codecs[json_codec]()
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+import importlib
+import zlib
+
+# zlib window bits of the gzip and zlib containers
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+_DEFLATE_WBITS = zlib.MAX_WBITS
+
+
+def _brotli():
+    for name in ('brotli', 'brotlicffi'):
+        try:
+            return importlib.import_module(name)
+        except ImportError:
+            continue
+    return None
+
+
+class _ZlibCoding(object):
+    def __init__(self, name: str, wbits: int) -> None:
+        self.name = name
+        self.wbits = wbits
+
+    def compressor(self, level: int):
+        return zlib.compressobj(level, zlib.DEFLATED, self.wbits)
+
+    def compress(self, data: bytes, level: int) -> bytes:
+        compressor = self.compressor(level)
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data, self.wbits)
+
+
+class _BrotliCompressor(object):
+    def __init__(self, brotli, level: int) -> None:
+        self.__compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.__compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self.__compressor.finish()
+
+
+class _BrotliCoding(object):
+    name = 'br'
+
+    def __init__(self, brotli) -> None:
+        self.brotli = brotli
+
+    @staticmethod
+    def quality(level: int) -> int:
+        # levels go from 1 to 9 like zlib, brotli qualities from 0 to 11
+        return max(0, min(11, level))
+
+    def compressor(self, level: int):
+        return _BrotliCompressor(self.brotli, self.quality(level))
+
+    def compress(self, data: bytes, level: int) -> bytes:
+        return self.brotli.compress(data, quality=self.quality(level))
+
+    def decompress(self, data: bytes) -> bytes:
+        return self.brotli.decompress(data)
+
+
+def available_codings() -> dict:
+    """Content codings which can be used, in order of preference."""
+    codings = {}
+    brotli = _brotli()
+    if brotli is not None:
+        codings['br'] = _BrotliCoding(brotli)
+    codings['gzip'] = _ZlibCoding('gzip', _GZIP_WBITS)
+    codings['deflate'] = _ZlibCoding('deflate', _DEFLATE_WBITS)
+    return codings
+
+
+def parse_accept_encoding(header: str) -> dict:
+    """Quality value of each coding of an Accept-Encoding header."""
+    qualities = {}
+    for item in (header or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def _compressed_chunks(chunks, compressor):
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class Compression(object):
+    """Class to negotiate and compress response bodies
+
+    min_size:
+    Bodies smaller than this number of bytes are sent as they are. Streamed
+    bodies, whose size is unknown, are always compressed.
+
+    level:
+    Compression level from 1 (fastest) to 9 (smallest), also used as the
+    brotli quality.
+
+    encodings:
+    Content codings allowed, in order of preference. Brotli is only used when
+    the `brotli` or `brotlicffi` package is installed.
+    """
+
+    def __init__(self, min_size: int = 1024, level: int = 6,
+                 encodings=('br', 'gzip', 'deflate')) -> None:
+        if not 0 <= level <= 9:
+            raise ValueError(f"level is expected to be between 0 and 9, got {level!r}")
+        self.min_size = min_size
+        self.level = level
+        available = available_codings()
+        self.codings = [available[name] for name in encodings if name in available]
+
+    def negotiate(self, accept_encoding: str):
+        """Preferred coding accepted by the client, or None for the identity."""
+        if not accept_encoding:
+            return None
+        qualities = parse_accept_encoding(accept_encoding)
+        best = None
+        best_quality = 0.0
+        for coding in self.codings:
+            quality = qualities.get(coding.name, qualities.get('*', 0.0))
+            if quality > best_quality:
+                best = coding
+                best_quality = quality
+        return best
+
+    def compress(self, coding, data: bytes) -> bytes:
+        return coding.compress(data, self.level)
+
+    def compress_chunks(self, coding, chunks):
+        return _compressed_chunks(chunks, coding.compressor(self.level))
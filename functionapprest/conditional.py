@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import hashlib
+
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+etag_modes = ('strong', 'weak')
+
+# headers a 304 response keeps from the response it replaces
+NOT_MODIFIED_HEADERS = ('Cache-Control', 'Content-Location', 'Date', 'ETag', 'Expires',
+                        'Last-Modified', 'Vary')
+
+
+def get_etag_mode(etag):
+    if etag in (None, False):
+        return None
+    if etag is True:
+        return 'strong'
+    if etag not in etag_modes:
+        raise ValueError(
+            f"etag is expected to be one of {', '.join(etag_modes)}, got {etag!r}")
+    return etag
+
+
+def format_etag(value: str, weak: bool = False) -> str:
+    value = str(value).replace('"', '')
+    return f'W/"{value}"' if weak else f'"{value}"'
+
+
+def body_etag(body: bytes, weak: bool = False, suffix: str = None) -> str:
+    """ETag of an encoded body, the suffix telling apart its content codings."""
+    value = hashlib.blake2b(body, digest_size=16).hexdigest()
+    if suffix and not weak:
+        value = f"{value}-{suffix}"
+    return format_etag(value, weak)
+
+
+def coded_etag(etag: str, coding: str) -> str:
+    """Strong ETag of the representation in a content coding, weak ETags are shared by all."""
+    if not etag or etag.startswith('W/') or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{coding}"'
+
+
+def _opaque_tag(etag: str) -> str:
+    etag = etag.strip()
+    if etag.startswith('W/'):
+        etag = etag[2:]
+    return etag
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of the ETag with an If-None-Match header."""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    tag = _opaque_tag(etag)
+    return any(_opaque_tag(item) == tag for item in if_none_match.split(','))
+
+
+def http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def _parse_http_date(value: str):
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if parsed is None:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def not_modified_since(if_modified_since: str, last_modified: str) -> bool:
+    """Whether the Last-Modified date is not after the If-Modified-Since date."""
+    if not if_modified_since or not last_modified:
+        return False
+    since = _parse_http_date(if_modified_since)
+    modified = _parse_http_date(last_modified)
+    if since is None or modified is None:
+        return False
+    return modified <= since
+
+
+def is_not_modified(if_none_match: str, if_modified_since: str, etag: str = None,
+                    last_modified: str = None) -> bool:
+    """Whether a GET request can be answered with 304 Not Modified.
+
+    If-Modified-Since is ignored when the request has an If-None-Match header.
+    """
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+    return not_modified_since(if_modified_since, last_modified)
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+import threading
+
+from bisect import bisect_left
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+# version of the Prometheus text exposition format
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram(object):
+    """Class to count observations in fixed buckets, the last one being +Inf"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: tuple) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other: 'Histogram') -> None:
+        for index, count in enumerate(list(other.counts)):
+            self.counts[index] += count
+        self.sum += other.sum
+        self.count += other.count
+
+
+class RouteMetrics(object):
+    """Class to hold the metrics of a route and method"""
+
+    __slots__ = ('requests', 'statuses', 'latency', 'request_size', 'response_size')
+
+    def __init__(self, latency_buckets: tuple, size_buckets: tuple) -> None:
+        self.requests = 0
+        self.statuses = {}
+        self.latency = Histogram(latency_buckets)
+        self.request_size = Histogram(size_buckets)
+        self.response_size = Histogram(size_buckets)
+
+    def merge(self, other: 'RouteMetrics') -> None:
+        self.requests += other.requests
+        for status_code, count in dict(other.statuses).items():
+            self.statuses[status_code] = self.statuses.get(status_code, 0) + count
+        self.latency.merge(other.latency)
+        self.request_size.merge(other.request_size)
+        self.response_size.merge(other.response_size)
+
+
+def _label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _prometheus_histogram(lines: list, name: str, labels: str, histogram: Histogram) -> None:
+    cumulative = 0
+    for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+
+class MetricsRegistry(object):
+    """Class to collect request metrics by route and method
+
+    Each thread updates metrics of its own, so recording a request takes no
+    lock; the metrics of the threads are merged when they are read.
+    Durations are in seconds and sizes in bytes. Requests which match no
+    route are recorded under the route `unmatched`.
+    """
+
+    def __init__(self, latency_buckets: tuple = DEFAULT_LATENCY_BUCKETS,
+                 size_buckets: tuple = DEFAULT_SIZE_BUCKETS) -> None:
+        self.latency_buckets = tuple(sorted(latency_buckets))
+        self.size_buckets = tuple(sorted(size_buckets))
+        self.__local = threading.local()
+        self.__shards = []
+        self.__lock = threading.Lock()
+
+    def __shard(self) -> dict:
+        try:
+            return self.__local.shard
+        except AttributeError:
+            shard = self.__local.shard = {}
+            with self.__lock:
+                self.__shards.append(shard)
+            return shard
+
+    def observe(self, route: str, method: str, status_code: int, seconds: float,
+                request_size: int = None, response_size: int = None) -> None:
+        shard = self.__shard()
+        key = (route or 'unmatched', method.upper())
+        metrics = shard.get(key)
+        if metrics is None:
+            metrics = shard[key] = RouteMetrics(self.latency_buckets, self.size_buckets)
+        metrics.requests += 1
+        metrics.statuses[status_code] = metrics.statuses.get(status_code, 0) + 1
+        metrics.latency.observe(seconds)
+        if request_size is not None:
+            metrics.request_size.observe(request_size)
+        if response_size is not None:
+            metrics.response_size.observe(response_size)
+
+    def snapshot(self) -> dict:
+        """Metrics merged from every thread, by `(route, method)`."""
+        with self.__lock:
+            shards = list(self.__shards)
+        merged = {}
+        for shard in shards:
+            for key, metrics in dict(shard).items():
+                if key not in merged:
+                    merged[key] = RouteMetrics(self.latency_buckets, self.size_buckets)
+                merged[key].merge(metrics)
+        return merged
+
+    def reset(self) -> None:
+        with self.__lock:
+            for shard in self.__shards:
+                shard.clear()
+
+    def prometheus(self, prefix: str = 'functionapprest') -> str:
+        """Metrics in the Prometheus text exposition format."""
+        snapshot = sorted(self.snapshot().items())
+        lines = [
+            f'# HELP {prefix}_requests_total Number of requests by route, method and status code.',
+            f'# TYPE {prefix}_requests_total counter',
+        ]
+        for (route, method), metrics in snapshot:
+            for status_code, count in sorted(metrics.statuses.items()):
+                lines.append(f'{prefix}_requests_total{{route="{_label(route)}",method="{method}",'
+                             f'status="{status_code}"}} {count}')
+        for name, attribute, description in (
+                ('request_duration_seconds', 'latency', 'Duration of the requests'),
+                ('request_size_bytes', 'request_size', 'Size of the request bodies'),
+                ('response_size_bytes', 'response_size', 'Size of the response bodies')):
+            lines.append(f'# HELP {prefix}_{name} {description}.')
+            lines.append(f'# TYPE {prefix}_{name} histogram')
+            for (route, method), metrics in snapshot:
+                labels = f'route="{_label(route)}",method="{method}"'
+                _prometheus_histogram(lines, f'{prefix}_{name}', labels,
+                                      getattr(metrics, attribute))
+        return '\n'.join(lines) + '\n'
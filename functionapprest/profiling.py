@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+import io
+import marshal
+import random
+import sys
+import threading
+import time
+
+from collections import Counter
+
+
+class CProfileSampler(object):
+    """Class to profile one request with cProfile"""
+
+    def __init__(self) -> None:
+        import cProfile
+
+        self.profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self.profile.enable()
+
+    def stop(self) -> None:
+        self.profile.disable()
+
+    def merge(self, route_profile: 'RouteProfile') -> None:
+        route_profile.add_pstats(self.profile)
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+
+
+class StackSampler(object):
+    """Class to profile one request by sampling the stack of its thread
+
+    A background thread reads the stack every `interval` seconds, which costs
+    far less than cProfile on deep call graphs. The samples are collapsed
+    stacks, root first, the format of flame graph tools.
+    """
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.stacks = Counter()
+        self.__stopped = threading.Event()
+        self.__thread = None
+
+    def start(self) -> None:
+        thread_id = threading.get_ident()
+        self.__thread = threading.Thread(target=self.__sample, args=(thread_id,), daemon=True)
+        self.__thread.start()
+
+    def __sample(self, thread_id: int) -> None:
+        while not self.__stopped.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)  # pylint: disable=protected-access
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def stop(self) -> None:
+        self.__stopped.set()
+        if self.__thread is not None:
+            self.__thread.join()
+
+    def merge(self, route_profile: 'RouteProfile') -> None:
+        route_profile.add_stacks(self.stacks)
+
+
+profile_samplers = {
+    'cprofile': CProfileSampler,
+    'stack': StackSampler,
+}
+
+
+class RouteProfile(object):
+    """Class to aggregate the profiles of the requests of a route"""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.stats = None
+        self.stacks = Counter()
+
+    def add_pstats(self, profile) -> None:
+        import pstats
+
+        if self.stats is None:
+            self.stats = pstats.Stats(profile)
+        else:
+            self.stats.add(profile)
+
+    def add_stacks(self, stacks: Counter) -> None:
+        self.stacks.update(stacks)
+
+
+class Profiler(object):
+    """Class to profile a sample of the requests, aggregated by route
+
+    sample_rate:
+    Fraction of the requests of each route which are profiled.
+
+    slow_threshold:
+    Number of seconds after which a handler is slow. Once a request of a route
+    is slow, the next `slow_samples` requests of the route are profiled.
+
+    sampler:
+    `cprofile` (default), `stack` for the statistical stack sampler, or a
+    function returning an object with `start`, `stop` and `merge` methods.
+
+    At most one request is profiled at a time, the others are not delayed but
+    simply not profiled. With async handlers, the profile covers whatever the
+    event loop runs while the handler is awaited.
+    """
+
+    def __init__(self, sample_rate: float = 0.01, slow_threshold: float = None,
+                 slow_samples: int = 10, sampler='cprofile') -> None:
+        if not 0 <= sample_rate <= 1:
+            raise ValueError(f"sample_rate is expected to be between 0 and 1, got {sample_rate!r}")
+        if isinstance(sampler, str):
+            if sampler not in profile_samplers:
+                raise ValueError(
+                    f"sampler is expected to be one of {', '.join(sorted(profile_samplers))} "
+                    "or a function, "
+                    f"got {sampler!r}")
+            sampler = profile_samplers[sampler]
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.slow_samples = slow_samples
+        self.sampler = sampler
+        self.__routes = {}
+        self.__armed = {}
+        self.__active = threading.Lock()
+        self.__lock = threading.Lock()
+
+    def start(self, route: str):
+        """Started sampler if the request is to be profiled, None otherwise."""
+        armed = self.__armed.get(route)
+        if not armed and (not self.sample_rate or random.random() >= self.sample_rate):
+            return None
+        if not self.__active.acquire(blocking=False):
+            return None
+        if armed:
+            with self.__lock:
+                self.__armed[route] = max(0, self.__armed.get(route, 0) - 1)
+        try:
+            sampler = self.sampler()
+            sampler.start()
+        except Exception:
+            self.__active.release()
+            raise
+        return sampler
+
+    def stop(self, route: str, sampler) -> None:
+        try:
+            sampler.stop()
+        finally:
+            self.__active.release()
+        with self.__lock:
+            route_profile = self.__routes.get(route)
+            if route_profile is None:
+                route_profile = self.__routes[route] = RouteProfile()
+            route_profile.requests += 1
+            sampler.merge(route_profile)
+
+    def record(self, route: str, seconds: float) -> None:
+        """Arm the profiling of the next requests of the route if this one was slow."""
+        if self.slow_threshold is not None and seconds >= self.slow_threshold:
+            with self.__lock:
+                self.__armed[route] = self.slow_samples
+
+    def profile(self, route: str, func, args=(), kwargs=None):
+        """Result of `func(*args, **kwargs)`, profiled if sampled."""
+        started = time.perf_counter()
+        sampler = self.start(route)
+        try:
+            return func(*args, **(kwargs or {}))
+        finally:
+            if sampler is not None:
+                self.stop(route, sampler)
+            self.record(route, time.perf_counter() - started)
+
+    async def profile_async(self, route: str, func, args=(), kwargs=None):
+        """Result of `await func(*args, **kwargs)`, profiled if sampled."""
+        started = time.perf_counter()
+        sampler = self.start(route)
+        try:
+            return await func(*args, **(kwargs or {}))
+        finally:
+            if sampler is not None:
+                self.stop(route, sampler)
+            self.record(route, time.perf_counter() - started)
+
+    def routes(self) -> dict:
+        """Aggregated profile of each route which was profiled."""
+        with self.__lock:
+            return dict(self.__routes)
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__routes = {}
+            self.__armed = {}
+
+    def __stats(self, route: str = None):
+        import pstats
+
+        stats = None
+        for name, route_profile in self.routes().items():
+            if route is not None and name != route or route_profile.stats is None:
+                continue
+            if stats is None:
+                stats = pstats.Stats()
+            stats.add(route_profile.stats)
+        return stats
+
+    def pstats_bytes(self, route: str = None) -> bytes:
+        """Profile of the route, or of every route, in the pstats file format."""
+        stats = self.__stats(route)
+        return marshal.dumps(stats.stats if stats is not None else {})
+
+    def dump_pstats(self, filename: str, route: str = None) -> None:
+        with open(filename, 'wb') as pstats_file:
+            pstats_file.write(self.pstats_bytes(route))
+
+    def print_stats(self, route: str = None, sort: str = 'cumulative', limit: int = 30) -> str:
+        """Readable profile of the route, or of every route."""
+        stats = self.__stats(route)
+        if stats is None:
+            return ''
+        stream = io.StringIO()
+        stats.stream = stream
+        stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+    def collapsed(self, route: str = None) -> str:
+        """Sampled stacks in the collapsed format, one `stack count` per line."""
+        stacks = Counter()
+        for name, route_profile in self.routes().items():
+            if route is None or name == route:
+                stacks.update(route_profile.stacks)
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
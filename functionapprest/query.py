@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+import json
+import re
+
+# numbers exactly as JSON spells them, and as float() reads them
+_JSON_INTEGER = re.compile(r'-?(?:0|[1-9][0-9]*)\Z')
+_JSON_NUMBER = re.compile(r'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?\Z')
+_FLOAT = re.compile(r'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?\Z')
+_INTEGER = re.compile(r'[+-]?\d+\Z')
+_JSON_CONSTANTS = {'true': True, 'false': False, 'null': None}
+# JSON constants json.loads accepts on top of the standard ones
+_JSON_EXTENSIONS = frozenset(('NaN', 'Infinity', '-Infinity'))
+# spellings float() accepts which _FLOAT does not: whitespace, underscores,
+# non ascii digits, infinities and nans
+_UNUSUAL_FLOAT = re.compile(r'[_\s]|[^\x00-\x7f]|^[+-]?(?:inf|infinity|nan)\Z', re.IGNORECASE)
+
+
+def float_cast(value):
+    try:
+        return float(value)
+    except Exception:
+        pass
+    return value
+
+
+def marshall_query_value(value, loads=json.loads):
+    """Value of a query param, parsed as JSON or else as comma separated floats."""
+    try:
+        value = loads(value)
+    except Exception:
+        value_cand = value.split(',')
+        if len(value_cand) > 1:
+            value = list(map(float_cast, value_cand))
+    return value
+
+
+def _list_item(value):
+    if _FLOAT.match(value):
+        return float(value)
+    if _UNUSUAL_FLOAT.search(value):
+        return float_cast(value)
+    return value
+
+
+def parse_query_value(value, loads=json.loads):
+    """Same value as `marshall_query_value`, without raising for plain values
+
+    Constants, numbers and plain text are told apart by their spelling, only
+    the values which may be JSON documents are given to `loads`.
+    """
+    if value in _JSON_CONSTANTS:
+        return _JSON_CONSTANTS[value]
+    if _JSON_NUMBER.match(value):
+        return int(value) if _JSON_INTEGER.match(value) else float(value)
+    if (value[:1] in '[{"' or value in _JSON_EXTENSIONS or
+            value != value.strip(' \t\n\r')):
+        return marshall_query_value(value, loads)
+    if ',' in value:
+        return [_list_item(item) for item in value.split(',')]
+    return value
+
+
+def _coerce_integer(value):
+    return int(value) if _INTEGER.match(value) else value
+
+
+def _coerce_number(value):
+    if _INTEGER.match(value):
+        return int(value)
+    return float(value) if _FLOAT.match(value) else value
+
+
+def _coerce_boolean(value):
+    lowered = value.lower()
+    if lowered == 'true':
+        return True
+    if lowered == 'false':
+        return False
+    return value
+
+
+def _coerce_null(value):
+    return None if value in ('', 'null') else value
+
+
+def _coerce_string(value):
+    return value
+
+
+_TYPE_COERCERS = {
+    'integer': _coerce_integer,
+    'number': _coerce_number,
+    'boolean': _coerce_boolean,
+    'null': _coerce_null,
+    'string': _coerce_string,
+}
+# types tried in this order when a param may have several
+_TYPE_ORDER = ('null', 'boolean', 'integer', 'number', 'object', 'array', 'string')
+
+
+def _compile_coercer(schema, loads):
+    if not isinstance(schema, dict) or 'type' not in schema:
+        return lambda value: parse_query_value(value, loads)
+    types = schema['type'] if isinstance(schema['type'], list) else [schema['type']]
+    ordered = sorted(types, key=lambda name: _TYPE_ORDER.index(name) if name in _TYPE_ORDER else 0)
+    coercers = []
+    for schema_type in ordered:
+        if schema_type in ('object', 'array'):
+            coercers.append(_compile_document_coercer(schema_type, schema, loads))
+        elif schema_type in _TYPE_COERCERS:
+            coercers.append(_TYPE_COERCERS[schema_type])
+    if not coercers:
+        return lambda value: parse_query_value(value, loads)
+    if len(coercers) == 1:
+        return coercers[0]
+
+    def coerce(value):
+        # the first type the value converts to, strings converting to themselves
+        for coercer in coercers:
+            coerced = coercer(value)
+            if coerced is not value:
+                return coerced
+        return value
+    return coerce
+
+
+def _compile_document_coercer(schema_type: str, schema: dict, loads):
+    document_type = dict if schema_type == 'object' else list
+    item_coercer = _compile_coercer(schema.get('items'), loads) if schema_type == 'array' else None
+
+    def coerce(value):
+        if value[:1] in '[{':
+            try:
+                document = loads(value)
+            except Exception:
+                return value
+            return document if isinstance(document, document_type) else value
+        if item_coercer is None:
+            return value
+        return [item_coercer(item) for item in value.split(',')] if value else []
+    return coerce
+
+
+def compile_query_coercers(schema: dict, loads=json.loads) -> dict:
+    """Function converting each query param declared in the schema to its type
+
+    The params are declared in the `properties` of the `query` property of a
+    route schema. Values which do not convert are kept as strings, for the
+    schema validation to report them. Array params are comma separated,
+    unless given as a JSON array, and object params are JSON documents.
+    """
+    query_schema = (schema or {}).get('properties', {}).get('query', {})
+    properties = query_schema.get('properties', {}) if isinstance(query_schema, dict) else {}
+    return {name: _compile_coercer(property_schema, loads)
+            for name, property_schema in properties.items()}
+
+
+def load_query(query, loads=json.loads, coercers=None) -> dict:
+    """Query params converted by the coercers, or else by `parse_query_value`."""
+    if not query:
+        return {}
+    if not coercers:
+        return {key: parse_query_value(value, loads) for key, value in query.items()}
+    return {key: coercers[key](value) if key in coercers else parse_query_value(value, loads)
+            for key, value in query.items()}
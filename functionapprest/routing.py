@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+import re
+import threading
+
+
+def _match_compare_key(rule):
+    # same order werkzeug uses to try the rules one after the other
+    match_compare_key = getattr(rule, 'match_compare_key', None)
+    return match_compare_key() if match_compare_key else ()
+
+
+def allow_header(methods) -> str:
+    """Value of the Allow header for the methods, without OPTIONS and HEAD."""
+    methods = set(method.upper() for method in methods)
+    return ','.join(sorted(methods - {'OPTIONS', 'HEAD'}))
+
+
+class _UnsupportedRule(Exception):
+    pass
+
+
+class _Node(object):
+    """Node of the segment trie, one per distinct segment of the rules"""
+
+    __slots__ = ('static', 'dynamic', 'paths', 'rules')
+
+    def __init__(self) -> None:
+        self.static = {}
+        self.dynamic = {}
+        self.paths = {}
+        self.rules = []
+
+
+def _rule_segments(rule, url_map) -> list:
+    from werkzeug.routing import parse_converter_args, parse_rule
+
+    segments = [[]]
+    for converter, arguments, variable in parse_rule(rule.rule):
+        if converter is None:
+            pieces = variable.split('/')
+            if pieces[0]:
+                segments[-1].append(pieces[0])
+            segments.extend([piece] if piece else [] for piece in pieces[1:])
+            continue
+        if arguments:
+            args, kwargs = parse_converter_args(arguments)
+        else:
+            args, kwargs = (), {}
+        convobj = url_map.converters[converter](url_map, *args, **kwargs)
+        segments[-1].append((variable, converter, arguments, convobj))
+
+    # the rule always starts with a slash, so the first segment is empty
+    if segments[0]:
+        raise _UnsupportedRule(rule.rule)
+    segments = segments[1:]
+    if any(not segment for segment in segments[:-1]):
+        raise _UnsupportedRule(rule.rule)
+    return segments
+
+
+class _DispatchTable(object):
+    """Class with the frozen routes of a werkzeug map
+
+    Static rules live in a dict, the others in a trie of path segments.
+    Anything the table cannot decide exactly like werkzeug (redirects, errors,
+    unusual rules) is delegated to the werkzeug map adapter.
+    """
+
+    def __init__(self, url_map) -> None:
+        from werkzeug.routing import PathConverter, ValidationError
+
+        self.path_converter = PathConverter
+        self.validation_error = ValidationError
+        self.url_map = url_map
+        self.adapter = url_map.bind('')
+        self.static = {}
+        self.root = _Node()
+        self.has_branches = False
+        self.enabled = True
+        rules = sorted(url_map.iter_rules(), key=_match_compare_key)
+        # Allow header of each rule pattern, with the methods of every rule sharing it
+        pattern_methods = {}
+        for rule in rules:
+            pattern_methods.setdefault(rule.rule, set()).update(rule.methods)
+        self.allow = {pattern: allow_header(methods)
+                      for pattern, methods in pattern_methods.items()}
+        try:
+            for priority, rule in enumerate(rules):
+                self.__add(priority, rule, _rule_segments(rule, url_map))
+        except _UnsupportedRule:
+            self.enabled = False
+
+    def __add(self, priority: int, rule, segments: list) -> None:
+        if all(len(segment) <= 1 and all(isinstance(part, str) for part in segment)
+               for segment in segments):
+            self.static.setdefault(rule.rule, []).append((priority, rule))
+            return
+
+        node = self.root
+        for segment in segments:
+            if not segment:
+                node = node.static.setdefault('', _Node())
+            elif len(segment) == 1 and isinstance(segment[0], str):
+                node = node.static.setdefault(segment[0], _Node())
+            elif len(segment) == 1 and isinstance(segment[0][3], self.path_converter):
+                variable, _, _, convobj = segment[0]
+                key = (variable, segment[0][1], segment[0][2])
+                if key not in node.paths:
+                    node.paths[key] = (variable, convobj, _Node())
+                node = node.paths[key][2]
+            else:
+                node = self.__add_dynamic(node, segment)
+        node.rules.append((priority, rule))
+        if not rule.is_leaf:
+            self.has_branches = True
+
+    def __add_dynamic(self, node: _Node, segment: list) -> _Node:
+        key = tuple(part if isinstance(part, str) else part[:3] for part in segment)
+        if key not in node.dynamic:
+            regex_parts = []
+            converters = []
+            for part in segment:
+                if isinstance(part, str):
+                    regex_parts.append(re.escape(part))
+                    continue
+                variable, _, _, convobj = part
+                if isinstance(convobj, self.path_converter):
+                    raise _UnsupportedRule(variable)
+                regex_parts.append(f"(?P<{variable}>{convobj.regex})")
+                converters.append((variable, convobj))
+            node.dynamic[key] = (re.compile(''.join(regex_parts)), tuple(converters), _Node())
+        return node.dynamic[key][2]
+
+    def collect(self, path: str) -> list:
+        """Every dynamic rule matching the path as (priority, rule, kwargs)."""
+        found = []
+        self.__collect(self.root, path.split('/')[1:], 0, {}, found)
+        return found
+
+    def __collect(self, node: _Node, segments: list, index: int, values: dict, found: list) -> None:
+        if index == len(segments):
+            for priority, rule in node.rules:
+                found.append((priority, rule, dict(values)))
+            return
+
+        segment = segments[index]
+        child = node.static.get(segment)
+        if child is not None:
+            self.__collect(child, segments, index + 1, values, found)
+
+        for regex, converters, child in node.dynamic.values():
+            match = regex.fullmatch(segment)
+            if match is None:
+                continue
+            try:
+                converted = {variable: convobj.to_python(match.group(variable))
+                             for variable, convobj in converters}
+            except self.validation_error:
+                continue
+            self.__collect(child, segments, index + 1, dict(values, **converted), found)
+
+        # path converters match one or more segments, the shortest first
+        if not segment:
+            return
+        for variable, convobj, child in node.paths.values():
+            for end in range(index + 1, len(segments) + 1):
+                try:
+                    value = convobj.to_python('/'.join(segments[index:end]))
+                except self.validation_error:
+                    continue
+                self.__collect(child, segments, end, dict(values, **{variable: value}), found)
+
+    def branches(self, path: str) -> list:
+        """Rules ending with a slash which werkzeug would redirect the path to."""
+        branch_path = path + '/'
+        found = [(priority, rule, {}) for priority, rule in self.static.get(branch_path, ())]
+        if self.has_branches:
+            found.extend(self.collect(branch_path))
+        return [entry for entry in found if not entry[1].is_leaf]
+
+
+class Router(object):
+    """Class to match paths against the rules of a werkzeug map
+
+    Matches, errors and allowed methods are the same as `MapAdapter.match`
+    and `MapAdapter.allowed_methods` from werkzeug.
+
+    The rules are matched against a frozen dispatch table, with a werkzeug map
+    of its own, which requests only ever read. Adding a rule, or calling
+    `invalidate` after changing the given map, never changes the table in
+    use: a new one is built, under a lock, the first time a path is matched
+    afterwards and replaces the previous one at once. Requests in flight
+    keep matching against the table they started with, and matching takes no
+    lock once the table is built.
+
+    Each rule is compiled when it is added, so an invalid one, like an unknown
+    converter, raises there and not on the requests. Without a map, werkzeug
+    is only imported when the first rule is added and the map only built when
+    the first path is matched.
+    """
+
+    def __init__(self, url_map=None) -> None:
+        self.__base_map = url_map
+        self.__rules = ()
+        self.__table = None
+        self.__lock = threading.Lock()
+        self.__validation_map = None
+
+    @property
+    def url_map(self):
+        """Werkzeug map of the table in use."""
+        return self.table.url_map
+
+    def add(self, path: str, endpoint, methods: list) -> None:
+        self.__validate(path, endpoint, methods)
+        with self.__lock:
+            self.__rules = self.__rules + ((path, endpoint, tuple(methods)),)
+            self.__table = None
+
+    def __validate(self, path: str, endpoint, methods: list) -> None:
+        from werkzeug.routing import Map, Rule
+
+        if self.__validation_map is None:
+            base_map = self.__base_map
+            self.__validation_map = Map() if base_map is None else Map(
+                converters=base_map.converters)
+        # binding compiles the rule, without adding it to the map
+        Rule(path, endpoint=endpoint, methods=list(methods)).bind(self.__validation_map)
+
+    def endpoints(self) -> list:
+        """Endpoints of the rules, in the order they were added."""
+        return [rule.endpoint for rule in self.url_map.iter_rules()]
+
+    def invalidate(self) -> None:
+        with self.__lock:
+            self.__table = None
+
+    @property
+    def table(self) -> _DispatchTable:
+        table = self.__table
+        if table is None:
+            with self.__lock:
+                table = self.__table
+                if table is None:
+                    table = self.__table = _DispatchTable(self.__build_map())
+        return table
+
+    def __build_map(self):
+        from werkzeug.routing import Map, Rule
+
+        base_map = self.__base_map
+        if base_map is None:
+            url_map = Map()
+        else:
+            # copies of the rules, the given map stays the caller's to change
+            url_map = Map([rule.empty() for rule in base_map.iter_rules()],
+                          strict_slashes=base_map.strict_slashes,
+                          merge_slashes=base_map.merge_slashes,
+                          redirect_defaults=base_map.redirect_defaults,
+                          converters=base_map.converters,
+                          host_matching=base_map.host_matching)
+        for path, endpoint, methods in self.__rules:
+            url_map.add(Rule(path, endpoint=endpoint, methods=list(methods)))
+        # sorted now, so matching never takes the lock of the map
+        url_map.update()
+        return url_map
+
+    @staticmethod
+    def __normalize(path: str):
+        if not path:
+            return None
+        path = '/' + path.lstrip('/')
+        # merged slashes are redirected by werkzeug
+        if '//' in path:
+            return None
+        return path
+
+    def match(self, path: str, method: str):
+        """Matched rule and its converted arguments, or the werkzeug routing exception."""
+        table = self.table
+        normalized = self.__normalize(path) if table.enabled else None
+        if normalized is None:
+            return table.adapter.match(path, method=method, return_rule=True)
+        path = normalized
+        method = method.upper()
+        is_branch = path.endswith('/')
+
+        for priority, rule in table.static.get(path, ()):
+            if method in rule.methods:
+                if not is_branch and any(entry[0] < priority and method in entry[1].methods
+                                         for entry in table.branches(path)):
+                    break
+                return rule, {}
+        else:
+            candidates = [entry for entry in table.collect(path) if method in entry[1].methods]
+            best = min(candidates, key=lambda entry: entry[0]) if candidates else None
+            if best is not None and (is_branch or not any(
+                    entry[0] < best[0] and method in entry[1].methods
+                    for entry in table.branches(path))):
+                return best[1], best[2]
+
+        # not found, method not allowed or redirect
+        return table.adapter.match(path, method=method, return_rule=True)
+
+    def __allowed_rules(self, table: _DispatchTable, path: str):
+        """Rules matching the path whatever the method, as (priority, rule),
+        or None if the table cannot tell."""
+        normalized = self.__normalize(path) if table.enabled else None
+        if normalized is None:
+            return None
+        path = normalized
+
+        entries = list(table.static.get(path, ()))
+        entries.extend((priority, rule) for priority, rule, _ in table.collect(path))
+        if not path.endswith('/'):
+            entries.extend((priority, rule) for priority, rule, _ in table.branches(path))
+        return entries
+
+    def allowed_methods(self, path: str) -> list:
+        table = self.table
+        entries = self.__allowed_rules(table, path)
+        if entries is None:
+            return table.adapter.allowed_methods(path)
+        methods = set()
+        for _, rule in entries:
+            methods.update(rule.methods)
+        return list(methods)
+
+    def allow(self, path: str) -> tuple:
+        """Allow header of the path and the pattern of the first rule matching
+        it, (None, None) when no rule matches it.
+
+        The header is computed once per rule pattern when the table is built,
+        so paths matching the rules of a single pattern, the usual case, do
+        not format it again.
+        """
+        table = self.table
+        entries = self.__allowed_rules(table, path)
+        if entries is None:
+            return self.__adapter_allow(table, path)
+        if not entries:
+            return None, None
+        pattern = min(entries, key=lambda entry: entry[0])[1].rule
+        if all(rule.rule == pattern for _, rule in entries):
+            return table.allow[pattern], pattern
+        methods = set()
+        for _, rule in entries:
+            methods.update(rule.methods)
+        return allow_header(methods), pattern
+
+    @staticmethod
+    def __adapter_allow(table: _DispatchTable, path: str) -> tuple:
+        from werkzeug.exceptions import HTTPException
+
+        methods = table.adapter.allowed_methods(path)
+        if not methods:
+            return None, None
+        try:
+            rule, _ = table.adapter.match(path, method=sorted(methods)[0], return_rule=True)
+        except HTTPException:
+            return allow_header(methods), None
+        return allow_header(methods), rule.rule
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import importlib
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+_HOST_STREAMING_MODULE = 'azurefunctions.extensions.http.fastapi'
+
+
+def _buffered(pieces, buffer_size: int):
+    # pieces are small, so they are grouped into chunks of about buffer_size
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= buffer_size:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def iter_ndjson(items, encode, buffer_size: int = DEFAULT_BUFFER_SIZE):
+    """Chunks of newline delimited JSON, one line per item."""
+    def pieces():
+        for item in items:
+            yield encode(item)
+            yield b'\n'
+    return _buffered(pieces(), buffer_size)
+
+
+def iter_json_array(items, encode, buffer_size: int = DEFAULT_BUFFER_SIZE):
+    """Chunks of a JSON array of the items, encoded one item at a time."""
+    def pieces():
+        separator = b'['
+        for item in items:
+            yield separator
+            yield encode(item)
+            separator = b','
+        yield b']' if separator == b',' else b'[]'
+    return _buffered(pieces(), buffer_size)
+
+
+stream_formats = {
+    'json': (iter_json_array, 'application/json'),
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+}
+
+
+def get_stream_format(stream_format: str = 'json'):
+    if stream_format not in stream_formats:
+        raise ValueError(
+            f"stream_format is expected to be one of {', '.join(sorted(stream_formats))}, "
+            f"got {stream_format!r}")
+    return stream_formats[stream_format]
+
+
+def host_streaming_response_class():
+    """Streaming response class of the functions host, None if not installed.
+
+    Http streaming is provided by the `azurefunctions-extensions-http-fastapi`
+    package, with the python v2 programming model.
+    """
+    try:
+        module = importlib.import_module(_HOST_STREAMING_MODULE)
+    except ImportError:
+        return None
+    return getattr(module, 'StreamingResponse', None)
+
+
+def to_host_response(response):
+    """Response streamed by the functions host, or the response itself if the
+    host does not support streaming.
+
+    The chunks are sent as they are encoded, so the body is never held in
+    memory as a whole. Only the response is converted, the requests of the
+    extension are not accepted by the dispatcher.
+    """
+    streaming_response_class = host_streaming_response_class()
+    if streaming_response_class is None:
+        return response
+    return streaming_response_class(
+        content=response.iter_body(),
+        status_code=response.status_code or 200,
+        headers=dict(response.headers or {}),
+        media_type=response.mimetype)
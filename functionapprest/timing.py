@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import time
+
+
+class PhaseTimer(object):
+    """Class to time the consecutive phases of a request
+
+    Each call to `mark` records the time elapsed since the previous one under
+    the given phase, so the phases add up to the total time of the request.
+    Durations are in seconds. The dispatcher sets `route` to the pattern of
+    the matched route.
+    """
+
+    __slots__ = ('start', 'last', 'timings', 'route')
+
+    def __init__(self) -> None:
+        self.start = self.last = time.perf_counter()
+        self.timings = {}
+        self.route = None
+
+    def mark(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.timings[phase] = self.timings.get(phase, 0.0) + now - self.last
+        self.last = now
+
+    def stop(self) -> dict:
+        """Durations of the phases, with the total duration of the request."""
+        timings = dict(self.timings)
+        timings['total'] = self.last - self.start
+        return timings
+
+
+def server_timing(timings: dict) -> str:
+    """Value of a Server-Timing header, with durations in milliseconds."""
+    return ', '.join(f"{phase};dur={seconds * 1e3:.3f}" for phase, seconds in timings.items())
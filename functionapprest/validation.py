@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import math
+import re
+import threading
+
+
+class CompiledValidator(object):
+    """Class to validate instances against a schema checked and compiled only once
+
+    The draft is picked from the `$schema` keyword, the same way
+    `jsonschema.validate` does it, and the raised error is also the best match.
+    jsonschema is only imported once a first schema is compiled.
+    """
+
+    def __init__(self, schema: dict, format_checker=None) -> None:
+        from jsonschema.exceptions import best_match
+        from jsonschema.validators import validator_for
+
+        self.__best_match = best_match
+        validator_class = validator_for(schema)
+        validator_class.check_schema(schema)
+        self.schema = schema
+        self.validator_class = validator_class
+        self.format_checker = format_checker
+        self.__validator = validator_class(schema, format_checker=format_checker)
+
+    def iter_errors(self, instance):
+        return self.__validator.iter_errors(instance)
+
+    def best_error(self, instance):
+        """Most relevant error of the instance, None if it is valid."""
+        return self.__best_match(self.__validator.iter_errors(instance))
+
+    def validate(self, instance) -> None:
+        error = self.__best_match(self.__validator.iter_errors(instance))
+        if error is not None:
+            raise error
+
+
+class _UnsupportedSchema(Exception):
+    pass
+
+
+def _always_valid(value):
+    return True
+
+
+def _never_valid(value):
+    return False
+
+
+def _strict_equal(one, two) -> bool:
+    if isinstance(one, bool) or isinstance(two, bool):
+        return one is two
+    if isinstance(one, dict) and isinstance(two, dict):
+        return one.keys() == two.keys() and all(_strict_equal(one[key], two[key]) for key in one)
+    if isinstance(one, list) and isinstance(two, list):
+        return len(one) == len(two) and all(map(_strict_equal, one, two))
+    if isinstance(one, (dict, list)) or isinstance(two, (dict, list)):
+        return False
+    return one == two
+
+
+def _enum_contains(value, enums) -> bool:
+    return any(_strict_equal(value, item) for item in enums)
+
+
+_TYPE_CHECKS = {
+    'object': 'isinstance(value, dict)',
+    'array': 'isinstance(value, list)',
+    'string': 'isinstance(value, str)',
+    'boolean': 'isinstance(value, bool)',
+    'null': 'value is None',
+    'number': '(isinstance(value, (int, float)) and not isinstance(value, bool))',
+    'integer': '(isinstance(value, int) and not isinstance(value, bool)'
+               ' or isinstance(value, float) and value.is_integer())',
+}
+_DRAFT4_INTEGER_CHECK = '(isinstance(value, int) and not isinstance(value, bool))'
+
+_SUPPORTED_KEYWORDS = frozenset([
+    'type', 'properties', 'required', 'additionalProperties', 'items', 'enum',
+    'minimum', 'maximum', 'exclusiveMinimum', 'exclusiveMaximum',
+    'minLength', 'maxLength', 'minItems', 'maxItems', 'pattern', 'format',
+])
+
+
+class _SchemaCompiler(object):
+    """Class to translate a schema into the source of specialised python functions
+
+    Only a subset of the keywords is supported, any other validation keyword
+    raises `_UnsupportedSchema`. The generated functions only tell whether the
+    instance is valid, they never report why.
+    """
+
+    def __init__(self, validator_class, format_checker=None) -> None:
+        from jsonschema import validators
+
+        self.keywords = frozenset(validator_class.VALIDATORS)
+        draft3 = getattr(validators, 'Draft3Validator', None)
+        if draft3 is not None and validator_class is draft3:
+            raise _UnsupportedSchema('draft-03')
+        self.draft4 = validator_class is getattr(validators, 'Draft4Validator', None)
+        self.format_checker = format_checker
+        self.namespace = {
+            '_always_valid': _always_valid,
+            '_never_valid': _never_valid,
+            '_enum_contains': _enum_contains,
+            '_format_checker': format_checker,
+        }
+        self.lines = []
+
+    def compile(self, schema):
+        name = self.function(schema)
+        source = '\n'.join(self.lines)
+        code = compile(source, '<functionapprest.validation>', 'exec')
+        exec(code, self.namespace)  # pylint: disable=exec-used
+        return self.namespace[name]
+
+    def constant(self, value) -> str:
+        name = f"_constant_{len(self.namespace)}"
+        self.namespace[name] = value
+        return name
+
+    def number(self, value) -> str:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise _UnsupportedSchema(repr(value))
+        if isinstance(value, float) and not math.isfinite(value):
+            return self.constant(value)
+        return repr(value)
+
+    def function(self, schema) -> str:
+        if schema is True or schema == {}:
+            return '_always_valid'
+        if schema is False:
+            return '_never_valid'
+        if not isinstance(schema, dict):
+            raise _UnsupportedSchema(repr(schema))
+        for keyword in schema:
+            if keyword in self.keywords and keyword not in _SUPPORTED_KEYWORDS:
+                raise _UnsupportedSchema(keyword)
+
+        body = []
+        body += self.type_lines(schema)
+        body += self.indent('isinstance(value, dict)', self.object_lines(schema))
+        body += self.indent('isinstance(value, list)', self.array_lines(schema))
+        body += self.indent('isinstance(value, str)', self.string_lines(schema))
+        body += self.indent(_TYPE_CHECKS['number'], self.number_lines(schema))
+        if 'enum' in schema:
+            enum = self.constant(schema['enum'])
+            body.append(f"if not _enum_contains(value, {enum}): return False")
+        if 'format' in schema and self.format_checker is not None:
+            body.append(f"if not _format_checker.conforms(value, {schema['format']!r}): "
+                        "return False")
+
+        name = f"_validate_{len(self.lines)}"
+        self.lines.append(f"def {name}(value):")
+        self.lines.extend(f"    {line}" for line in body)
+        self.lines.append('    return True')
+        return name
+
+    @staticmethod
+    def indent(condition: str, lines: list) -> list:
+        if not lines:
+            return []
+        return [f"if {condition}:"] + [f"    {line}" for line in lines]
+
+    def type_lines(self, schema) -> list:
+        if 'type' not in schema:
+            return []
+        types = schema['type']
+        if isinstance(types, str):
+            types = [types]
+        checks = []
+        for type_name in types:
+            if type_name == 'integer' and self.draft4:
+                checks.append(_DRAFT4_INTEGER_CHECK)
+            elif type_name in _TYPE_CHECKS:
+                checks.append(_TYPE_CHECKS[type_name])
+            else:
+                raise _UnsupportedSchema(f"type {type_name!r}")
+        return [f"if not ({' or '.join(checks) or 'False'}): return False"]
+
+    def object_lines(self, schema) -> list:
+        lines = []
+        for key in schema.get('required', []):
+            lines.append(f"if {key!r} not in value: return False")
+        properties = schema.get('properties', {})
+        for key, subschema in properties.items():
+            name = self.function(subschema)
+            if name != '_always_valid':
+                lines.append(f"if {key!r} in value and not {name}(value[{key!r}]): return False")
+        if 'additionalProperties' in schema:
+            name = self.function(schema['additionalProperties'])
+            if name != '_always_valid':
+                known = self.constant(frozenset(properties))
+                lines.append('for key in value:')
+                lines.append(f"    if key not in {known} and not {name}(value[key]): return False")
+        return lines
+
+    def array_lines(self, schema) -> list:
+        lines = []
+        if 'minItems' in schema:
+            lines.append(f"if len(value) < {self.number(schema['minItems'])}: return False")
+        if 'maxItems' in schema:
+            lines.append(f"if len(value) > {self.number(schema['maxItems'])}: return False")
+        if 'items' in schema:
+            if not isinstance(schema['items'], (dict, bool)):
+                raise _UnsupportedSchema('items')
+            name = self.function(schema['items'])
+            if name != '_always_valid':
+                lines.append('for item in value:')
+                lines.append(f"    if not {name}(item): return False")
+        return lines
+
+    def string_lines(self, schema) -> list:
+        lines = []
+        if 'minLength' in schema:
+            lines.append(f"if len(value) < {self.number(schema['minLength'])}: return False")
+        if 'maxLength' in schema:
+            lines.append(f"if len(value) > {self.number(schema['maxLength'])}: return False")
+        if 'pattern' in schema:
+            pattern = self.constant(re.compile(schema['pattern']))
+            lines.append(f"if {pattern}.search(value) is None: return False")
+        return lines
+
+    def number_lines(self, schema) -> list:
+        lines = []
+        if 'minimum' in schema:
+            operator = '<=' if self.draft4 and schema.get('exclusiveMinimum') else '<'
+            lines.append(f"if value {operator} {self.number(schema['minimum'])}: return False")
+        if 'maximum' in schema:
+            operator = '>=' if self.draft4 and schema.get('exclusiveMaximum') else '>'
+            lines.append(f"if value {operator} {self.number(schema['maximum'])}: return False")
+        if not self.draft4:
+            if 'exclusiveMinimum' in schema:
+                lines.append(f"if value <= {self.number(schema['exclusiveMinimum'])}: return False")
+            if 'exclusiveMaximum' in schema:
+                lines.append(f"if value >= {self.number(schema['exclusiveMaximum'])}: return False")
+        return lines
+
+
+class GeneratedValidator(CompiledValidator):
+    """Class to validate instances with python functions generated from the schema
+
+    The generated functions only decide whether an instance is valid. Invalid
+    instances are validated again by jsonschema, so the raised error is the same
+    as with `CompiledValidator`. Schemas using keywords outside of the supported
+    subset are validated by jsonschema only.
+    """
+
+    def __init__(self, schema: dict, format_checker=None) -> None:
+        super(GeneratedValidator, self).__init__(schema, format_checker=format_checker)
+        try:
+            compiler = _SchemaCompiler(self.validator_class, format_checker=format_checker)
+            self.__is_valid = compiler.compile(schema)
+            self.generated = True
+        except _UnsupportedSchema as err:
+            logging.debug('Schema validated by jsonschema, unsupported keyword: %s', err)
+            self.__is_valid = None
+            self.generated = False
+
+    def is_valid(self, instance) -> bool:
+        if self.__is_valid is None:
+            return self.best_error(instance) is None
+        return self.__is_valid(instance)
+
+    def validate(self, instance) -> None:
+        if self.__is_valid is not None and self.__is_valid(instance):
+            return
+        super(GeneratedValidator, self).validate(instance)
+
+
+class ValidatorCache(object):
+    """Class to share compiled validators between routes
+
+    Validators are looked up by schema identity first and by schema content
+    afterwards, so equal schemas registered on several routes compile once.
+    """
+
+    def __init__(self) -> None:
+        self.__by_identity = {}
+        self.__by_content = {}
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.__by_content)
+
+    def get(self, schema: dict, format_checker=None,
+            validator_class=CompiledValidator) -> CompiledValidator:
+        key = (id(schema), id(format_checker), validator_class)
+        entry = self.__by_identity.get(key)
+        # the schema is kept in the entry, so its id cannot be reused
+        if entry is not None and entry[0] is schema:
+            return entry[1]
+
+        content_key = (json.dumps(schema, sort_keys=True, default=str), id(format_checker),
+                       validator_class)
+        with self.__lock:
+            validator = self.__by_content.get(content_key)
+            if validator is None:
+                validator = validator_class(schema, format_checker=format_checker)
+                self.__by_content[content_key] = validator
+            self.__by_identity[key] = (schema, validator)
+        return validator
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__by_identity = {}
+            self.__by_content = {}
+
+
+validator_cache = ValidatorCache()
+
+validator_backends = {
+    'jsonschema': CompiledValidator,
+    'codegen': GeneratedValidator,
+}
+
+
+def get_validator_class(backend: str = 'jsonschema'):
+    if backend not in validator_backends:
+        raise ValueError(
+            f"validator is expected to be one of {', '.join(sorted(validator_backends))}, "
+            f"got {backend!r}")
+    return validator_backends[backend]
+
+
+def compile_validator(schema: dict, format_checker=None,
+                      backend: str = 'jsonschema') -> CompiledValidator:
+    """Compiled validator of the schema, shared with any equal schema."""
+    return validator_cache.get(schema, format_checker=format_checker,
+                               validator_class=get_validator_class(backend))
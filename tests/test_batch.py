@@ -0,0 +1,143 @@
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import asyncio
+import json
+import threading
+import time
+import unittest
+
+from functionapprest import create_functionapp_handler, Request, FunctionsContext
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.context = FunctionsContext(
+            function_directory='/home/serverless/products-list',
+            function_name='products-list',
+            invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+            bindings={}
+        )
+
+    def register(self, functionapp_handler):
+        schema = {
+            '$schema': 'http://json-schema.org/draft-04/schema#',
+            'type': 'object',
+            'properties': {'body': {'type': 'object', 'required': ['name']}}
+        }
+
+        @functionapp_handler.handle('get', path='/products/<int:id>')
+        def get_product(req, id):
+            return {'id': id, 'query': req.json['query'], 'auth': req.headers.get('Authorization')}
+
+        @functionapp_handler.handle('post', path='/products/', schema=schema)
+        def post_product(req):
+            return req.json['body'], 201
+
+        @functionapp_handler.handle('get', path='/fail/')
+        def fail(req):
+            raise RuntimeError('failed')
+
+        @functionapp_handler.handle('get', path='/text/')
+        def text(req):
+            return 'plain'
+
+    def batch_request(self, entries, **headers):
+        req = Request('POST', 'http://localhost:7071/api/batch/', headers=headers)
+        req.set_body(json.dumps(entries))
+        return req
+
+    def entries(self):
+        return [
+            {'path': '/products/1', 'query': {'ids': [1, 2], 'name': 'foo'}},
+            {'method': 'POST', 'path': '/products/', 'body': {'name': 'bar'}},
+            {'method': 'POST', 'path': '/products/', 'body': {}},
+            {'path': '/fail/'},
+            {'path': '/missing/'},
+            {'method': 'DELETE', 'path': '/products/1'},
+            {'path': '/text/'},
+            {'method': 'POST', 'path': '/batch/', 'body': []},
+        ]
+
+    def assert_results(self, response):
+        assert response.status_code == 200
+        results = json.loads(response.get_body())
+        assert [result['status_code'] for result in results] == [
+            200, 201, 400, 500, 404, 405, 200, 400]
+        assert results[0]['body'] == {
+            'id': 1, 'query': {'ids': [1.0, 2.0], 'name': 'foo'}, 'auth': 'Bearer x'}
+        assert results[1]['body'] == {'name': 'bar'}
+        assert 'Validation Error' in results[2]['body']['message']
+        assert results[3]['body'] == {'statusCode': 500, 'message': 'failed'}
+        assert results[6]['body'] == 'plain'
+        assert results[7]['body']['message'] == 'Batch requests cannot be nested'
+
+    def test_sequential(self):
+        functionapp_handler = create_functionapp_handler(headers={})
+        self.register(functionapp_handler)
+        functionapp_handler.handle_batch()
+        req = self.batch_request(self.entries(), Authorization='Bearer x',
+                                 **{'Accept-Encoding': 'gzip'})
+        self.assert_results(functionapp_handler(req, self.context))
+
+    def test_bounded_concurrency(self):
+        functionapp_handler = create_functionapp_handler(headers={})
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        @functionapp_handler.handle('get', path='/slow/<int:id>')
+        def slow(req, id):
+            with lock:
+                running.append(id)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(id)
+            return {'id': id}
+
+        functionapp_handler.handle_batch(concurrency=3)
+        req = self.batch_request([{'path': f"/slow/{index}"} for index in range(9)])
+        start = time.perf_counter()
+        results = json.loads(functionapp_handler(req, self.context).get_body())
+        assert time.perf_counter() - start < 0.4
+        assert [result['body']['id'] for result in results] == list(range(9))
+        assert max(peak) == 3
+
+    def test_async(self):
+        functionapp_handler = create_functionapp_handler(headers={}, async_mode=True)
+        self.register(functionapp_handler)
+        functionapp_handler.handle_batch(path='/batch/', concurrency=2)
+        req = self.batch_request(self.entries(), Authorization='Bearer x')
+        loop = asyncio.new_event_loop()
+        try:
+            response = loop.run_until_complete(functionapp_handler(req, self.context))
+        finally:
+            loop.close()
+        self.assert_results(response)
+
+    def test_invalid_batches(self):
+        functionapp_handler = create_functionapp_handler(headers={})
+        functionapp_handler.handle_batch(max_requests=2)
+        for entries in ({'path': '/'}, [{'method': 'GET'}], [{'path': 'no-slash'}],
+                        [{'path': '/'}] * 3):
+            response = functionapp_handler(self.batch_request(entries), self.context)
+            assert response.status_code == 400
+
+    def test_invalid_concurrency(self):
+        for async_mode in (False, True):
+            functionapp_handler = create_functionapp_handler(headers={}, async_mode=async_mode)
+            for concurrency in (0, -1, 1.5, True):
+                with self.assertRaises(ValueError):
+                    functionapp_handler.handle_batch(concurrency=concurrency)
+
+    def test_unexpected_errors_stay_in_their_entry(self):
+        functionapp_handler = create_functionapp_handler(headers={}, error_handler=None)
+        self.register(functionapp_handler)
+        functionapp_handler.handle_batch()
+        req = self.batch_request([{'path': '/fail/'}, {'path': '/text/'}])
+        with mock.patch('functionapprest.logging.exception'):
+            results = json.loads(functionapp_handler(req, self.context).get_body())
+        assert [result['status_code'] for result in results] == [500, 200]
@@ -0,0 +1,234 @@
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import gzip
+import json
+import unittest
+
+from functionapprest import (create_functionapp_handler, Request, FunctionsContext, CachePolicy,
+                             ResponseCache)
+from functionapprest.cache import CachedResponse, get_cache_policy
+
+
+def get_cached(size: int) -> CachedResponse:
+    return CachedResponse(b'x' * size, 200, {}, 'application/json', 'utf-8', True, False)
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_ttl(self):
+        cache = ResponseCache()
+        with mock.patch('functionapprest.cache.time.monotonic',
+                        return_value=100.0) as monotonic_mock:
+            cache.set('a', get_cached(10), ttl=30)
+            monotonic_mock.return_value = 129.0
+            assert cache.get('a') is not None
+            monotonic_mock.return_value = 130.0
+            assert cache.get('a') is None
+        assert cache.stats() == {'entries': 0, 'bytes': 0, 'hits': 1, 'misses': 1,
+                                 'evictions': 0, 'expirations': 1}
+
+    def test_lru_eviction_by_entries(self):
+        cache = ResponseCache(max_entries=2)
+        cache.set('a', get_cached(1), ttl=30)
+        cache.set('b', get_cached(1), ttl=30)
+        cache.get('a')
+        cache.set('c', get_cached(1), ttl=30)
+        assert cache.get('b') is None
+        assert cache.get('a') is not None and cache.get('c') is not None
+        assert cache.evictions == 1 and len(cache) == 2
+
+    def test_lru_eviction_by_bytes(self):
+        cache = ResponseCache(max_bytes=100)
+        cache.set('a', get_cached(40), ttl=30)
+        cache.set('b', get_cached(40), ttl=30)
+        cache.set('c', get_cached(40), ttl=30)
+        assert cache.get('a') is None
+        assert cache.size == 80 and cache.evictions == 1
+
+        cache.set('d', get_cached(101), ttl=30)
+        assert cache.get('d') is None and cache.size == 80
+
+    def test_compressed_bodies_count_in_size(self):
+        cache = ResponseCache()
+        cached = get_cached(10)
+        cache.set('a', cached, ttl=30)
+        cache.add_compressed('a', cached, 'gzip', b'y' * 5)
+        assert cache.size == 15 and cached.compressed == {'gzip': b'y' * 5}
+
+        cache.clear()
+        cache.add_compressed('a', cached, 'deflate', b'y' * 5)
+        assert cache.size == 0
+
+    def test_cache_policy(self):
+        assert get_cache_policy(None) is None
+        assert get_cache_policy(False) is None
+        assert get_cache_policy(30).ttl == 30
+        policy = CachePolicy(ttl=5, headers=['Accept-Language'])
+        assert get_cache_policy(policy) is policy
+        with self.assertRaises(ValueError):
+            get_cache_policy('30')
+        with self.assertRaises(ValueError):
+            CachePolicy(ttl=0)
+
+
+class TestCachedRoutes(unittest.TestCase):
+    def setUp(self):
+        self.context = FunctionsContext(
+            function_directory='/home/serverless/products-list',
+            function_name='products-list',
+            invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+            bindings={}
+        )
+        with mock.patch.dict('os.environ', {'AZURE_FUNCTIONS_ENVIRONMENT': 'production'}):
+            self.functionapp_handler = create_functionapp_handler(headers={}, compression=True,
+                                                                  etag='weak')
+        self.calls = []
+        schema = {'$schema': 'http://json-schema.org/draft-04/schema#', 'type': 'object'}
+
+        @self.functionapp_handler.handle('get', path='/products/<int:id>', cache=30, schema=schema)
+        def get_product(req, id):
+            self.calls.append(id)
+            return {'id': id, 'query': req.json['query'],
+                    'names': [f"product {index}" for index in range(100)]}
+
+        @self.functionapp_handler.handle('get', path='/translated/',
+                                         cache=CachePolicy(ttl=30, headers=['Accept-Language']))
+        def get_translated(req):
+            self.calls.append('translated')
+            return {'language': req.headers.get('Accept-Language')}
+
+        @self.functionapp_handler.handle('get', path='/custom/<int:id>',
+                                         cache=CachePolicy(ttl=30, key=lambda req, id: id % 2))
+        def get_custom(req, id):
+            self.calls.append(id)
+            return {'id': id}
+
+        @self.functionapp_handler.handle('get', path='/empty/', cache=30)
+        def get_empty(req):
+            self.calls.append('empty')
+            return []
+
+    def request(self, path: str, params=None, **headers):
+        headers = {key.replace('_', '-'): value for key, value in headers.items()}
+        event = Request('GET', f"http://localhost:7071/api{path}", headers=headers, params=params)
+        return self.functionapp_handler(event, self.context)
+
+    def test_hit_skips_the_handler_and_serialization(self):
+        first = self.request('/products/1', params={'a': '1', 'b': '2'})
+        with mock.patch.object(self.functionapp_handler.json_codec, 'dumps_bytes') as dumps_mock, \
+                mock.patch.object(self.functionapp_handler.json_codec, 'loads') as loads_mock:
+            second = self.request('/products/1', params={'b': '2', 'a': '1'})
+        assert dumps_mock.call_count == 0
+        assert loads_mock.call_count == 0
+        assert self.calls == [1]
+        assert second.get_body() == first.get_body()
+        assert second.to_json() == first.to_json()
+        assert second.headers['ETag'] == first.headers['ETag']
+        assert self.functionapp_handler.response_cache.hits == 1
+
+        self.request('/products/1', params={'a': '2'})
+        self.request('/products/2', params={'a': '1'})
+        assert self.calls == [1, 1, 2]
+
+    def test_compressed_bodies_are_cached(self):
+        first = self.request('/products/1', Accept_Encoding='gzip')
+        with mock.patch('functionapprest.compression.zlib.compressobj') as compressobj_mock:
+            second = self.request('/products/1', Accept_Encoding='gzip')
+            identity = self.request('/products/1')
+        assert compressobj_mock.call_count == 0
+        assert second.headers['Content-Encoding'] == 'gzip'
+        assert second.get_body() == first.get_body()
+        assert json.loads(gzip.decompress(second.get_body())) == json.loads(identity.get_body())
+        assert json.loads(second.get_body_string())['id'] == 1
+        assert self.calls == [1]
+
+    def test_conditional_request_on_hit(self):
+        etag = self.request('/products/1').headers['ETag']
+        response = self.request('/products/1', If_None_Match=etag)
+        assert response.status_code == 304
+        assert self.calls == [1]
+
+    def test_headers_in_key(self):
+        for language in ('fr', 'en', 'fr'):
+            response = self.request('/translated/', Accept_Language=language)
+            assert json.loads(response.get_body()) == {'language': language}
+        assert self.calls == ['translated', 'translated']
+
+    def test_custom_key(self):
+        self.request('/custom/1')
+        assert json.loads(self.request('/custom/3').get_body()) == {'id': 1}
+        self.request('/custom/2')
+        assert self.calls == [1, 2]
+
+    def test_empty_bodies(self):
+        assert self.request('/empty/').get_body_string() == ''
+        assert self.request('/empty/').get_body_string() == ''
+        assert self.calls == ['empty']
+
+    def test_other_methods_are_not_cached(self):
+        functionapp_handler = create_functionapp_handler(headers={})
+        calls = []
+        functionapp_handler.handle('post', path='/products/', cache=30)(
+            lambda req: calls.append(1) or {})
+        for _ in range(2):
+            functionapp_handler(Request('POST', 'http://localhost:7071/api/products/'),
+                                self.context)
+        assert calls == [1, 1]
+        assert len(functionapp_handler.response_cache) == 0
+
+
+class TestCachedStrongEtags(unittest.TestCase):
+    def setUp(self):
+        self.context = FunctionsContext(
+            function_directory='/home/serverless/products-list',
+            function_name='products-list',
+            invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+            bindings={}
+        )
+        with mock.patch.dict('os.environ', {'AZURE_FUNCTIONS_ENVIRONMENT': 'production'}):
+            self.functionapp_handler = create_functionapp_handler(headers={}, compression=True,
+                                                                  etag='strong')
+        self.functionapp_handler.handle('get', path='/products/', cache=30)(
+            lambda req: [{'id': index} for index in range(100)])
+        self.functionapp_handler.handle('get', path='/versioned/', cache=30, version=lambda req: 7)(
+            lambda req: [{'id': index} for index in range(100)])
+
+    def request(self, path: str, **headers):
+        headers = {key.replace('_', '-'): value for key, value in headers.items()}
+        event = Request('GET', f"http://localhost:7071/api{path}", headers=headers)
+        return self.functionapp_handler(event, self.context)
+
+    def assert_etags_per_coding(self, path: str, first_coding: str):
+        codings = [first_coding, None] if first_coding else [None, 'gzip']
+        responses = {}
+        for coding in codings:
+            headers = {'Accept_Encoding': coding} if coding else {}
+            responses[coding] = self.request(path, **headers)
+        gzip_response, identity_response = responses['gzip'], responses[None]
+        assert self.functionapp_handler.response_cache.hits == 1
+        assert gzip_response.headers['Content-Encoding'] == 'gzip'
+        assert 'Content-Encoding' not in identity_response.headers
+        identity_etag = identity_response.headers['ETag']
+        assert not identity_etag.endswith('-gzip"')
+        assert gzip_response.headers['ETag'] == identity_etag[:-1] + '-gzip"'
+
+        assert self.request(path, If_None_Match=gzip_response.headers['ETag']).status_code == 200
+        response = self.request(path, Accept_Encoding='gzip', If_None_Match=identity_etag)
+        assert response.status_code == 200
+        response = self.request(path, Accept_Encoding='gzip',
+                                If_None_Match=gzip_response.headers['ETag'])
+        assert response.status_code == 304
+        assert response.headers['ETag'] == gzip_response.headers['ETag']
+        assert self.request(path, If_None_Match=identity_etag).status_code == 304
+
+    def test_cache_filled_by_a_compressed_response(self):
+        self.assert_etags_per_coding('/products/', 'gzip')
+
+    def test_cache_filled_by_an_identity_response(self):
+        self.assert_etags_per_coding('/products/', None)
+
+    def test_version_etags(self):
+        self.assert_etags_per_coding('/versioned/', 'gzip')
+        assert self.request('/versioned/').headers['ETag'] == '"7"'
@@ -0,0 +1,193 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from functionapprest import create_functionapp_handler, Request, FunctionsContext
+from functionapprest.coalescing import AsyncSingleFlight, SingleFlight
+
+
+def run_async(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_share_one_execution(self):
+        single_flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def func():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return [1]
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            leader = executor.submit(single_flight.do, 'key', func, tuple)
+            started.wait(5)
+            followers = [executor.submit(single_flight.do, 'key', func, tuple) for _ in range(4)]
+            time.sleep(0.05)
+            release.set()
+            assert leader.result() == ([1], True)
+            assert [future.result() for future in followers] == [((1,), False)] * 4
+        assert calls == [1]
+        assert len(single_flight) == 0
+
+    def test_errors_are_raised_to_every_caller(self):
+        single_flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def func():
+            started.set()
+            release.wait(5)
+            raise KeyError('foo')
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            leader = executor.submit(single_flight.do, 'key', func)
+            started.wait(5)
+            followers = [executor.submit(single_flight.do, 'key', func) for _ in range(2)]
+            time.sleep(0.05)
+            release.set()
+            for future in [leader] + followers:
+                with self.assertRaises(KeyError):
+                    future.result()
+        assert len(single_flight) == 0
+
+    def test_sequential_calls_are_not_shared(self):
+        single_flight = SingleFlight()
+        assert single_flight.do('key', lambda: 1) == (1, True)
+        assert single_flight.do('key', lambda: 2) == (2, True)
+
+    def test_async_calls_share_one_execution(self):
+        single_flight = AsyncSingleFlight()
+        calls = []
+
+        async def func():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return [1]
+
+        async def gather():
+            return await asyncio.gather(*[single_flight.do('key', func, tuple) for _ in range(5)])
+
+        results = run_async(gather())
+        assert results == [([1], True)] + [((1,), False)] * 4
+        assert calls == [1]
+        assert len(single_flight) == 0
+
+    def test_async_errors_are_raised_to_every_caller(self):
+        single_flight = AsyncSingleFlight()
+
+        async def func():
+            await asyncio.sleep(0.01)
+            raise KeyError('foo')
+
+        async def gather():
+            return await asyncio.gather(*[single_flight.do('key', func) for _ in range(3)],
+                                        return_exceptions=True)
+
+        results = run_async(gather())
+        assert all(isinstance(result, KeyError) for result in results)
+        assert len(single_flight) == 0
+
+
+class TestCoalescedRoutes(unittest.TestCase):
+    def setUp(self):
+        self.context = FunctionsContext(
+            function_directory='/home/serverless/products-list',
+            function_name='products-list',
+            invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+            bindings={}
+        )
+
+    def test_threads(self):
+        functionapp_handler = create_functionapp_handler(headers={})
+        calls = []
+
+        @functionapp_handler.handle('get', path='/products/<int:id>', coalesce=True)
+        def get_product(req, id):
+            calls.append(id)
+            time.sleep(0.2)
+            if id == 0:
+                raise ValueError('no product')
+            return {'id': id}
+
+        def request(path: str):
+            event = Request('GET', f"http://localhost:7071/api{path}", params={'a': '1'})
+            return functionapp_handler(event, self.context)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            responses = list(executor.map(request, ['/products/1'] * 6 + ['/products/2'] * 2))
+        assert sorted(calls) == [1, 2]
+        assert [json.loads(response.get_body())['id']
+                for response in responses] == [1] * 6 + [2] * 2
+        assert len({id(response) for response in responses}) == 8
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            responses = list(executor.map(request, ['/products/0'] * 4))
+        assert calls.count(0) == 1
+        assert all(response.status_code == 500 for response in responses)
+        assert all(json.loads(response.get_body())['message'] == 'no product'
+                   for response in responses)
+
+    def test_requests_with_a_body_are_not_coalesced(self):
+        functionapp_handler = create_functionapp_handler(headers={})
+        calls = []
+
+        @functionapp_handler.handle('post', path='/orders', coalesce=True)
+        def post_order(req):
+            calls.append(1)
+            time.sleep(0.1)
+            return req.json['body']
+
+        def request(index: int):
+            event = Request('POST', 'http://localhost:7071/api/orders')
+            event.set_body(json.dumps({'order': index}))
+            return functionapp_handler(event, self.context)
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            responses = list(executor.map(request, range(3)))
+        assert len(calls) == 3
+        assert [json.loads(response.get_body()) for response in responses] == [
+            {'order': 0}, {'order': 1}, {'order': 2}]
+
+    def test_asyncio(self):
+        functionapp_handler = create_functionapp_handler(headers={}, async_mode=True)
+        calls = []
+
+        @functionapp_handler.handle('get', path='/products/<int:id>', coalesce=True)
+        async def get_product(req, id):
+            calls.append(id)
+            await asyncio.sleep(0.05)
+            return {'id': id}
+
+        @functionapp_handler.handle('get', path='/export/', coalesce=True)
+        async def export(req):
+            calls.append('export')
+            await asyncio.sleep(0.05)
+            return iter([{'id': 1}])
+
+        async def gather(paths):
+            return await asyncio.gather(*[
+                functionapp_handler(Request('GET', f"http://localhost:7071/api{path}"),
+                                    self.context)
+                for path in paths])
+
+        responses = run_async(gather(['/products/1'] * 5))
+        assert calls == [1]
+        assert all(json.loads(response.get_body()) == {'id': 1} for response in responses)
+
+        # streamed responses are read once, so each request runs the handler
+        responses = run_async(gather(['/export/'] * 3))
+        assert calls.count('export') == 3
+        assert all(json.loads(response.get_body()) == [{'id': 1}] for response in responses)
@@ -0,0 +1,103 @@
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import json
+import unittest
+import uuid
+
+from datetime import datetime, date, timezone
+
+from functionapprest import create_functionapp_handler, Request, FunctionsContext
+from functionapprest.codec import (JsonCodec, OrjsonCodec, UjsonCodec, _json_serial,
+                                   available_codecs, get_json_codec)
+
+
+def get_payload():
+    return {
+        'text': 'café / bar',
+        'number': 1.5,
+        'integer': 10,
+        'flag': True,
+        'empty': None,
+        'created': datetime(2019, 2, 21, 10, 30, 15, 123456),
+        'aware': datetime(2019, 2, 21, 10, 30, tzinfo=timezone.utc),
+        'day': date(2019, 2, 21),
+        'id': uuid.UUID('0a1b2c3d-0000-1111-2222-333344445555'),
+        'items': [{'a': 1}, {'b': [1, 2, 3]}],
+    }
+
+
+class TestCodec(unittest.TestCase):
+    def get_codecs(self):
+        return [get_json_codec(name) for name in available_codecs()]
+
+    def test_stdlib_codec_matches_json_dumps(self):
+        payload = get_payload()
+        codec = get_json_codec('json')
+        assert codec.dumps(payload) == json.dumps(payload, default=_json_serial)
+        expected = json.dumps(payload, default=_json_serial).encode('utf-8')
+        assert codec.dumps_bytes(payload) == expected
+        assert codec.loads(codec.dumps_bytes(payload)) == codec.loads(codec.dumps(payload))
+
+    def test_codecs_keep_datetime_and_str_fallback(self):
+        expected = json.loads(json.dumps(get_payload(), default=_json_serial))
+        for codec in self.get_codecs():
+            assert codec.loads(codec.dumps(get_payload())) == expected, codec.name
+            assert codec.loads(codec.dumps_bytes(get_payload())) == expected, codec.name
+
+    def test_codecs_fall_back_on_unsupported_objects(self):
+        payload = {'big': 2 ** 70}
+        for codec in self.get_codecs():
+            assert codec.loads(codec.dumps(payload)) == payload, codec.name
+
+    def test_get_json_codec(self):
+        assert available_codecs()[-1] == 'json'
+        assert get_json_codec('auto').name == available_codecs()[0]
+        codec = JsonCodec()
+        assert get_json_codec(codec) is codec
+        with self.assertRaises(ValueError):
+            get_json_codec('simplejson')
+
+    def test_handler_uses_codec(self):
+        context = FunctionsContext(
+            function_directory='/home/serverless/products-list',
+            function_name='products-list',
+            invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+            bindings={}
+        )
+        for codec in self.get_codecs():
+            functionapp_handler = create_functionapp_handler(headers={}, json_codec=codec)
+
+            @functionapp_handler.handle('post', path='/foo/')
+            def post_foo(req):
+                return {'body': req.json['body'], 'query': req.json['query'],
+                        'day': date(2019, 2, 21)}
+
+            event = Request('POST', 'http://localhost:7071/api/foo/',
+                            params={'ids': '1,2', 'name': '"bar"'})
+            event.set_body(json.dumps({'foo': 'bar'}))
+            with mock.patch.object(codec, 'loads', wraps=codec.loads) as loads_mock:
+                result = functionapp_handler(event, context)
+            # the body and the quoted name, the comma separated ids are not JSON
+            assert loads_mock.call_count == 2
+            assert json.loads(result.get_body()) == {
+                'body': {'foo': 'bar'},
+                'query': {'ids': [1.0, 2.0], 'name': 'bar'},
+                'day': '2019-02-21'
+            }
+
+
+@unittest.skipIf('orjson' not in available_codecs(), 'orjson is not installed')
+class TestOrjsonCodec(unittest.TestCase):
+    def test_datetime_is_passed_to_json_serial(self):
+        codec = OrjsonCodec()
+        value = datetime(2019, 2, 21, 10, 30, 15, 123456, tzinfo=timezone.utc)
+        assert codec.dumps({'created': value}) == '{"created":"%s"}' % value.isoformat()
+
+
+@unittest.skipIf('ujson' not in available_codecs(), 'ujson is not installed')
+class TestUjsonCodec(unittest.TestCase):
+    def test_forward_slashes_are_not_escaped(self):
+        assert UjsonCodec().dumps({'path': '/foo/bar'}) == '{"path":"/foo/bar"}'
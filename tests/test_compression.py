@@ -0,0 +1,127 @@
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import gzip
+import json
+import unittest
+import zlib
+
+from functionapprest import create_functionapp_handler, Request, FunctionsContext, Compression
+from functionapprest.compression import parse_accept_encoding, available_codings
+
+
+class TestCompression(unittest.TestCase):
+    def test_parse_accept_encoding(self):
+        assert parse_accept_encoding('gzip, deflate;q=0.5, br;q=0, *;q=0.1') == {
+            'gzip': 1.0, 'deflate': 0.5, 'br': 0.0, '*': 0.1}
+        assert parse_accept_encoding('GZIP;Q=0.8,,identity;q=oops') == {
+            'gzip': 0.8, 'identity': 0.0}
+        assert parse_accept_encoding(None) == {}
+
+    def test_negotiate(self):
+        compression = Compression(encodings=('gzip', 'deflate'))
+        assert compression.negotiate('gzip, deflate').name == 'gzip'
+        assert compression.negotiate('gzip;q=0.5, deflate').name == 'deflate'
+        assert compression.negotiate('*').name == 'gzip'
+        assert compression.negotiate('*, gzip;q=0').name == 'deflate'
+        assert compression.negotiate('br, identity') is None
+        assert compression.negotiate('') is None
+
+    def test_brotli_is_optional(self):
+        with mock.patch('functionapprest.compression._brotli', return_value=None):
+            assert list(available_codings()) == ['gzip', 'deflate']
+            assert Compression().negotiate('br') is None
+
+    def test_invalid_level(self):
+        with self.assertRaises(ValueError):
+            Compression(level=10)
+
+    def test_chunks_are_compressed_incrementally(self):
+        compression = Compression()
+        coding = compression.negotiate('gzip')
+        chunks = [json.dumps({'id': index}).encode('utf-8') for index in range(1000)]
+        compressed = b''.join(compression.compress_chunks(coding, iter(chunks)))
+        assert gzip.decompress(compressed) == b''.join(chunks)
+
+
+class TestCompressedResponses(unittest.TestCase):
+    def setUp(self):
+        self.context = FunctionsContext(
+            function_directory='/home/serverless/products-list',
+            function_name='products-list',
+            invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+            bindings={}
+        )
+        with mock.patch.dict('os.environ', {'AZURE_FUNCTIONS_ENVIRONMENT': 'production'}):
+            self.functionapp_handler = create_functionapp_handler(
+                headers={'Vary': 'Origin'},
+                compression=Compression(min_size=100, encodings=('gzip', 'deflate')))
+        self.payload = [{'id': index, 'name': f"product {index}"} for index in range(100)]
+
+        @self.functionapp_handler.handle('get', path='/products/')
+        def list_products(req):
+            return self.payload
+
+        @self.functionapp_handler.handle('get', path='/small/')
+        def small(req):
+            return {'id': 1}
+
+        @self.functionapp_handler.handle('get', path='/export/')
+        def export(req):
+            return iter(self.payload)
+
+        @self.functionapp_handler.handle('get', path='/raw/', compress=False)
+        def raw(req):
+            return self.payload
+
+    def request(self, path: str, accept_encoding: str = None):
+        headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+        event = Request('GET', f"http://localhost:7071/api{path}", headers=headers)
+        return self.functionapp_handler(event, self.context)
+
+    def test_gzip(self):
+        response = self.request('/products/', 'gzip, deflate')
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.headers['Vary'] == 'Origin, Accept-Encoding'
+        assert json.loads(gzip.decompress(response.get_body())) == self.payload
+        assert json.loads(response.get_body_string()) == self.payload
+
+    def test_deflate(self):
+        response = self.request('/products/', 'deflate')
+        assert response.headers['Content-Encoding'] == 'deflate'
+        assert json.loads(zlib.decompress(response.get_body())) == self.payload
+
+    def test_identity(self):
+        response = self.request('/products/')
+        assert 'Content-Encoding' not in response.headers
+        assert response.headers['Vary'] == 'Origin, Accept-Encoding'
+        assert json.loads(response.get_body()) == self.payload
+
+    def test_small_bodies_are_not_compressed(self):
+        response = self.request('/small/', 'gzip')
+        assert 'Content-Encoding' not in response.headers
+        assert response.get_body() == b'{"id": 1}'
+
+    def test_streamed_bodies_are_compressed(self):
+        response = self.request('/export/', 'gzip')
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(b''.join(response.iter_body()))) == self.payload
+
+        response = self.request('/export/', 'gzip')
+        assert json.loads(response.get_body_string()) == self.payload
+
+    def test_route_opt_out(self):
+        response = self.request('/raw/', 'gzip')
+        assert 'Content-Encoding' not in response.headers
+        assert response.headers['Vary'] == 'Origin'
+        assert json.loads(response.get_body()) == self.payload
+
+    def test_compression_is_disabled_by_default(self):
+        functionapp_handler = create_functionapp_handler()
+        functionapp_handler.handle('get', path='/products/')(lambda req: self.payload)
+        event = Request('GET', 'http://localhost:7071/api/products/',
+                        headers={'Accept-Encoding': 'gzip'})
+        response = functionapp_handler(event, self.context)
+        assert 'Content-Encoding' not in response.headers
@@ -0,0 +1,167 @@
+import threading
+import time
+import unittest
+
+from types import MappingProxyType
+
+from functionapprest import create_functionapp_handler, Request, FunctionsContext, BindingsCache
+from functionapprest.routing import Router
+
+
+def get_context():
+    return FunctionsContext(
+        function_directory='/home/serverless/products-list',
+        function_name='products-list',
+        invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+        bindings={}
+    )
+
+
+def get_functionapp_handler(delay: float = 0):
+    functionapp_handler = create_functionapp_handler(headers={'X-Service': 'products'},
+                                                     metrics=True)
+
+    @functionapp_handler.handle('get', path='/products/<int:id>/')
+    def get_product(req, id):
+        if delay:
+            time.sleep(delay)
+        return {'id': id}
+
+    @functionapp_handler.handle('post', path='/products/<int:id>/')
+    def post_product(req, id):
+        return {'id': id, 'body': req.json['body']}
+
+    @functionapp_handler.handle('get', path='/products/')
+    def list_products(req):
+        return [1, 2]
+    return functionapp_handler
+
+
+# (method, path, body) of each request and the expected (status code, body)
+REQUESTS = [
+    (('GET', '/products/7/', None), (200, b'{"id": 7}')),
+    (('POST', '/products/8/', b'{"a": 1}'), (200, b'{"id": 8, "body": {"a": 1}}')),
+    (('GET', '/products/', None), (200, b'[1, 2]')),
+    (('OPTIONS', '/products/7/', None), (200, b'{"allow": "GET,POST"}')),
+    (('GET', '/missing/', None), (404, None)),
+]
+
+
+def send(functionapp_handler, method: str, path: str, body: bytes = None):
+    event = Request(method, f"http://localhost:7071/api{path}")
+    if body is not None:
+        event.set_body(body)
+    return functionapp_handler(event, get_context())
+
+
+def run_threads(thread_count: int, target) -> float:
+    barrier = threading.Barrier(thread_count)
+    errors = []
+
+    def run():
+        barrier.wait()
+        try:
+            target()
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=run) for _ in range(thread_count)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+    return elapsed
+
+
+class TestConcurrentDispatch(unittest.TestCase):
+    def test_results_are_correct_across_threads(self):
+        functionapp_handler = get_functionapp_handler()
+        iterations = 50
+
+        def dispatch():
+            for _ in range(iterations):
+                for (method, path, body), (status_code, expected) in REQUESTS:
+                    response = send(functionapp_handler, method, path, body)
+                    assert response.status_code == status_code, (method, path, response.status_code)
+                    if expected is not None:
+                        assert response.get_body() == expected, (method, path, response.get_body())
+                    assert response.headers['x-service'] == 'products'
+
+        run_threads(8, dispatch)
+
+        snapshot = functionapp_handler.metrics.snapshot()
+        assert snapshot[('/products/<int:id>/', 'GET')].requests == 8 * iterations
+        assert snapshot[('/products/<int:id>/', 'POST')].statuses == {200: 8 * iterations}
+        assert snapshot[('unmatched', 'GET')].statuses == {404: 8 * iterations}
+
+    def test_routes_registered_while_serving(self):
+        functionapp_handler = get_functionapp_handler()
+        stop = threading.Event()
+        failures = []
+
+        def dispatch():
+            while not stop.is_set():
+                response = send(functionapp_handler, 'GET', '/products/3/')
+                if response.get_body() != b'{"id": 3}':
+                    failures.append(response.get_body())
+
+        threads = [threading.Thread(target=dispatch) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        try:
+            for index in range(30):
+                functionapp_handler.handle('get', path=f"/extra{index}/")(
+                    lambda req, index=index: {"index": index})
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        assert failures == []
+        for index in range(30):
+            response = send(functionapp_handler, 'GET', f"/extra{index}/")
+            assert response.get_body() == f'{{"index": {index}}}'.encode()
+
+    def test_throughput_scales_with_threads(self):
+        # handlers waiting on I/O release the GIL, so the dispatcher must not serialize them
+        functionapp_handler = get_functionapp_handler(delay=0.002)
+        send(functionapp_handler, 'GET', '/products/1/')
+        requests_per_thread = 25
+
+        def dispatch():
+            for _ in range(requests_per_thread):
+                send(functionapp_handler, 'GET', '/products/1/')
+
+        single = requests_per_thread / run_threads(1, dispatch)
+        multiple = 8 * requests_per_thread / run_threads(8, dispatch)
+        assert multiple > 3 * single, (single, multiple)
+
+
+class TestRouterSnapshots(unittest.TestCase):
+    def test_table_is_built_once(self):
+        router = Router()
+        router.add('/foo/<int:id>', 'foo', ['get'])
+        tables = []
+        run_threads(8, lambda: tables.append(router.table))
+        assert len(set(map(id, tables))) == 1
+
+    def test_table_in_use_is_not_changed(self):
+        router = Router()
+        router.add('/foo', 'foo', ['get'])
+        table = router.table
+        router.add('/bar', 'bar', ['get'])
+        assert [rule.rule for rule in table.url_map.iter_rules()] == ['/foo']
+        assert router.table is not table
+        assert router.endpoints() == ['foo', 'bar']
+
+
+class TestFrozenBindings(unittest.TestCase):
+    def test_cached_bindings_are_read_only(self):
+        bindings = BindingsCache().get('/missing/function/directory')
+        assert isinstance(bindings, MappingProxyType)
+        with self.assertRaises(TypeError):
+            bindings['route'] = 'products/{*restOfPath}'
@@ -0,0 +1,175 @@
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import unittest
+
+from datetime import datetime, timezone
+
+from functionapprest import create_functionapp_handler, Request, FunctionsContext
+from functionapprest.conditional import (body_etag, coded_etag, etag_matches, get_etag_mode,
+                                         http_date, is_not_modified, not_modified_since)
+
+
+class TestConditional(unittest.TestCase):
+    def test_body_etag(self):
+        strong = body_etag(b'{"id": 1}')
+        assert strong.startswith('"') and strong.endswith('"')
+        assert body_etag(b'{"id": 1}') == strong
+        assert body_etag(b'{"id": 2}') != strong
+        assert body_etag(b'{"id": 1}', weak=True) == f"W/{strong}"
+        assert body_etag(b'{"id": 1}', suffix='gzip') == strong[:-1] + '-gzip"'
+        assert body_etag(b'{"id": 1}', weak=True, suffix='gzip') == f"W/{strong}"
+
+    def test_coded_etag(self):
+        assert coded_etag('"v7"', 'gzip') == '"v7-gzip"'
+        assert coded_etag('W/"v7"', 'gzip') == 'W/"v7"'
+        assert coded_etag(None, 'gzip') is None
+
+    def test_etag_matches(self):
+        assert etag_matches('"abc"', '"abc"')
+        assert etag_matches('W/"abc"', '"abc"')
+        assert etag_matches('"xyz", W/"abc"', 'W/"abc"')
+        assert etag_matches('*', '"abc"')
+        assert not etag_matches('"abcd"', '"abc"')
+        assert not etag_matches(None, '"abc"')
+        assert not etag_matches('"abc"', None)
+
+    def test_not_modified_since(self):
+        modified = http_date(datetime(2019, 2, 21, 10, 30))
+        assert modified == 'Thu, 21 Feb 2019 10:30:00 GMT'
+        assert not_modified_since(modified, modified)
+        assert not_modified_since('Fri, 22 Feb 2019 00:00:00 GMT', modified)
+        assert not not_modified_since('Wed, 20 Feb 2019 00:00:00 GMT', modified)
+        assert not not_modified_since('not a date', modified)
+
+    def test_if_none_match_takes_precedence(self):
+        modified = 'Thu, 21 Feb 2019 10:30:00 GMT'
+        assert not is_not_modified('"xyz"', modified, '"abc"', modified)
+        assert is_not_modified(None, modified, '"abc"', modified)
+
+    def test_etag_mode(self):
+        assert get_etag_mode(None) is None
+        assert get_etag_mode(False) is None
+        assert get_etag_mode(True) == 'strong'
+        assert get_etag_mode('weak') == 'weak'
+        with self.assertRaises(ValueError):
+            get_etag_mode('medium')
+
+
+class TestConditionalRequests(unittest.TestCase):
+    def setUp(self):
+        self.context = FunctionsContext(
+            function_directory='/home/serverless/products-list',
+            function_name='products-list',
+            invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+            bindings={}
+        )
+        with mock.patch.dict('os.environ', {'AZURE_FUNCTIONS_ENVIRONMENT': 'production'}):
+            self.functionapp_handler = create_functionapp_handler(headers={}, etag='strong')
+        self.calls = []
+
+        @self.functionapp_handler.handle('get', path='/products/<int:id>')
+        def get_product(req, id):
+            self.calls.append(id)
+            return {'id': id}
+
+        @self.functionapp_handler.handle('post', path='/products/<int:id>')
+        def post_product(req, id):
+            return {'id': id}
+
+        @self.functionapp_handler.handle('get', path='/weak/', etag='weak')
+        def get_weak(req):
+            return {'id': 1}
+
+        @self.functionapp_handler.handle('get', path='/none/', etag=False)
+        def get_none(req):
+            return {'id': 1}
+
+        @self.functionapp_handler.handle('get', path='/versioned/<int:id>',
+                                         version=lambda req, id: f"v{id}")
+        def get_versioned(req, id):
+            self.calls.append(id)
+            return {'id': id}
+
+        @self.functionapp_handler.handle('get', path='/dated/',
+                                         version=lambda req: datetime(2019, 2, 21,
+                                                                      tzinfo=timezone.utc))
+        def get_dated(req):
+            self.calls.append('dated')
+            return {'id': 1}
+
+    def request(self, path: str, method: str = 'GET', **headers):
+        headers = {key.replace('_', '-'): value for key, value in headers.items()}
+        event = Request(method, f"http://localhost:7071/api{path}", headers=headers)
+        return self.functionapp_handler(event, self.context)
+
+    def test_etag_and_304(self):
+        response = self.request('/products/1')
+        etag = response.headers['ETag']
+        assert etag == body_etag(b'{"id": 1}')
+
+        response = self.request('/products/1', If_None_Match=etag)
+        assert response.status_code == 304
+        assert response.get_body() == b''
+        assert response.headers['ETag'] == etag
+
+        response = self.request('/products/2', If_None_Match=etag)
+        assert response.status_code == 200
+        assert response.get_body() == b'{"id": 2}'
+
+    def test_weak_and_disabled_etags(self):
+        assert self.request('/weak/').headers['ETag'].startswith('W/"')
+        assert 'ETag' not in self.request('/none/').headers
+        assert 'ETag' not in self.request('/products/1', method='POST').headers
+
+    def test_version_hook_skips_the_handler(self):
+        response = self.request('/versioned/3')
+        assert response.headers['ETag'] == '"v3"'
+        assert self.calls == [3]
+
+        response = self.request('/versioned/3', If_None_Match='"v3"')
+        assert response.status_code == 304
+        assert response.headers['ETag'] == '"v3"'
+        assert self.calls == [3]
+
+    def test_last_modified_from_version_hook(self):
+        response = self.request('/dated/')
+        assert response.headers['Last-Modified'] == 'Thu, 21 Feb 2019 00:00:00 GMT'
+
+        response = self.request('/dated/', If_Modified_Since='Fri, 22 Feb 2019 00:00:00 GMT')
+        assert response.status_code == 304
+        assert self.calls == ['dated']
+
+        response = self.request('/dated/', If_Modified_Since='Wed, 20 Feb 2019 00:00:00 GMT')
+        assert response.status_code == 200
+
+    def test_strong_etags_per_content_coding(self):
+        with mock.patch.dict('os.environ', {'AZURE_FUNCTIONS_ENVIRONMENT': 'production'}):
+            functionapp_handler = create_functionapp_handler(headers={}, etag=True,
+                                                             compression=True)
+        functionapp_handler.handle('get', path='/products/')(
+            lambda req: [{'id': index} for index in range(100)])
+        event = Request('GET', 'http://localhost:7071/api/products/',
+                        headers={'Accept-Encoding': 'gzip'})
+        gzip_response = functionapp_handler(event, self.context)
+        identity_response = functionapp_handler(
+            Request('GET', 'http://localhost:7071/api/products/'), self.context)
+        assert gzip_response.headers['Content-Encoding'] == 'gzip'
+        assert gzip_response.headers['ETag'] == identity_response.headers['ETag'][:-1] + '-gzip"'
+
+        event = Request('GET', 'http://localhost:7071/api/products/',
+                        headers={'Accept-Encoding': 'gzip',
+                                 'If-None-Match': gzip_response.headers['ETag']})
+        response = functionapp_handler(event, self.context)
+        assert response.status_code == 304
+        assert response.headers['Vary'] == 'Accept-Encoding'
+
+    def test_version_etags_are_weak_by_default(self):
+        functionapp_handler = create_functionapp_handler(headers={})
+        functionapp_handler.handle('get', path='/versioned/', version=lambda req: 7)(
+            lambda req: {'id': 1})
+        response = functionapp_handler(Request('GET', 'http://localhost:7071/api/versioned/'),
+                                       self.context)
+        assert response.headers['ETag'] == 'W/"7"'
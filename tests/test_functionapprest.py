@@ -3,16 +3,24 @@ try:
 except ImportError:
     import mock
 
+import asyncio
 import os
+import threading
 import unittest
 import json
 import copy
 import random
+import shutil
+import tempfile
 import time
 
 from datetime import datetime
 
-from functionapprest import create_functionapp_handler, Request, FunctionsContext
+from azure.functions import HttpRequest
+
+from functionapprest import (create_functionapp_handler, Request, CompactRequest, FunctionsContext,
+                             BindingsCache)
+from functionapprest.compression import Compression
 
 
 def assert_not_called(mock):
@@ -420,3 +428,635 @@ class TestFunctions(unittest.TestCase):
         self.event.url = '/bar/'
         result = self.functionapp_handler(self.event, self.context).to_json()
         assert result == {'body': '"production"', 'status_code': 200, 'headers': headers}
+
+
+class TestBindingsCache(unittest.TestCase):
+    def setUp(self):
+        self.function_directory = tempfile.mkdtemp()
+        self.write_function_json(['get'])
+        self.context = FunctionsContext(
+            function_directory=self.function_directory,
+            function_name='products-list',
+            invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+            bindings={}
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.function_directory)
+
+    def write_function_json(self, methods, mtime=None):
+        json_path = os.path.join(self.function_directory, 'function.json')
+        with open(json_path, 'w') as file_fd:
+            json.dump({
+                'bindings': [
+                    {'type': 'httpTrigger', 'direction': 'in', 'methods': methods},
+                    {'type': 'http', 'direction': 'out', 'name': '$return'}
+                ]
+            }, file_fd)
+        if mtime is not None:
+            os.utime(json_path, (mtime, mtime))
+
+    def test_repeated_invocations_do_not_read_function_json(self):
+        bindings_cache = BindingsCache()
+        functionapp_handler = create_functionapp_handler(headers={}, bindings_cache=bindings_cache)
+        functionapp_handler.handle('get', path='/foo/')(mock.Mock(return_value='foo'))
+        event = Request('GET', 'http://localhost:7071/api/foo/')
+
+        functionapp_handler(event, self.context)
+        with mock.patch('functionapprest.open', create=True) as open_mock:
+            for _ in range(5):
+                result = functionapp_handler(event, self.context).to_json()
+                assert result['body'] == '"foo"'
+        assert_not_called(open_mock)
+        assert bindings_cache.misses == 1
+        assert bindings_cache.hits == 5
+        assert self.context.bindings['methods'] == ['get']
+
+    def test_mtime_invalidation(self):
+        bindings_cache = BindingsCache(check_mtime=True)
+        assert bindings_cache.get(self.function_directory)['methods'] == ['get']
+        assert bindings_cache.get(self.function_directory)['methods'] == ['get']
+        assert (bindings_cache.hits, bindings_cache.misses) == (1, 1)
+
+        self.write_function_json(['get', 'post'], mtime=time.time() + 10)
+        assert bindings_cache.get(self.function_directory)['methods'] == ['get', 'post']
+        assert (bindings_cache.hits, bindings_cache.misses) == (1, 2)
+
+    def test_preload_and_refresh(self):
+        bindings_cache = BindingsCache()
+        bindings_cache.preload(self.function_directory)
+        assert bindings_cache.get(self.function_directory)['methods'] == ['get']
+        assert (bindings_cache.hits, bindings_cache.misses) == (1, 0)
+
+        self.write_function_json(['post'])
+        assert bindings_cache.get(self.function_directory)['methods'] == ['get']
+        assert bindings_cache.refresh(self.function_directory)['methods'] == ['post']
+        assert bindings_cache.get(self.function_directory)['methods'] == ['post']
+
+        bindings_cache.refresh()
+        bindings_cache.get(self.function_directory)
+        assert bindings_cache.misses == 1
+
+    def test_missing_function_json_is_cached(self):
+        bindings_cache = BindingsCache()
+        function_directory = os.path.join(self.function_directory, 'missing')
+        assert bindings_cache.get(function_directory) == {}
+        assert bindings_cache.get(function_directory) == {}
+        assert (bindings_cache.hits, bindings_cache.misses) == (1, 1)
+
+    def test_options_does_not_mutate_cached_bindings(self):
+        self.write_function_json(['GET', 'OPTIONS', 'HEAD'])
+        functionapp_handler = create_functionapp_handler(headers={})
+        event = Request('OPTIONS', 'http://localhost:7071/api/foo/')
+        for _ in range(2):
+            result = functionapp_handler(event, self.context).to_json()
+            assert result['body'] == '{"allow": "GET"}'
+        assert self.context.bindings['methods'] == ['GET', 'OPTIONS', 'HEAD']
+
+
+class TestAsyncFunctions(unittest.TestCase):
+    def setUp(self):
+        self.event = Request('POST', 'http://localhost:7071/api/v1/')
+        self.context = FunctionsContext(
+            function_directory='/home/serverless/products-list',
+            function_name='products-list',
+            invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+            bindings={}
+        )
+        self.env = mock.patch.dict('os.environ', {'AZURE_FUNCTIONS_ENVIRONMENT': 'production'})
+        with self.env:
+            self.functionapp_handler = create_functionapp_handler(headers={}, async_mode=True,
+                                                                  max_workers=4)
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_handler(self, *events):
+        async def gather():
+            return await asyncio.gather(*[
+                self.functionapp_handler(event, self.context) for event in events])
+        return self.loop.run_until_complete(gather())
+
+    def test_async_handler_is_awaited(self):
+        async def async_post(req, id):
+            await asyncio.sleep(0)
+            return {'id': id, 'body': req.json['body']}
+
+        self.functionapp_handler.handle('post', path='/foo/<int:id>/')(async_post)
+        self.event.url = '/foo/1/'
+        self.event.set_body(json.dumps({'foo': 'bar'}))
+        result, = self.run_handler(self.event)
+        assert asyncio.iscoroutinefunction(self.functionapp_handler)
+        assert result.to_json() == {
+            'body': '{"id": 1, "body": {"foo": "bar"}}', 'status_code': 200, 'headers': {}}
+
+    def test_sync_handler_runs_in_thread_pool(self):
+        threads = []
+
+        def sync_post(req):
+            threads.append(threading.current_thread())
+            return 'foo'
+
+        self.functionapp_handler.handle('post')(sync_post)
+        result, = self.run_handler(self.event)
+        assert result.to_json() == {'body': '"foo"', 'status_code': 200, 'headers': {}}
+        assert threads and threads[0] is not threading.current_thread()
+
+    def test_validation_and_errors_are_handled_the_same(self):
+        post_schema = {
+            '$schema': 'http://json-schema.org/draft-04/schema#',
+            'type': 'object',
+            'properties': {
+                'body': {'type': 'object', 'properties': {'my_integer': {'type': 'integer'}}}
+            }
+        }
+
+        async def async_post(req):
+            return 'foo'
+
+        async def async_get(req):
+            return 1 / 0
+
+        self.functionapp_handler.handle('post', schema=post_schema)(async_post)
+        self.functionapp_handler.handle('get')(async_get)
+        self.event.set_body(json.dumps({'my_integer': 'this is not an integer'}))
+        get_event = Request('GET', 'http://localhost:7071/api/v1/')
+        missing_event = Request('GET', 'http://localhost:7071/api/missing/')
+
+        invalid, error, missing = self.run_handler(self.event, get_event, missing_event)
+        assert invalid.to_json()['status_code'] == 400
+        assert ('Validation Error: Schema[properties][body][properties][my_integer][type]'
+                in invalid.get_body_string())
+        assert error.to_json() == {
+            'body': '{"statusCode": 500, "message": "division by zero"}', 'status_code': 500,
+            'headers': {}}
+        assert missing.to_json()['status_code'] == 404
+
+    def test_async_handlers_run_concurrently(self):
+        async def async_get(req):
+            await asyncio.sleep(0.1)
+            return 'foo'
+
+        self.functionapp_handler.handle('get', path='/foo/')(async_get)
+        events = [Request('GET', 'http://localhost:7071/api/foo/') for _ in range(20)]
+        start = time.monotonic()
+        results = self.run_handler(*events)
+        assert time.monotonic() - start < 1
+        assert [result.status_code for result in results] == [200] * 20
+
+    def test_async_handler_requires_async_mode(self):
+        async def async_get(req):
+            return 'foo'
+
+        functionapp_handler = create_functionapp_handler(headers={})
+        with self.assertRaises(TypeError):
+            functionapp_handler.handle('get')(async_get)
+
+
+class TestResponse(unittest.TestCase):
+    def setUp(self):
+        with mock.patch.dict('os.environ', {'AZURE_FUNCTIONS_ENVIRONMENT': 'production'}):
+            self.functionapp_handler = create_functionapp_handler(headers={})
+        self.Response = self.functionapp_handler.Response
+        self.json_codec = self.functionapp_handler.json_codec
+
+    def test_json_body_is_serialized_once(self):
+        body = [{'id': index, 'created': datetime(2019, 2, 21)} for index in range(10)]
+        with mock.patch('functionapprest.codec.json.dumps', wraps=json.dumps) as dumps_mock:
+            response = self.Response(body)
+            first = response.to_json()
+            second = response.to_json()
+        assert dumps_mock.call_count == 1
+        assert first == second
+        expected = json.dumps(body, default=str)
+        assert first['body'] == expected.replace('2019-02-21 00:00:00', '2019-02-21T00:00:00')
+        assert response.get_body() == first['body'].encode('utf-8')
+
+    def test_setting_json_encodes_the_body(self):
+        response = self.Response({'foo': 'bar'})
+        response.json = {'foo': 'baz'}
+        assert response.json == {'foo': 'baz'}
+        assert response.get_body() == b'{"foo": "baz"}'
+        assert response.to_json()['body'] == '{"foo": "baz"}'
+        response.json = []
+        assert response.get_body() == b'[]'
+        assert response.get_body_string() == ''
+
+        text_response = self.Response('plain')
+        text_response.json = ['a']
+        assert text_response.to_json()['body'] == '["a"]'
+        with self.assertRaises(TypeError):
+            text_response.json = 'plain'
+
+    def test_setting_json_drops_the_compression(self):
+        response = self.Response({'names': ['product'] * 1000})
+        assert response.compress(Compression(), Compression().negotiate('gzip'))
+        assert response.headers['Content-Encoding'] == 'gzip'
+        response.json = {'names': []}
+        assert 'Content-Encoding' not in response.headers
+        assert response.get_body() == b'{"names": []}'
+
+    def test_json_is_only_kept_when_asked_for(self):
+        body = {'foo': ['bar']}
+        response = self.Response(body)
+        assert response.json == body
+        assert response.json is not body
+
+        response = self.Response(body, keep_json=True)
+        assert response.json is body
+        assert response.get_body_string() == '{"foo": ["bar"]}'
+
+    def test_body_string_of_text_and_empty_bodies(self):
+        with mock.patch.object(self.json_codec, 'dumps', wraps=self.json_codec.dumps) as dumps_mock:
+            response = self.Response('foo')
+            assert response.get_body_string() == '"foo"'
+            assert response.get_body_string() == '"foo"'
+        assert dumps_mock.call_count == 1
+        assert response.json is None
+
+        assert self.Response({}).get_body_string() == ''
+        assert self.Response([]).get_body_string() == ''
+        assert self.Response().get_body_string() == ''
+
+    def test_iterator_body_is_streamed(self):
+        consumed = []
+
+        def records():
+            for index in range(5):
+                consumed.append(index)
+                yield {'id': index}
+
+        response = self.Response(records(), buffer_size=16)
+        assert response.streamed
+        assert not consumed
+        chunks = list(response.iter_body())
+        assert len(chunks) > 1
+        assert json.loads(b''.join(chunks)) == [{'id': index} for index in range(5)]
+        assert response.mimetype == 'application/json'
+
+    def test_streamed_body_is_joined_once(self):
+        response = self.Response(iter([{'id': 1}, {'id': 2}]), stream_format='ndjson')
+        assert response.mimetype == 'application/x-ndjson'
+        assert response.get_body() == b'{"id": 1}\n{"id": 2}\n'
+        assert response.get_body() == b'{"id": 1}\n{"id": 2}\n'
+        assert response.to_json()['body'] == '{"id": 1}\n{"id": 2}\n'
+        assert list(response.iter_body()) == [response.get_body()]
+
+    def test_handlers_returning_generators(self):
+        event = Request('GET', 'http://localhost:7071/api/export/')
+        context = FunctionsContext(
+            function_directory='/home/serverless/products-list',
+            function_name='products-list',
+            invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+            bindings={}
+        )
+        event_ndjson = Request('GET', 'http://localhost:7071/api/export.ndjson')
+
+        @self.functionapp_handler.handle('get', path='/export/')
+        def export(req):
+            return (({'id': index} for index in range(3)), 206, {'X-Total': '3'})
+
+        @self.functionapp_handler.handle('get', path='/export.ndjson', stream_format='ndjson')
+        def export_ndjson(req):
+            return ({'id': index} for index in range(3))
+
+        response = self.functionapp_handler(event, context)
+        assert response.streamed
+        assert response.to_json() == {
+            'body': '[{"id": 0},{"id": 1},{"id": 2}]',
+            'status_code': 206,
+            'headers': {'x-total': '3'}
+        }
+        response = self.functionapp_handler(event_ndjson, context)
+        assert response.get_body().splitlines() == [b'{"id": 0}', b'{"id": 1}', b'{"id": 2}']
+
+        with self.assertRaises(ValueError):
+            self.functionapp_handler.handle('get', path='/export.csv', stream_format='csv')
+
+
+class TestLazyJson(unittest.TestCase):
+    def setUp(self):
+        self.event = Request('POST', 'http://localhost:7071/api/foo/', params={'ids': '1,2'})
+        self.event.set_body(json.dumps({'foo': 'bar'}))
+        self.context = FunctionsContext(
+            function_directory='/home/serverless/products-list',
+            function_name='products-list',
+            invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+            bindings={}
+        )
+        with mock.patch.dict('os.environ', {'AZURE_FUNCTIONS_ENVIRONMENT': 'production'}):
+            self.functionapp_handler = create_functionapp_handler(headers={})
+        json_codec = self.functionapp_handler.json_codec
+        self.loads_mock = mock.patch.object(json_codec, 'loads', wraps=json_codec.loads)
+
+    def test_body_is_not_parsed_when_ignored(self):
+        self.functionapp_handler.handle('post', path='/foo/')(lambda req: req.method)
+        with self.loads_mock as loads_mock:
+            result = self.functionapp_handler(self.event, self.context).to_json()
+        assert result['body'] == '"POST"'
+        assert_not_called(loads_mock)
+
+    def test_json_is_parsed_on_first_access(self):
+        def post_foo(req):
+            assert_not_called(loads_mock)
+            json_data = req.json
+            calls = loads_mock.call_count
+            assert calls > 0
+            assert req.json is json_data
+            assert req.json['body'] is json_data['body']
+            assert loads_mock.call_count == calls
+            return {'query': req.json['query'], 'body': req.json['body']}
+
+        self.functionapp_handler.handle('post', path='/foo/')(post_foo)
+        with self.loads_mock as loads_mock:
+            result = self.functionapp_handler(self.event, self.context).to_json()
+        assert result['body'] == '{"query": {"ids": [1.0, 2.0]}, "body": {"foo": "bar"}}'
+
+    def test_failed_parse_raises_on_every_access(self):
+        errors = []
+
+        def post_foo(req):
+            for _ in range(2):
+                try:
+                    req.json.get('body')
+                except ValueError as error:
+                    errors.append(error)
+            return 'foo'
+
+        self.event.set_body(b'{not json')
+        self.functionapp_handler.handle('post', path='/foo/')(post_foo)
+        self.functionapp_handler(self.event, self.context)
+        assert len(errors) == 2
+
+        req = CompactRequest('POST', '/foo/', body=b'{not json')
+        req.set_json_loader(lambda: json.loads(req.get_body()))
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                req.json.get('body')
+        req.set_body(b'{}')
+        assert req.json == {}
+
+    def test_lazy_json_behaves_like_a_dict(self):
+        expected = {'body': {'foo': 'bar'}, 'query': {'ids': [1.0, 2.0]}}
+
+        def post_foo(req):
+            assert 'body' in req.json and len(req.json) == 2
+            assert req.json == expected
+            assert dict(req.json) == expected and {**req.json} == expected
+            assert copy.deepcopy(req.json) == expected
+            assert json.loads(json.dumps(req.json)) == expected
+            return req.json
+
+        self.functionapp_handler.handle('post', path='/foo/')(post_foo)
+        result = self.functionapp_handler(self.event, self.context).to_json()
+        assert json.loads(result['body']) == expected
+
+    def test_nested_json_is_serialized(self):
+        expected = {'body': {'foo': 'bar'}, 'query': {'ids': [1.0, 2.0]}}
+
+        def post_foo(req):
+            assert type(req.json) is dict
+            assert json.dumps(req.json) == json.dumps(expected)
+            return {'data': req.json, 'list': [req.json]}
+
+        self.functionapp_handler.handle('post', path='/foo/')(post_foo)
+        result = self.functionapp_handler(self.event, self.context).to_json()
+        assert json.loads(result['body']) == {'data': expected, 'list': [expected]}
+
+    def test_json_of_different_requests_compare_equal(self):
+        json_data = []
+        self.functionapp_handler.handle('post', path='/foo/')(
+            lambda req: json_data.append(req.json) or 'foo')
+        self.functionapp_handler(self.event, self.context)
+        self.functionapp_handler(self.event, self.context)
+        assert json_data[0] == json_data[1]
+        assert json_data[0] is not json_data[1]
+
+    def test_assigned_json_replaces_the_loader(self):
+        def post_foo(req):
+            req.json = {'replaced': True}
+            return req.json
+
+        self.functionapp_handler.handle('post', path='/foo/')(post_foo)
+        with self.loads_mock as loads_mock:
+            result = self.functionapp_handler(self.event, self.context).to_json()
+        assert result['body'] == '{"replaced": true}'
+        assert_not_called(loads_mock)
+
+    def test_json_is_parsed_eagerly_with_schema(self):
+        def post_foo(req):
+            assert loads_mock.call_count > 0
+            calls = loads_mock.call_count
+            assert req.json['body'] == {'foo': 'bar'}
+            assert loads_mock.call_count == calls
+            return 'foo'
+
+        schema = {'$schema': 'http://json-schema.org/draft-04/schema#', 'type': 'object'}
+        self.functionapp_handler.handle('post', path='/foo/', schema=schema)(post_foo)
+        with self.loads_mock as loads_mock:
+            result = self.functionapp_handler(self.event, self.context).to_json()
+        assert result['body'] == '"foo"'
+
+
+class TestCompactRequest(unittest.TestCase):
+    def setUp(self):
+        self.http_request = HttpRequest('post', 'http://localhost:7071/api/foo/',
+                                        headers={'Content-Type': 'application/json'},
+                                        params={'ids': '1,2'}, route_params={},
+                                        body=b'{"foo": "bar"}')
+        self.context = FunctionsContext(
+            function_directory='/home/serverless/products-list',
+            function_name='products-list',
+            invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+            bindings={}
+        )
+
+    def test_same_api_as_request(self):
+        http_request = self.http_request
+        compact = CompactRequest(http_request.method, http_request.url, request=http_request)
+        request = Request(http_request.method, http_request.url, request=http_request)
+        assert isinstance(compact, Request)
+        assert isinstance(compact, HttpRequest)
+        for name in ('method', 'url', 'headers', 'params', 'route_params', 'json', 'context',
+                     'proxy', 'timer'):
+            assert getattr(compact, name) == getattr(request, name), name
+        assert compact.get_body() == request.get_body()
+        assert compact.get_json() == {'foo': 'bar'}
+
+        compact.method = 'get'
+        assert compact.method == 'GET'
+        compact.set_body('{}')
+        assert compact.get_body() == b'{}'
+        compact.set_body(bytearray(b'[]'))
+        assert compact.get_body() == b'[]'
+        with self.assertRaises(TypeError):
+            compact.set_body(1)
+        # attributes of the handlers still fit
+        compact.user = 'foo'
+        assert compact.user == 'foo'
+
+    def test_body_is_not_copied(self):
+        body = b'x' * 1024
+        assert CompactRequest('POST', '/', body=body).get_body() is body
+
+    def test_defaults(self):
+        compact = CompactRequest('get', 'http://localhost:7071/api/foo/', headers=None)
+        assert compact.headers == {}
+        assert compact.params == {}
+        assert compact.route_params == {}
+        assert compact.json == {}
+        assert compact.get_body() == b''
+
+    def test_none_attributes_are_empty_dicts(self):
+        compact = CompactRequest('get', 'http://localhost:7071/api/foo/', headers={'a': '1'},
+                                 params={'b': '2'}, route_params={'c': '3'}, json={'d': 4},
+                                 context={'e': 5})
+        request = Request('get', 'http://localhost:7071/api/foo/')
+        for name in ('headers', 'params', 'route_params', 'json', 'context'):
+            setattr(compact, name, None)
+            setattr(request, name, None)
+            assert getattr(compact, name) == getattr(request, name) == {}, name
+        assert compact.headers.get('a') is None
+
+    def test_dispatcher_builds_compact_requests(self):
+        functionapp_handler = create_functionapp_handler(headers={})
+        requests = []
+
+        @functionapp_handler.handle('post', path='/foo/')
+        def post_foo(req):
+            requests.append(req)
+            return req.json['body']
+
+        assert functionapp_handler(self.http_request, self.context).json == {'foo': 'bar'}
+        assert type(requests[0]) is CompactRequest
+        assert requests[0].get_body() is self.http_request.get_body()
+
+        # requests which already are ours are not cast again
+        event = Request('POST', 'http://localhost:7071/api/foo/', body=b'{}')
+        functionapp_handler(event, self.context)
+        assert requests[1] is event
+
+
+class TestDefaultHeaders(unittest.TestCase):
+    def setUp(self):
+        self.context = FunctionsContext(
+            function_directory='/home/serverless/products-list',
+            function_name='products-list',
+            invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+            bindings={}
+        )
+
+    def test_headers_do_not_leak_into_later_responses(self):
+        functionapp_handler = create_functionapp_handler(headers={'X-Default': 'yes'})
+        Response = functionapp_handler.Response
+        first = Response('foo', 200, {'X-Request': '1', 'x-default': 'overridden'})
+        second = Response('bar')
+        assert first.headers['x-request'] == '1'
+        assert first.headers['x-default'] == 'overridden'
+        assert dict(second.headers) == {'x-default': 'yes'}
+        second.headers['X-Later'] = 'later'
+        assert 'x-later' not in Response('baz').headers
+
+    def test_concurrent_responses_keep_their_own_headers(self):
+        functionapp_handler = create_functionapp_handler(
+            headers={'Content-Type': 'application/json'})
+        barrier = threading.Barrier(8)
+
+        @functionapp_handler.handle('get', path='/items/<int:id>/')
+        def get_item(req, id):
+            if id < 8:
+                # every thread builds its response at the same time
+                barrier.wait()
+            return {'id': id}, 200, {f"X-Item-{id}": str(id), 'X-Item': str(id)}
+
+        def get(item_id):
+            req = Request('GET', f"http://localhost:7071/api/items/{item_id}/")
+            return item_id, functionapp_handler(req, self.context)
+
+        threads_responses = []
+        lock = threading.Lock()
+
+        def worker(item_ids):
+            for item_id in item_ids:
+                result = get(item_id)
+                with lock:
+                    threads_responses.append(result)
+
+        threads = [threading.Thread(target=worker, args=(range(index, 400, 8),))
+                   for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(threads_responses) == 50 * 8
+        for item_id, response in threads_responses:
+            assert response.json == {'id': item_id}
+            assert dict(response.headers) == {
+                'content-type': 'application/json',
+                f"x-item-{item_id}": str(item_id),
+                'x-item': str(item_id),
+            }
+
+
+class TestOptionsResponses(unittest.TestCase):
+    def setUp(self):
+        self.context = FunctionsContext(
+            function_directory='/home/serverless/products-list',
+            function_name='products-list',
+            invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+            bindings={}
+        )
+
+    def options(self, functionapp_handler, path):
+        event = Request('OPTIONS', f"http://localhost:7071/api{path}")
+        return functionapp_handler(event, self.context)
+
+    def test_methods_of_the_matching_routes(self):
+        functionapp_handler = create_functionapp_handler(headers={})
+        functionapp_handler.handle('get', path='/foo/<int:id>/')(mock.Mock())
+        functionapp_handler.handle('delete', path='/foo/<int:id>/')(mock.Mock())
+        functionapp_handler.handle('post', path='/foo/<string:name>/')(mock.Mock())
+
+        result = self.options(functionapp_handler, '/foo/bar/').to_json()
+        assert result == {'body': '{"allow": "POST"}', 'status_code': 200,
+                          'headers': {'access-control-allow-methods': 'POST'}}
+        # an int also matches the string converter
+        result = self.options(functionapp_handler, '/foo/12/').to_json()
+        assert result['body'] == '{"allow": "DELETE,GET,POST"}'
+        assert result['headers'] == {'access-control-allow-methods': 'DELETE,GET,POST'}
+
+    def test_responses_are_encoded_once(self):
+        functionapp_handler = create_functionapp_handler(headers={'X-Service': 'products'})
+        functionapp_handler.handle('get', path='/foo/<int:id>/')(mock.Mock())
+        self.options(functionapp_handler, '/foo/1/')
+        with mock.patch.object(functionapp_handler.json_codec, 'dumps_bytes') as dumps_mock:
+            response = self.options(functionapp_handler, '/foo/2/')
+        assert dumps_mock.call_count == 0
+        assert response.get_body() == b'{"allow": "GET"}'
+        response.headers['X-Later'] = 'later'
+        assert 'x-later' not in self.options(functionapp_handler, '/foo/3/').headers
+        assert self.options(functionapp_handler, '/foo/3/').headers['x-service'] == 'products'
+
+    def test_max_age(self):
+        functionapp_handler = create_functionapp_handler(headers={}, cors_max_age=600)
+        functionapp_handler.handle('get', path='/foo/')(mock.Mock())
+        headers = self.options(functionapp_handler, '/foo/').headers
+        assert headers['access-control-max-age'] == '600'
+        assert headers['access-control-allow-methods'] == 'GET'
+        headers = self.options(create_functionapp_handler(headers={}), '/foo/').headers
+        assert 'access-control-max-age' not in headers
+
+    def test_invalid_max_age(self):
+        for cors_max_age in (-1, '600', True, 1.5):
+            with self.assertRaises(ValueError):
+                create_functionapp_handler(cors_max_age=cors_max_age)
+
+    def test_methods_of_the_bindings_without_route(self):
+        functionapp_handler = create_functionapp_handler(headers={})
+        self.context.function_directory = None
+        with mock.patch.object(functionapp_handler.bindings_cache, 'get',
+                               return_value={'methods': ['get', 'post', 'options']}):
+            result = self.options(functionapp_handler, '/anything/').to_json()
+        assert result['body'] == '{"allow": "GET,POST"}'
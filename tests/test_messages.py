@@ -0,0 +1,143 @@
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import asyncio
+import json
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from functionapprest import create_functionapp_handler, FunctionsContext
+from functionapprest.routing import Router
+
+
+class Message(object):
+    def __init__(self, body: dict) -> None:
+        self.body = json.dumps(body).encode('utf-8')
+
+    def get_body(self) -> bytes:
+        return self.body
+
+
+class TestDispatchMessages(unittest.TestCase):
+    def setUp(self):
+        self.context = FunctionsContext(
+            function_directory='/home/serverless/products-list',
+            function_name='products-list',
+            invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+            bindings={}
+        )
+
+    def register(self, functionapp_handler):
+        schema = {
+            '$schema': 'http://json-schema.org/draft-04/schema#',
+            'type': 'object',
+            'properties': {'body': {'type': 'object', 'required': ['name']}}
+        }
+
+        @functionapp_handler.handle('post', path='/products/<int:id>', schema=schema)
+        def post_product(req, id):
+            assert req.context is self.context
+            return {'id': id, 'name': req.json['body']['name'], 'query': req.json['query']}
+
+        @functionapp_handler.handle('put', path='/raw/', load_json=False)
+        def put_raw(req):
+            return req.get_body().decode('utf-8')
+
+        @functionapp_handler.handle('post', path='/fail/')
+        def fail(req):
+            raise RuntimeError('failed')
+
+    def messages(self):
+        return [
+            {'path': '/products/1', 'body': {'name': 'foo'}, 'query': {'ids': [1, 2]}},
+            Message({'path': '/products/2', 'body': {'name': 'bar'}}),
+            json.dumps({'path': '/products/3', 'body': {}}),
+            {'method': 'PUT', 'path': '/raw/', 'body': {'a': 1}},
+            {'path': '/fail/'},
+            {'path': '/missing/'},
+            {'method': 'GET', 'path': '/products/1'},
+            {'body': {}},
+        ]
+
+    def assert_results(self, results):
+        assert [result['status_code'] for result in results] == [
+            200, 200, 400, 200, 500, 404, 405, 400]
+        assert results[0]['body'] == {'id': 1, 'name': 'foo', 'query': {'ids': [1, 2]}}
+        assert results[1]['body'] == {'id': 2, 'name': 'bar', 'query': {}}
+        assert 'Validation Error' in results[2]['body']['message']
+        assert results[3]['body'] == '{"a": 1}'
+        assert results[4]['body']['message'] == 'failed'
+
+    def test_dispatch_messages(self):
+        functionapp_handler = create_functionapp_handler(headers={})
+        self.register(functionapp_handler)
+        with mock.patch.object(functionapp_handler.bindings_cache, 'get',
+                               wraps=functionapp_handler.bindings_cache.get) as get_mock:
+            results = functionapp_handler.dispatch_messages(self.messages(), self.context)
+        assert get_mock.call_count == 1
+        self.assert_results(results)
+
+    def test_routes_are_resolved_once_per_method_and_path(self):
+        functionapp_handler = create_functionapp_handler(headers={})
+        functionapp_handler.handle('post', path='/events/<int:id>')(lambda req, id: {'id': id})
+        messages = [{'path': f"/events/{index % 3}"} for index in range(30)]
+        with mock.patch.object(Router, 'match', autospec=True,
+                               side_effect=Router.match) as match_mock:
+            results = functionapp_handler.dispatch_messages(messages, self.context, concurrency=4)
+        assert match_mock.call_count == 3
+        assert [result['body']['id'] for result in results] == [index % 3 for index in range(30)]
+
+    def test_executor_is_reused(self):
+        functionapp_handler = create_functionapp_handler(headers={})
+        functionapp_handler.handle('post', path='/events/<int:id>')(lambda req, id: {'id': id})
+        messages = [{'path': f"/events/{index}"} for index in range(4)]
+        with mock.patch('functionapprest.ThreadPoolExecutor',
+                        wraps=ThreadPoolExecutor) as executor_mock:
+            for _ in range(3):
+                results = functionapp_handler.dispatch_messages(messages, self.context,
+                                                                concurrency=2)
+                assert [result['body']['id'] for result in results] == list(range(4))
+        assert executor_mock.call_count == 1
+
+    def test_invalid_concurrency(self):
+        functionapp_handler = create_functionapp_handler(headers={})
+        async_handler = create_functionapp_handler(headers={}, async_mode=True)
+        loop = asyncio.new_event_loop()
+        try:
+            for concurrency in (0, -1, 1.5, True):
+                with self.assertRaises(ValueError):
+                    functionapp_handler.dispatch_messages([], self.context, concurrency)
+                with self.assertRaises(ValueError):
+                    loop.run_until_complete(
+                        async_handler.dispatch_messages([], self.context, concurrency))
+        finally:
+            loop.close()
+
+    def test_async(self):
+        functionapp_handler = create_functionapp_handler(headers={}, async_mode=True)
+        self.register(functionapp_handler)
+
+        @functionapp_handler.handle('post', path='/async/')
+        async def post_async(req):
+            await asyncio.sleep(0)
+            return req.json['body']
+
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(functionapp_handler.dispatch_messages(
+                self.messages() + [{'path': '/async/', 'body': [1]}], self.context, concurrency=2))
+        finally:
+            loop.close()
+        self.assert_results(results[:-1])
+        assert results[-1] == {'status_code': 200, 'headers': {}, 'body': [1]}
+
+    def test_unexpected_errors_without_error_handler(self):
+        functionapp_handler = create_functionapp_handler(headers={}, error_handler=None)
+        self.register(functionapp_handler)
+        with mock.patch('functionapprest.logging.exception'):
+            results = functionapp_handler.dispatch_messages(
+                [{'path': '/fail/'}, {'path': '/raw/', 'method': 'PUT'}])
+        assert [result['status_code'] for result in results] == [500, 200]
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import threading
+import unittest
+
+from azure.functions.http import HttpResponseConverter
+
+from functionapprest import create_functionapp_handler, Request, FunctionsContext
+from functionapprest.metrics import Histogram, MetricsRegistry
+
+
+class TestHistogram(unittest.TestCase):
+    def test_buckets(self):
+        histogram = Histogram((1, 5))
+        for value in (0.5, 1, 3, 7):
+            histogram.observe(value)
+        assert histogram.counts == [2, 1, 1]
+        assert histogram.sum == 11.5
+        assert histogram.count == 4
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_threads_are_merged(self):
+        registry = MetricsRegistry(latency_buckets=(0.1, 1))
+
+        def record():
+            for _ in range(1000):
+                registry.observe('/products/', 'get', 200, 0.05, 10, 100)
+            registry.observe('/products/', 'get', 404, 2)
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        metrics = registry.snapshot()[('/products/', 'GET')]
+        assert metrics.requests == 4004
+        assert metrics.statuses == {200: 4000, 404: 4}
+        assert metrics.latency.counts == [4000, 0, 4]
+        assert metrics.request_size.count == 4000
+
+        registry.reset()
+        assert registry.snapshot() == {}
+
+    def test_prometheus(self):
+        registry = MetricsRegistry(latency_buckets=(0.1, 1), size_buckets=(100,))
+        registry.observe('/products/<int:id>/', 'GET', 200, 0.5, 0, 20)
+        registry.observe(None, 'POST', 404, 0.01)
+        text = registry.prometheus()
+        assert '# TYPE functionapprest_requests_total counter' in text
+        route = 'route="/products/<int:id>/",method="GET"'
+        unmatched = 'route="unmatched",method="POST"'
+        assert f'functionapprest_requests_total{{{route},status="200"}} 1' in text
+        assert f'functionapprest_requests_total{{{unmatched},status="404"}} 1' in text
+        assert f'functionapprest_request_duration_seconds_bucket{{{route},le="0.1"}} 0' in text
+        assert f'functionapprest_request_duration_seconds_bucket{{{route},le="+Inf"}} 1' in text
+        assert f'functionapprest_response_size_bytes_sum{{{route}}} 20' in text
+        assert f'functionapprest_response_size_bytes_count{{{unmatched}}} 0' in text
+        assert text.endswith('\n')
+
+
+class TestRequestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.context = FunctionsContext(
+            function_directory='/home/serverless/products-list',
+            function_name='products-list',
+            invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+            bindings={}
+        )
+
+    def request(self, functionapp_handler, method, path, body=None):
+        event = Request(method, f"http://localhost:7071/api{path}")
+        if body is not None:
+            event.set_body(json.dumps(body))
+        return functionapp_handler(event, self.context)
+
+    def test_metrics_by_route(self):
+        functionapp_handler = create_functionapp_handler(headers={}, metrics=True)
+        functionapp_handler.handle('get', path='/products/<int:id>/')(lambda req, id: {'id': id})
+        functionapp_handler.handle('post', path='/products/')(lambda req: req.json['body'])
+        functionapp_handler.handle_metrics()
+
+        self.request(functionapp_handler, 'GET', '/products/1/')
+        self.request(functionapp_handler, 'GET', '/products/2/')
+        self.request(functionapp_handler, 'POST', '/products/', {'name': 'foo'})
+        self.request(functionapp_handler, 'GET', '/missing/')
+
+        snapshot = functionapp_handler.metrics.snapshot()
+        assert snapshot[('/products/<int:id>/', 'GET')].statuses == {200: 2}
+        assert snapshot[('/products/<int:id>/', 'GET')].response_size.sum == len(b'{"id": 1}') * 2
+        assert snapshot[('/products/', 'POST')].request_size.sum == len(b'{"name": "foo"}')
+        assert snapshot[('unmatched', 'GET')].statuses == {404: 1}
+
+        response = self.request(functionapp_handler, 'GET', '/metrics/')
+        text = response.get_body().decode('utf-8')
+        assert 'route="/products/",method="POST",status="200"} 1' in text
+
+    def test_prometheus_content_type(self):
+        # the default headers have a Content-Type of application/json
+        functionapp_handler = create_functionapp_handler(metrics=True)
+        functionapp_handler.handle_metrics()
+        response = self.request(functionapp_handler, 'GET', '/metrics/')
+        datum = HttpResponseConverter.encode(response, expected_type=None)
+        content_type = datum.value['headers']['content-type'].value
+        assert content_type == 'text/plain; version=0.0.4; charset=utf-8'
+
+    def test_preflights_are_counted_by_route(self):
+        functionapp_handler = create_functionapp_handler(headers={}, metrics=True)
+        functionapp_handler.handle('get', path='/products/<int:id>/')(lambda req, id: {'id': id})
+        self.request(functionapp_handler, 'OPTIONS', '/products/1/')
+        self.request(functionapp_handler, 'OPTIONS', '/missing/')
+        self.request(functionapp_handler, 'GET', '/missing/')
+
+        snapshot = functionapp_handler.metrics.snapshot()
+        assert snapshot[('/products/<int:id>/', 'OPTIONS')].statuses == {200: 1}
+        assert snapshot[('unmatched', 'OPTIONS')].statuses == {200: 1}
+        assert snapshot[('unmatched', 'GET')].statuses == {404: 1}
+
+    def test_disabled_by_default(self):
+        functionapp_handler = create_functionapp_handler()
+        assert functionapp_handler.metrics is None
+        with self.assertRaises(ValueError):
+            functionapp_handler.handle_metrics()
+
+    def test_streamed_responses_have_no_size(self):
+        functionapp_handler = create_functionapp_handler(headers={}, metrics=True)
+        functionapp_handler.handle('get', path='/stream/')(lambda req: iter([1, 2]))
+        self.request(functionapp_handler, 'GET', '/stream/')
+        metrics = functionapp_handler.metrics.snapshot()[('/stream/', 'GET')]
+        assert metrics.requests == 1
+        assert metrics.response_size.count == 0
+
+    def test_async_mode(self):
+        functionapp_handler = create_functionapp_handler(headers={}, async_mode=True, metrics=True)
+
+        @functionapp_handler.handle('get', path='/async/')
+        async def get_async(req):
+            return 'async'
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(functionapp_handler(
+                Request('GET', 'http://localhost:7071/api/async/'), self.context))
+        finally:
+            loop.close()
+        assert functionapp_handler.metrics.snapshot()[('/async/', 'GET')].statuses == {200: 1}
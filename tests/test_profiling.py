@@ -0,0 +1,152 @@
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import asyncio
+import marshal
+import time
+import unittest
+
+from azure.functions.http import HttpResponseConverter
+
+from functionapprest import create_functionapp_handler, Request, FunctionsContext
+from functionapprest.profiling import Profiler, StackSampler
+
+
+def slow_function(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+class TestProfiler(unittest.TestCase):
+    def test_sample_rate(self):
+        profiler = Profiler(sample_rate=0.5)
+        with mock.patch('functionapprest.profiling.random.random', side_effect=[0.7, 0.2]):
+            assert profiler.profile('GET /', slow_function, (0,)) == 0
+            assert profiler.routes() == {}
+            profiler.profile('GET /', slow_function, (0,))
+        assert profiler.routes()['GET /'].requests == 1
+        assert 'slow_function' in profiler.print_stats('GET /')
+        assert profiler.print_stats('GET /missing') == ''
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            Profiler(sample_rate=2)
+        with self.assertRaises(ValueError):
+            Profiler(sampler='perf')
+
+    def test_slow_requests_arm_the_route(self):
+        profiler = Profiler(sample_rate=0, slow_threshold=0.01, slow_samples=2)
+        profiler.profile('GET /slow', slow_function, (0.02,))
+        assert profiler.routes() == {}
+        for _ in range(3):
+            profiler.profile('GET /slow', slow_function, (0,))
+        profiler.profile('GET /other', slow_function, (0,))
+        assert list(profiler.routes()) == ['GET /slow']
+        assert profiler.routes()['GET /slow'].requests == 2
+
+    def test_one_profile_at_a_time(self):
+        profiler = Profiler(sample_rate=1)
+        sampler = profiler.start('GET /')
+        assert sampler is not None
+        assert profiler.start('GET /') is None
+        profiler.stop('GET /', sampler)
+        sampler = profiler.start('GET /')
+        assert sampler is not None
+        profiler.stop('GET /', sampler)
+
+    def test_pstats_dump(self):
+        profiler = Profiler(sample_rate=1)
+        profiler.profile('GET /a', slow_function, (0,))
+        profiler.profile('GET /b', slow_function, (0,))
+        stats = marshal.loads(profiler.pstats_bytes())
+        calls = [value[0] for key, value in stats.items() if key[2] == 'slow_function']
+        assert calls == [2]
+        assert marshal.loads(Profiler().pstats_bytes()) == {}
+
+    def test_stack_sampler(self):
+        profiler = Profiler(sample_rate=1, sampler=lambda: StackSampler(interval=0.001))
+        profiler.profile('GET /', slow_function, (0.05,))
+        lines = profiler.collapsed().splitlines()
+        assert lines
+        stack, count = lines[0].rsplit(' ', 1)
+        assert int(count) > 0
+        assert any(line.split(';')[-1].startswith('slow_function') for line in lines)
+
+
+class TestProfiledRequests(unittest.TestCase):
+    def setUp(self):
+        self.context = FunctionsContext(
+            function_directory='/home/serverless/products-list',
+            function_name='products-list',
+            invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+            bindings={}
+        )
+
+    def get(self, functionapp_handler, url, **params):
+        return functionapp_handler(Request('GET', f"http://localhost:7071/api{url}", params=params),
+                                   self.context)
+
+    def test_profiles_by_route(self):
+        functionapp_handler = create_functionapp_handler(headers={},
+                                                         profiler=Profiler(sample_rate=1))
+        functionapp_handler.handle('get', path='/products/<int:id>/')(lambda req, id: {'id': id})
+        functionapp_handler.handle_profile()
+        assert self.get(functionapp_handler, '/products/1/').json == {'id': 1}
+        self.get(functionapp_handler, '/products/2/')
+        assert functionapp_handler.profiler.routes()['GET /products/<int:id>/'].requests == 2
+
+        response = self.get(functionapp_handler, '/profile/', route='GET /products/<int:id>/')
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        assert '<lambda>' in response.get_body().decode('utf-8')
+        assert 'dump_profile' not in response.get_body().decode('utf-8')
+
+        response = self.get(functionapp_handler, '/profile/', format='pstats')
+        assert response.mimetype == 'application/octet-stream'
+        assert marshal.loads(response.get_body())
+
+        assert self.get(functionapp_handler, '/profile/', format='svg').status_code == 400
+
+    def test_dump_content_types(self):
+        # the default headers have a Content-Type of application/json
+        functionapp_handler = create_functionapp_handler(profiler=Profiler(sample_rate=1))
+        functionapp_handler.handle('get', path='/products/')(lambda req: [])
+        functionapp_handler.handle_profile()
+        self.get(functionapp_handler, '/products/')
+        for dump_format, content_type in (('text', 'text/plain; charset=utf-8'),
+                                          ('collapsed', 'text/plain; charset=utf-8'),
+                                          ('pstats', 'application/octet-stream')):
+            response = self.get(functionapp_handler, '/profile/', format=dump_format)
+            datum = HttpResponseConverter.encode(response, expected_type=None)
+            assert datum.value['headers']['content-type'].value == content_type, dump_format
+
+    def test_default_profiler(self):
+        functionapp_handler = create_functionapp_handler(profiler=True)
+        assert isinstance(functionapp_handler.profiler, Profiler)
+        assert create_functionapp_handler().profiler is None
+
+    def test_profile_route_requires_profiler(self):
+        with self.assertRaises(ValueError):
+            create_functionapp_handler().handle_profile()
+
+    def test_async_handlers(self):
+        functionapp_handler = create_functionapp_handler(headers={}, async_mode=True,
+                                                         profiler=Profiler(sample_rate=1))
+
+        @functionapp_handler.handle('get', path='/async/')
+        async def get_async(req):
+            return 'async'
+
+        functionapp_handler.handle('get', path='/sync/')(lambda req: 'sync')
+        loop = asyncio.new_event_loop()
+        try:
+            for url in ('/async/', '/sync/'):
+                response = loop.run_until_complete(
+                    functionapp_handler(Request('GET', f"http://localhost:7071/api{url}"),
+                                        self.context))
+                assert response.status_code == 200
+        finally:
+            loop.close()
+        assert sorted(functionapp_handler.profiler.routes()) == ['GET /async/', 'GET /sync/']
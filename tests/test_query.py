@@ -0,0 +1,132 @@
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import json
+import math
+import random
+import unittest
+
+from functionapprest import create_functionapp_handler, Request, FunctionsContext
+from functionapprest.query import (compile_query_coercers, load_query, marshall_query_value,
+                                   parse_query_value)
+
+
+def same(one, two) -> bool:
+    if isinstance(one, float) and isinstance(two, float) and math.isnan(one) and math.isnan(two):
+        return True
+    if isinstance(one, list) and isinstance(two, list):
+        return len(one) == len(two) and all(same(first, second) for first, second in zip(one, two))
+    return type(one) is type(two) and one == two
+
+
+class TestParseQueryValue(unittest.TestCase):
+    def test_same_values_as_marshall(self):
+        values = ['', 'true', 'false', 'null', 'NaN', 'Infinity', '-Infinity', '1', '-0', '01',
+                  '1.5', '1e5', '.5', ' 1', '1 ', '"x"', '[1,2]', '{"a":1}', '1,2,3', 'a,b', '1,a',
+                  'inf,nan', '1_0,2', '١,2', '١', '1,,2', '[1,2', '12abc', '-', '+1', 'foo bar',
+                  'a b,1 ']
+        generator = random.Random(21)
+        alphabet = '0123456789,.-+eE_ "[]{}tnaflrsuINfy\t'
+        values.extend(''.join(generator.choice(alphabet) for _ in range(generator.randint(0, 6)))
+                      for _ in range(5000))
+        for value in values:
+            assert same(parse_query_value(value), marshall_query_value(value)), value
+
+    def test_plain_values_are_not_parsed(self):
+        loads = mock.Mock(side_effect=json.loads)
+        for value in ('foo', '12', '1.5', 'true', 'a,b', '1,2'):
+            parse_query_value(value, loads)
+        assert loads.call_count == 0
+        assert parse_query_value('{"a": 1}', loads) == {'a': 1}
+        assert loads.call_count == 1
+
+
+class TestQueryCoercion(unittest.TestCase):
+    def setUp(self):
+        self.schema = {
+            'type': 'object',
+            'properties': {
+                'query': {
+                    'type': 'object',
+                    'properties': {
+                        'name': {'type': 'string'},
+                        'page': {'type': 'integer'},
+                        'price': {'type': 'number'},
+                        'active': {'type': 'boolean'},
+                        'ids': {'type': 'array', 'items': {'type': 'integer'}},
+                        'tags': {'type': 'array', 'items': {'type': 'string'}},
+                        'filter': {'type': 'object'},
+                        'limit': {'type': ['integer', 'null']},
+                    }
+                }
+            }
+        }
+
+    def test_coercion(self):
+        coercers = compile_query_coercers(self.schema)
+        query = load_query({
+            'name': '123', 'page': '2', 'price': '1.5', 'active': 'True', 'ids': '1,2',
+            'tags': '1,b', 'filter': '{"a": 1}', 'limit': 'null', 'other': '3'
+        }, coercers=coercers)
+        assert query == {
+            'name': '123', 'page': 2, 'price': 1.5, 'active': True, 'ids': [1, 2],
+            'tags': ['1', 'b'], 'filter': {'a': 1}, 'limit': None, 'other': 3
+        }
+        assert type(query['page']) is int
+
+    def test_invalid_values_are_kept(self):
+        coercers = compile_query_coercers(self.schema)
+        query = load_query({'page': 'two', 'active': 'yes', 'ids': '1,x', 'filter': '{',
+                            'limit': '5'}, coercers=coercers)
+        assert query == {'page': 'two', 'active': 'yes', 'ids': [1, 'x'], 'filter': '{', 'limit': 5}
+
+    def test_no_query_schema(self):
+        assert compile_query_coercers({'type': 'object'}) == {}
+        assert compile_query_coercers(None) == {}
+
+
+class TestCoercedRequests(unittest.TestCase):
+    def setUp(self):
+        self.context = FunctionsContext(
+            function_directory='/home/serverless/products-list',
+            function_name='products-list',
+            invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+            bindings={}
+        )
+        self.schema = {
+            '$schema': 'http://json-schema.org/draft-04/schema#',
+            'type': 'object',
+            'properties': {
+                'query': {
+                    'type': 'object',
+                    'properties': {'name': {'type': 'string'}, 'page': {'type': 'integer'}}
+                }
+            }
+        }
+
+    def get(self, functionapp_handler, **params):
+        event = Request('GET', 'http://localhost:7071/api/products/', params=params)
+        return functionapp_handler(event, self.context)
+
+    def test_coerce_query(self):
+        functionapp_handler = create_functionapp_handler(headers={}, coerce_query=True)
+        functionapp_handler.handle('get', path='/products/', schema=self.schema)(
+            lambda req: req.json['query'])
+        response = self.get(functionapp_handler, name='123', page='2')
+        assert response.json == {'name': '123', 'page': 2}
+        assert self.get(functionapp_handler, page='two').status_code == 400
+
+    def test_compatible_by_default(self):
+        functionapp_handler = create_functionapp_handler(headers={})
+        functionapp_handler.handle('get', path='/products/', schema=self.schema)(
+            lambda req: req.json['query'])
+        assert self.get(functionapp_handler, name='123').status_code == 400
+        assert self.get(functionapp_handler, name='"123"').json == {'name': '123'}
+
+    def test_route_override(self):
+        functionapp_handler = create_functionapp_handler(headers={})
+        functionapp_handler.handle('get', path='/products/', schema=self.schema,
+                                   coerce_query=True)(lambda req: req.json['query'])
+        assert self.get(functionapp_handler, name='123').json == {'name': '123'}
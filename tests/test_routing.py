@@ -0,0 +1,140 @@
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import itertools
+import unittest
+
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import Map, Rule
+
+from functionapprest.routing import Router, allow_header
+
+
+RULES = [
+    ('/', 'get'),
+    ('/foo/bar', 'get'),
+    ('/foo/bar', 'post'),
+    ('/foo/', 'put'),
+    ('/foo', 'get'),
+    ('/foo/<int:id>/', 'get'),
+    ('/foo/<int:id>/', 'delete'),
+    ('/foo/<string:name>/', 'post'),
+    ('/foo/<int(min=10):id>/big', 'get'),
+    ('/foo/item-<int:id>.json', 'get'),
+    ('/foo/<float:ratio>', 'get'),
+    ('/foo/<uuid:uid>', 'get'),
+    ('/foo/<any(a, b):choice>/x', 'get'),
+    ('/bar/<path:path>', 'get'),
+    ('/bar/<path:first>/<path:second>/end', 'get'),
+    ('/baz/<path:rest>/', 'patch'),
+    ('/<path:path>', 'put'),
+]
+
+PATHS = [
+    '/', '', '//', '/foo', '/foo/', '/foo/bar', '/foo/bar/', '/foo/12', '/foo/12/', '/foo/abc/',
+    '/foo/5/big', '/foo/15/big', '/foo/item-7.json', '/foo/item-x.json', '/foo/1.5',
+    '/foo/0a1b2c3d-0000-1111-2222-333344445555', '/foo/a/x', '/foo/c/x',
+    '/bar', '/bar/', '/bar/a', '/bar/a/b/c', '/bar/a/b/end', '/bar/a/b/c/end/',
+    '/baz/a/b', '/baz/a/b/', '/anything/else', '/anything/else/', 'foo/bar', '//foo/bar',
+    '/foo//bar', '/foo/%20/',
+]
+
+METHODS = ['get', 'post', 'put', 'delete', 'patch', 'head']
+
+
+def get_map(rules=RULES):
+    url_map = Map()
+    for path, method in rules:
+        url_map.add(Rule(path, endpoint=f"{method} {path}", methods=[method]))
+    return url_map
+
+
+def werkzeug_match(url_map, path, method):
+    try:
+        rule, kwargs = url_map.bind('').match(path, method=method, return_rule=True)
+        return rule.rule, rule.methods, kwargs
+    except HTTPException as error:
+        return type(error), getattr(error, 'new_url', None), getattr(error, 'valid_methods', None)
+
+
+def router_match(router, path, method):
+    try:
+        rule, kwargs = router.match(path, method)
+        return rule.rule, rule.methods, kwargs
+    except HTTPException as error:
+        return type(error), getattr(error, 'new_url', None), getattr(error, 'valid_methods', None)
+
+
+class TestRouter(unittest.TestCase):
+    def test_matches_like_werkzeug(self):
+        url_map = get_map()
+        router = Router(get_map())
+        for path, method in itertools.product(PATHS, METHODS):
+            expected = werkzeug_match(url_map, path, method)
+            actual = router_match(router, path, method)
+            if expected[0] is not None and isinstance(expected[2], list):
+                expected = expected[:2] + (sorted(expected[2]),)
+                actual = actual[:2] + (sorted(actual[2] or []),)
+            assert actual == expected, (path, method)
+
+    def test_allowed_methods_like_werkzeug(self):
+        adapter = get_map().bind('')
+        router = Router(get_map())
+        for path in PATHS:
+            expected = sorted(adapter.allowed_methods(path))
+            assert sorted(router.allowed_methods(path)) == expected, path
+
+    def test_static_and_dynamic_lookups_do_not_use_werkzeug(self):
+        router = Router(get_map())
+        adapter = router.table.adapter
+        with mock.patch.object(adapter, 'match') as match_mock:
+            assert router.match('/foo/bar', 'post')[0].rule == '/foo/bar'
+            assert router.match('/foo/12/', 'delete')[1] == {'id': 12}
+            assert router.match('/bar/a/b/end', 'get')[1] == {'first': 'a', 'second': 'b'}
+            assert router.match('/x/y/', 'put')[1] == {'path': 'x/y/'}
+        assert match_mock.call_count == 0
+
+    def test_table_is_rebuilt_after_invalidate(self):
+        url_map = get_map([('/foo', 'get')])
+        router = Router(url_map)
+        table = router.table
+        assert router.table is table
+
+        url_map.add(Rule('/bar/<int:id>', endpoint='bar', methods=['get']))
+        router.invalidate()
+        assert router.table is not table
+        assert router.match('/bar/1', 'get')[1] == {'id': 1}
+
+    def test_invalid_rules_raise_when_added(self):
+        router = Router()
+        router.add('/ok', 'ok', ['get'])
+        with self.assertRaises(LookupError):
+            router.add('/bad/<unknown:id>', 'bad', ['get'])
+        assert router.match('/ok', 'get')[0].endpoint == 'ok'
+
+    def test_rules_use_the_converters_of_the_map(self):
+        url_map = get_map([('/foo', 'get')])
+        url_map.converters['upper'] = url_map.converters['string']
+        router = Router(url_map)
+        router.add('/bar/<upper:name>', 'bar', ['get'])
+        assert router.match('/bar/x', 'get')[1] == {'name': 'x'}
+
+    def test_allow_header_like_werkzeug(self):
+        adapter = get_map().bind('')
+        router = Router(get_map())
+        for path in PATHS:
+            methods = adapter.allowed_methods(path)
+            expected = allow_header(methods) if methods else None
+            assert router.allow(path)[0] == expected, path
+        assert allow_header(['get', 'HEAD', 'options', 'Post']) == 'GET,POST'
+
+    def test_allow_pattern_of_the_first_rule(self):
+        router = Router(get_map())
+        assert router.allow('/foo/bar') == ('GET,POST,PUT', '/foo/bar')
+        # the int rule comes first, the string and catch-all rules add their methods
+        assert router.allow('/foo/12/') == ('DELETE,GET,POST,PUT', '/foo/<int:id>/')
+        assert router.allow('/anything/else') == ('PUT', '/<path:path>')
+        assert router.allow('') == ('GET', None)
+        assert Router(get_map([('/foo', 'get')])).allow('/bar') == (None, None)
@@ -0,0 +1,125 @@
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import json
+import types
+import unittest
+
+from azure.functions.http import HttpResponseConverter
+
+from functionapprest import create_functionapp_handler, Request, FunctionsContext
+from functionapprest.streaming import (iter_json_array, iter_ndjson, get_stream_format,
+                                       host_streaming_response_class, to_host_response)
+
+
+def encode(item):
+    return json.dumps(item).encode('utf-8')
+
+
+class TestStreaming(unittest.TestCase):
+    def test_json_array(self):
+        items = [{'id': index} for index in range(100)]
+        assert json.loads(b''.join(iter_json_array(iter(items), encode))) == items
+        assert b''.join(iter_json_array(iter([]), encode)) == b'[]'
+        assert b''.join(iter_json_array(iter(['a']), encode)) == b'["a"]'
+
+    def test_ndjson(self):
+        items = [{'id': index} for index in range(100)]
+        lines = b''.join(iter_ndjson(iter(items), encode)).splitlines()
+        assert [json.loads(line) for line in lines] == items
+        assert b''.join(iter_ndjson(iter([]), encode)) == b''
+
+    def test_chunks_are_bounded(self):
+        items = ({'id': index, 'name': 'x' * 10} for index in range(1000))
+        record_size = len(encode({'id': 999, 'name': 'x' * 10})) + 1
+        chunks = list(iter_ndjson(items, encode, buffer_size=1024))
+        assert len(chunks) > 10
+        assert all(len(chunk) < 1024 + record_size for chunk in chunks)
+
+    def test_items_are_encoded_on_demand(self):
+        consumed = []
+
+        def items():
+            for index in range(1000):
+                consumed.append(index)
+                yield index
+
+        chunks = iter_json_array(items(), encode, buffer_size=64)
+        next(chunks)
+        assert 0 < len(consumed) < 1000
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            get_stream_format('csv')
+
+    def test_host_response_without_streaming_support(self):
+        response = object()
+        with mock.patch.dict('sys.modules', {'azurefunctions.extensions.http.fastapi': None}):
+            assert host_streaming_response_class() is None
+            assert to_host_response(response) is response
+
+    def test_host_response_with_streaming_support(self):
+        streaming_response_class = mock.Mock()
+        module = types.ModuleType('azurefunctions.extensions.http.fastapi')
+        module.StreamingResponse = streaming_response_class
+        response = mock.Mock(status_code=201, headers={'X-Foo': 'bar'},
+                             mimetype='application/x-ndjson')
+        response.iter_body.return_value = iter([b'{}\n'])
+
+        with mock.patch.dict('sys.modules', {'azurefunctions.extensions.http.fastapi': module}):
+            assert to_host_response(response) is streaming_response_class.return_value
+        streaming_response_class.assert_called_once_with(
+            content=response.iter_body.return_value, status_code=201,
+            headers={'X-Foo': 'bar'}, media_type='application/x-ndjson')
+
+
+class TestStreamedResponses(unittest.TestCase):
+    def setUp(self):
+        self.context = FunctionsContext(
+            function_directory='/home/serverless/products-list',
+            function_name='products-list',
+            invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+            bindings={}
+        )
+        # the default headers have a Content-Type of application/json
+        self.functionapp_handler = create_functionapp_handler()
+        self.functionapp_handler.handle('get', path='/export/', stream_format='ndjson')(
+            lambda req: ({'id': index} for index in range(3)))
+
+    def request(self, path: str):
+        return self.functionapp_handler(Request('GET', f"http://localhost:7071/api{path}"),
+                                        self.context)
+
+    def test_ndjson_content_type_is_encoded(self):
+        datum = HttpResponseConverter.encode(self.request('/export/'), expected_type=None)
+        assert datum.value['headers']['content-type'].value == 'application/x-ndjson'
+        assert datum.value['body'].value.splitlines() == [b'{"id": 0}', b'{"id": 1}', b'{"id": 2}']
+
+    def test_explicit_content_type_is_kept(self):
+        response = self.functionapp_handler.Response(iter(['a']), 200, {'Content-Type': 'text/csv'},
+                                                     stream_format='ndjson')
+        assert response.headers['content-type'] == 'text/csv'
+
+    def test_host_response_content_type(self):
+        streaming_response_class = mock.Mock()
+        module = types.ModuleType('azurefunctions.extensions.http.fastapi')
+        module.StreamingResponse = streaming_response_class
+        with mock.patch.dict('sys.modules', {'azurefunctions.extensions.http.fastapi': module}):
+            to_host_response(self.request('/export/'))
+        kwargs = streaming_response_class.call_args[1]
+        assert kwargs['headers']['content-type'] == kwargs['media_type'] == 'application/x-ndjson'
+
+    def test_errors_of_the_stream_are_logged(self):
+        def items():
+            yield {'id': 0}
+            raise RuntimeError('database gone')
+
+        self.functionapp_handler.handle('get', path='/broken/', stream_format='ndjson')(
+            lambda req: items())
+        response = self.request('/broken/')
+        assert response.status_code == 200
+        with self.assertLogs(level='ERROR') as logs, self.assertRaises(RuntimeError):
+            response.get_body()
+        assert 'Streamed response body failed' in logs.output[0]
@@ -0,0 +1,106 @@
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import asyncio
+import json
+import unittest
+
+from functionapprest import create_functionapp_handler, Request, FunctionsContext
+from functionapprest.timing import PhaseTimer, server_timing
+
+
+class TestPhaseTimer(unittest.TestCase):
+    def test_phases_add_up_to_the_total(self):
+        with mock.patch('functionapprest.timing.time.perf_counter',
+                        side_effect=[1.0, 1.5, 1.75, 2.0]):
+            timer = PhaseTimer()
+            timer.mark('routing')
+            timer.mark('handler')
+            timer.mark('routing')
+        assert timer.stop() == {'routing': 0.75, 'handler': 0.25, 'total': 1.0}
+
+    def test_server_timing(self):
+        assert server_timing({'routing': 0.0015, 'total': 0.01}) == (
+            'routing;dur=1.500, total;dur=10.000')
+
+
+class TestTimedRequests(unittest.TestCase):
+    def setUp(self):
+        self.context = FunctionsContext(
+            function_directory='/home/serverless/products-list',
+            function_name='products-list',
+            invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+            bindings={}
+        )
+        self.schema = {
+            '$schema': 'http://json-schema.org/draft-04/schema#',
+            'type': 'object',
+            'properties': {'body': {'type': 'object'}}
+        }
+
+    def post(self, functionapp_handler, path='/products/'):
+        event = Request('POST', f"http://localhost:7071/api{path}")
+        event.set_body(json.dumps({'name': 'foo'}))
+        return functionapp_handler(event, self.context)
+
+    def test_server_timing_header(self):
+        functionapp_handler = create_functionapp_handler(headers={}, server_timing=True)
+        functionapp_handler.handle('post', path='/products/', schema=self.schema)(
+            lambda req: req.json['body'])
+        response = self.post(functionapp_handler)
+        phases = [item.split(';')[0] for item in response.headers['Server-Timing'].split(', ')]
+        assert phases == ['request', 'bindings', 'routing', 'json', 'validation', 'handler',
+                          'serialization', 'response', 'total']
+
+        response = self.post(functionapp_handler, path='/missing/')
+        assert response.status_code == 404
+        assert 'routing' not in response.headers['Server-Timing']
+
+    def test_callbacks(self):
+        calls = []
+
+        def on_request_complete(req, response, timings):
+            calls.append((req, response, timings))
+
+        functionapp_handler = create_functionapp_handler(
+            headers={}, on_request_complete=on_request_complete)
+        functionapp_handler.handle('post', path='/products/')(lambda req: req.json['body'])
+
+        @functionapp_handler.on_request_complete
+        def failing_callback(req, response, timings):
+            raise ValueError('callback')
+
+        with mock.patch('functionapprest.logging.exception') as logging_mock:
+            response = self.post(functionapp_handler)
+        assert logging_mock.call_count == 1
+        assert 'Server-Timing' not in response.headers
+        (req, callback_response, timings), = calls
+        assert callback_response is response
+        assert req.method == 'POST'
+        # without a schema, the body is parsed by the handler
+        assert list(timings) == ['request', 'bindings', 'routing', 'handler', 'serialization',
+                                 'response', 'total']
+        assert abs(sum(timings.values()) - 2 * timings['total']) < 1e-9
+
+    def test_async(self):
+        functionapp_handler = create_functionapp_handler(headers={}, server_timing=True,
+                                                         async_mode=True)
+        functionapp_handler.handle('get', path='/products/', cache=30)(lambda req: {'id': 1})
+        loop = asyncio.new_event_loop()
+        try:
+            event = Request('GET', 'http://localhost:7071/api/products/')
+            response = loop.run_until_complete(functionapp_handler(event, self.context))
+        finally:
+            loop.close()
+        assert 'cache;dur=' in response.headers['Server-Timing']
+        assert 'handler;dur=' in response.headers['Server-Timing']
+
+    def test_requests_are_not_timed_by_default(self):
+        functionapp_handler = create_functionapp_handler(headers={})
+        functionapp_handler.handle('post', path='/products/')(lambda req: req.timer)
+        with mock.patch('functionapprest.PhaseTimer') as timer_mock:
+            response = self.post(functionapp_handler)
+        assert timer_mock.call_count == 0
+        assert response.get_body() == b''
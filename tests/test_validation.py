@@ -0,0 +1,220 @@
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import copy
+import json
+import unittest
+
+from jsonschema import validate, ValidationError, FormatChecker, Draft4Validator, Draft7Validator
+
+from functionapprest import create_functionapp_handler, Request, FunctionsContext
+from functionapprest.validation import (CompiledValidator, GeneratedValidator, ValidatorCache,
+                                        validator_cache)
+
+
+def get_schema(draft='draft-04'):
+    return {
+        '$schema': f"http://json-schema.org/{draft}/schema#",
+        'type': 'object',
+        'properties': {
+            'body': {
+                'type': 'object',
+                'properties': {
+                    'name': {'type': 'string'},
+                    'time': {'type': 'string', 'format': 'date-time'},
+                    'tags': {'type': 'array', 'items': {'type': 'string'}}
+                },
+                'required': ['name']
+            }
+        }
+    }
+
+
+class TestValidation(unittest.TestCase):
+    def test_validator_picks_draft_from_schema(self):
+        for draft, validator_class in (('draft-04', Draft4Validator),
+                                       ('draft-07', Draft7Validator)):
+            with mock.patch.object(validator_class, 'check_schema') as check_schema_mock:
+                CompiledValidator(get_schema(draft))
+            check_schema_mock.assert_called_once_with(get_schema(draft))
+
+    def test_errors_match_jsonschema_validate(self):
+        format_checker = FormatChecker()
+        instances = [
+            {'body': {}},
+            {'body': {'name': 1}},
+            {'body': {'name': 'foo', 'time': 'yesterday', 'tags': [1]}},
+            {'body': []},
+        ]
+        for instance in instances:
+            with self.assertRaises(ValidationError) as expected:
+                validate(instance, get_schema(), format_checker=format_checker)
+            with self.assertRaises(ValidationError) as actual:
+                CompiledValidator(get_schema(), format_checker=format_checker).validate(instance)
+            assert actual.exception.message == expected.exception.message
+            assert actual.exception.absolute_schema_path == expected.exception.absolute_schema_path
+
+        validator = CompiledValidator(get_schema(), format_checker=format_checker)
+        validator.validate({'body': {'name': 'foo'}})
+
+    def test_cache_by_identity_and_content(self):
+        cache = ValidatorCache()
+        schema = get_schema()
+        validator = cache.get(schema)
+        assert cache.get(schema) is validator
+        assert cache.get(copy.deepcopy(schema)) is validator
+        assert len(cache) == 1
+
+        assert cache.get(get_schema('draft-07')) is not validator
+        assert len(cache) == 2
+
+    def test_schema_is_compiled_once_at_registration(self):
+        validator_cache.clear()
+        functionapp_handler = create_functionapp_handler(headers={})
+        compiled_mock = mock.Mock(wraps=CompiledValidator)
+        with mock.patch.dict('functionapprest.validation.validator_backends',
+                             {'jsonschema': compiled_mock}):
+            functionapp_handler.handle('post', path='/foo/', schema=get_schema())(
+                mock.Mock(return_value='foo'))
+            functionapp_handler.handle('put', path='/foo/', schema=get_schema())(
+                mock.Mock(return_value='bar'))
+        assert compiled_mock.call_count == 1
+
+        context = FunctionsContext(
+            function_directory='/home/serverless/products-list',
+            function_name='products-list',
+            invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+            bindings={}
+        )
+        event = Request('POST', 'http://localhost:7071/api/foo/')
+        with mock.patch.dict('functionapprest.validation.validator_backends',
+                             {'jsonschema': compiled_mock}):
+            event.set_body(json.dumps({'name': 'foo'}))
+            result = functionapp_handler(event, context).to_json()
+            assert result['status_code'] == 200
+            event.set_body(json.dumps({'name': 1}))
+            result = functionapp_handler(event, context).to_json()
+            assert result['status_code'] == 400
+        assert compiled_mock.call_count == 1
+
+
+class TestGeneratedValidation(unittest.TestCase):
+    schemas = [
+        get_schema(),
+        get_schema('draft-07'),
+        {
+            '$schema': 'http://json-schema.org/draft-04/schema#',
+            'type': 'object',
+            'properties': {
+                'count': {'type': 'integer', 'minimum': 0, 'maximum': 10, 'exclusiveMaximum': True},
+                'ratio': {'type': ['number', 'null'], 'minimum': 0.5},
+                'code': {'type': 'string', 'pattern': '^[A-Z]{3}$', 'minLength': 3},
+                'flag': {'enum': [True, 'yes', 1.5]},
+                'items': {'type': 'array', 'minItems': 1, 'maxItems': 2,
+                          'items': {'type': 'integer'}},
+            },
+            'required': ['count'],
+            'additionalProperties': False
+        },
+        {
+            '$schema': 'http://json-schema.org/draft-07/schema#',
+            'type': 'object',
+            'properties': {
+                'count': {'type': 'integer', 'exclusiveMinimum': 0, 'exclusiveMaximum': 10},
+                'email': {'type': 'string', 'format': 'email'},
+                'extra': {'type': 'object', 'additionalProperties': {'type': 'string'}},
+            }
+        },
+    ]
+    instances = [
+        {'body': {'name': 'foo'}},
+        {'body': {'name': 'foo', 'time': '2019-02-21T10:00:00Z', 'tags': ['a']}},
+        {'body': {'name': 1}},
+        {'body': {'tags': 'a'}},
+        {'count': 0},
+        {'count': 10},
+        {'count': 1.0},
+        {'count': True},
+        {'count': 5, 'ratio': None, 'code': 'ABC', 'flag': 'yes', 'items': [1, 2]},
+        {'count': 5, 'ratio': 0.1},
+        {'count': 5, 'code': 'abc'},
+        {'count': 5, 'flag': 1},
+        {'count': 5, 'items': []},
+        {'count': 5, 'items': [1, 2, 3]},
+        {'count': 5, 'unknown': 1},
+        {'email': 'foo@bar.com', 'extra': {'a': 'b'}},
+        {'email': 'foo', 'extra': {'a': 1}},
+        [],
+        'foo',
+    ]
+
+    def test_generated_validator_matches_jsonschema(self):
+        format_checker = FormatChecker()
+        for schema in self.schemas:
+            generated = GeneratedValidator(schema, format_checker=format_checker)
+            assert generated.generated
+            for instance in self.instances:
+                try:
+                    validate(instance, schema, format_checker=format_checker)
+                    expected = None
+                except ValidationError as error:
+                    expected = (error.message, error.absolute_schema_path)
+                try:
+                    generated.validate(instance)
+                    actual = None
+                except ValidationError as error:
+                    actual = (error.message, error.absolute_schema_path)
+                assert actual == expected, (schema, instance)
+                assert generated.is_valid(instance) == (expected is None), (schema, instance)
+
+    def test_unsupported_keywords_fall_back_to_jsonschema(self):
+        schema = {
+            '$schema': 'http://json-schema.org/draft-04/schema#',
+            'type': 'object',
+            'properties': {'body': {'anyOf': [{'type': 'string'}, {'type': 'integer'}]}}
+        }
+        generated = GeneratedValidator(schema)
+        assert not generated.generated
+        generated.validate({'body': 'foo'})
+        with self.assertRaises(ValidationError):
+            generated.validate({'body': []})
+
+    def test_handler_with_codegen_validator(self):
+        schema = {
+            '$schema': 'http://json-schema.org/draft-04/schema#',
+            'type': 'object',
+            'properties': {
+                'body': {
+                    'type': 'object',
+                    'properties': {'my_integer': {'type': 'integer'}}
+                }
+            }
+        }
+        context = FunctionsContext(
+            function_directory='/home/serverless/products-list',
+            function_name='products-list',
+            invocation_id='c9b749e6-0611-4b651-9ff0-cdd2da18f05b',
+            bindings={}
+        )
+        functionapp_handler = create_functionapp_handler(headers={}, validator='codegen')
+        functionapp_handler.handle('post', schema=schema)(mock.Mock(return_value='foo'))
+
+        event = Request('POST', 'http://localhost:7071/api/v1/')
+        event.set_body(json.dumps({'my_integer': 1}))
+        result = functionapp_handler(event, context).to_json()
+        assert result == {'body': '"foo"', 'status_code': 200, 'headers': {}}
+
+        event.set_body(json.dumps({'my_integer': 'this is not an integer'}))
+        result = functionapp_handler(event, context).to_json()
+        assert result == {
+            'body': '{"statusCode": 404, "message": "Validation Error: '
+                    'Schema[properties][body][properties][my_integer][type] with value '
+                    '\'this is not an integer\' is not of type \'integer\'"}',
+            'status_code': 400,
+            'headers': {}}
+
+    def test_unknown_validator_backend(self):
+        with self.assertRaises(ValueError):
+            create_functionapp_handler(validator='fastest')
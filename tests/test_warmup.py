@@ -0,0 +1,88 @@
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from functionapprest import create_functionapp_handler, Request, FunctionsContext
+from functionapprest.validation import CompiledValidator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def imported_modules(code: str) -> set:
+    """Top level modules imported after running the code in a fresh interpreter."""
+    code += '\nimport sys\nprint(" ".join(sys.modules))'
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=ROOT,
+                                     universal_newlines=True)
+    return {name.split('.')[0] for name in output.split()}
+
+
+class TestLazyImports(unittest.TestCase):
+    def test_import_is_lazy(self):
+        modules = imported_modules('import functionapprest')
+        for name in ('jsonschema', 'werkzeug', 'cProfile', 'pstats'):
+            assert name not in modules, name
+
+    def test_jsonschema_is_only_imported_with_schemas(self):
+        code = '\n'.join([
+            'from functionapprest import create_functionapp_handler, Request, FunctionsContext',
+            'functionapp_handler = create_functionapp_handler()',
+            'functionapp_handler.handle("get", path="/products/")(lambda req: [])',
+            'context = FunctionsContext("id", "products", "/home/serverless/products", {})',
+            'functionapp_handler(Request("GET", "http://localhost:7071/api/products/"), context)',
+            'functionapp_handler(Request("GET", "http://localhost:7071/api/missing/"), context)',
+        ])
+        modules = imported_modules(code)
+        assert 'werkzeug' in modules
+        assert 'jsonschema' not in modules
+
+
+class TestWarmup(unittest.TestCase):
+    def setUp(self):
+        self.schema = {
+            '$schema': 'http://json-schema.org/draft-04/schema#',
+            'type': 'object',
+            'properties': {'body': {'type': 'object', 'required': ['name']}}
+        }
+
+    def test_warmup(self):
+        functionapp_handler = create_functionapp_handler(headers={})
+        functionapp_handler.handle('post', path='/products/', schema=self.schema)(
+            lambda req: req.json['body'])
+        functionapp_handler.handle('get', path='/products/<int:id>/')(lambda req, id: {'id': id})
+
+        with tempfile.TemporaryDirectory() as function_directory:
+            with open(os.path.join(function_directory, 'function.json'), 'w') as function_json:
+                binding = {'type': 'httpTrigger', 'direction': 'in',
+                           'route': 'products/{*restOfPath}'}
+                json.dump({'bindings': [binding]}, function_json)
+            with mock.patch.object(CompiledValidator, 'best_error', autospec=True) as best_error:
+                functionapp_handler.warmup(function_directory)
+            assert best_error.call_count == 1
+            bindings_cache = functionapp_handler.bindings_cache
+            assert bindings_cache.get(function_directory)['route'] == 'products/{*restOfPath}'
+            assert bindings_cache.hits == 1
+
+        context = FunctionsContext('id', 'products', '/home/serverless/products', {})
+        response = functionapp_handler(Request('GET', 'http://localhost:7071/api/products/1/'),
+                                       context)
+        assert response.json == {'id': 1}
+
+    def test_invalid_routes_raise_when_registered(self):
+        functionapp_handler = create_functionapp_handler()
+        functionapp_handler.handle('get', path='/products/')(lambda req: [])
+        with self.assertRaises(LookupError):
+            functionapp_handler.handle('get', path='/products/<unknown:id>/')(lambda req, id: id)
+        functionapp_handler.warmup()
+
+        context = FunctionsContext('id', 'products', '/home/serverless/products', {})
+        response = functionapp_handler(Request('GET', 'http://localhost:7071/api/products/'),
+                                       context)
+        assert response.json == []